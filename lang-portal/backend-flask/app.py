@@ -2,24 +2,32 @@ from flask import Flask, g
 from flask_cors import CORS
 
 from lib.db import Db
+from lib.storage import create_backend
+from lib.repositories import Repositories
+from lib.cache import ResponseCache
+from lib.payload_cache import PayloadCache
+from lib.vocabulary import VocabularyStore
+from lib.metrics import MetricsRegistry, instrument, add_slow_query_log
+from lib.users import DEFAULT_USER_ID
 
 import routes.words
 import routes.groups
 import routes.study_sessions
 import routes.dashboard
 import routes.study_activities
+import routes.metrics
+import routes.users
+import routes.shards
 
 def get_allowed_origins(app):
     try:
-        cursor = app.db.cursor()
-        cursor.execute('SELECT url FROM study_activities')
-        urls = cursor.fetchall()
+        urls = app.repositories.activities.urls()
         # Convert URLs to origins (e.g., https://example.com/app -> https://example.com)
         origins = set()
         for url in urls:
             try:
                 from urllib.parse import urlparse
-                parsed = urlparse(url['url'])
+                parsed = urlparse(url)
                 origin = f"{parsed.scheme}://{parsed.netloc}"
                 origins.add(origin)
             except:
@@ -31,19 +39,79 @@ def get_allowed_origins(app):
 def create_app(test_config=None):
     app = Flask(__name__)
     
-    if test_config is None:
-        app.config.from_mapping(
-            DATABASE='words.db'
-        )
-    else:
+    app.config.from_mapping(
+        DATABASE='words.db',
+        DB_POOL_SIZE=5,           # Read-only connections kept per worker process
+        DB_POOL_TIMEOUT=30.0,     # Seconds to wait for a free connection
+        DB_POOL_MAX_IDLE=300.0,   # Seconds before an idle connection is evicted
+        DB_PRAGMAS={},            # Overrides for lib.db.DEFAULT_PRAGMAS, e.g. {'mmap_size': 0}
+        REVIEW_STREAM_CHUNK_SIZE=500, # Reviews committed per chunk by the NDJSON review stream
+        RESPONSE_CACHE_ENABLED=True,
+        RESPONSE_CACHE_SIZE=512,  # Cached responses kept per worker process (LRU)
+        RESPONSE_CACHE_TTL=60.0,  # Default seconds a cached response stays valid
+        VOCABULARY_STORE_ENABLED=False, # Serve word listings from an in-memory snapshot
+        RAW_PAYLOAD_CACHE_SIZE=64,      # Serialized /words/raw bodies kept per worker process
+        RAW_PAYLOAD_CACHE_MAX_WORDS=50000, # Larger groups are streamed instead of cached
+        METRICS_ENABLED=True,     # Time requests and SQL statements, serve /api/_metrics
+        SLOW_QUERY_MS=100.0,      # Log statements at least this slow with their query plan (None: off)
+        SLOW_QUERY_LOG=None,      # File for the slow-query log; default is the app's logging setup
+        SHARDS_DIR=None,          # Keep each user's study history in <dir>/user-<id>.db (None: single file)
+        SHARD_CACHE_SIZE=64,      # User shards kept open per worker process (LRU)
+        STORAGE_BACKEND='sqlite', # 'sqlite' (DATABASE) or 'postgres' (POSTGRES_DSN), see lib/storage.py
+        POSTGRES_DSN=None         # libpq connection string of the postgres backend
+    )
+
+    if test_config is not None:
         app.config.update(test_config)
     
     # Initialize database first since we need it for CORS configuration
-    app.db = Db(database=app.config['DATABASE'])
+    app.db = Db(
+        database=app.config['DATABASE'],
+        pool_size=app.config['DB_POOL_SIZE'],
+        pool_timeout=app.config['DB_POOL_TIMEOUT'],
+        pool_max_idle=app.config['DB_POOL_MAX_IDLE'],
+        pragmas=app.config['DB_PRAGMAS'],
+        shards_dir=app.config['SHARDS_DIR'],
+        shard_cache_size=app.config['SHARD_CACHE_SIZE']
+    )
+    
+    # Routes reach the database through the repositories of the selected
+    # storage backend; app.db stays the SQLite database of the maintenance tasks
+    app.storage = create_backend(app)
+    app.repositories = Repositories(app.storage)
+    
+    app.cache = ResponseCache(
+        max_entries=app.config['RESPONSE_CACHE_SIZE'],
+        default_ttl=app.config['RESPONSE_CACHE_TTL'],
+        enabled=app.config['RESPONSE_CACHE_ENABLED']
+    )
+    
+    app.payload_cache = PayloadCache(
+        max_entries=app.config['RAW_PAYLOAD_CACHE_SIZE'],
+        enabled=app.config['RESPONSE_CACHE_ENABLED']
+    )
+    
+    app.vocabulary = VocabularyStore() if app.config['VOCABULARY_STORE_ENABLED'] else None
+    
+    app.metrics = None
+    if app.config['METRICS_ENABLED']:
+        app.metrics = MetricsRegistry(slow_query_ms=app.config['SLOW_QUERY_MS'])
+        instrument(app, app.metrics)
+        if app.config['SLOW_QUERY_LOG']:
+            add_slow_query_log(app.config['SLOW_QUERY_LOG'])
     
     # Get allowed origins from study_activities table
     allowed_origins = get_allowed_origins(app)
     
+    # Build the vocabulary snapshot up front; a database that is not set up
+    # yet is loaded on the first request instead
+    if app.vocabulary is not None:
+        try:
+            with app.app_context():
+                app.repositories.words.snapshot(app.vocabulary, DEFAULT_USER_ID)
+        except Exception:
+            app.vocabulary.clear()
+    
     # In development, add localhost to allowed origins
     if app.debug:
         allowed_origins.extend(["http://localhost:8080", "http://127.0.0.1:8080"])
@@ -53,21 +121,24 @@ def create_app(test_config=None):
         r"/*": {
             "origins": allowed_origins,
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization", "X-User-Id"]
         }
     })
 
-    # Close database connection
+    # Return the database connection to the pool
     @app.teardown_appcontext
     def close_db(exception):
-        app.db.close()
+        app.storage.close()
 
     # load routes -----------
+    routes.users.load(app)
     routes.words.load(app)
     routes.groups.load(app)
     routes.study_sessions.load(app)
     routes.dashboard.load(app)
     routes.study_activities.load(app)
+    routes.metrics.load(app)
+    routes.shards.load(app)
     
     return app
 
@@ -0,0 +1,333 @@
+"""
+Benchmark every API endpoint against synthetic datasets of several sizes
+
+Each scenario requests one endpoint through the Flask test client, with
+IDs drawn from the whole dataset, and records per-request latency. The
+results are written as JSON (p50/p90/p95/p99 per scenario and dataset
+size) and can be checked against a baseline file: the run fails when a
+scenario's p95 exceeds its baseline by more than the tolerance, which is
+how a query that degrades from an index lookup to a scan gets noticed.
+
+Response caches are off by default so the SQL is measured; --cache turns
+them on. Datasets come from benchmarks/dataset.py and are cached.
+
+Usage (from backend-flask):
+    python benchmarks/api.py --size small --size medium [--iterations 50]
+        [--output results.json] [--baseline benchmarks/baseline.json]
+        [--write-baseline benchmarks/baseline.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import create_app
+from benchmarks.dataset import DEFAULT_CACHE_DIR, STUDY_ACTIVITIES, ensure_dataset, parse_size
+
+DEFAULT_ITERATIONS = 50
+WARMUP_ITERATIONS = 3
+
+# A result fails the gate when it exceeds baseline * (1 + TOLERANCE) + SLACK_MS;
+# the absolute slack keeps sub-millisecond endpoints from flapping
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_SLACK_MS = 2.0
+GATE_METRIC = 'p95_ms'
+
+REVIEWS_PER_REQUEST = 20
+
+
+class Scenario:
+    """
+    One timed request
+
+    ``path`` and ``body`` may be callables taking the request's sampled
+    keys. ``prepare`` runs untimed before each request (e.g. to create the
+    session it reviews) and may add keys. Destructive scenarios run last,
+    once.
+    """
+
+    def __init__(self, name, method, path, body=None, prepare=None, content_type=None,
+                 iterations=None, destructive=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.prepare = prepare
+        self.content_type = content_type
+        self.iterations = iterations
+        self.destructive = destructive
+
+    def request(self, client, keys):
+        if self.prepare:
+            self.prepare(client, keys)
+        path = self.path(keys) if callable(self.path) else self.path.format(**keys)
+        body = self.body(keys) if callable(self.body) else self.body
+        kwargs = {}
+        if isinstance(body, (bytes, str)):
+            kwargs['data'] = body
+            kwargs['content_type'] = self.content_type
+        elif body is not None:
+            kwargs['json'] = body
+        return self.method, path, kwargs
+
+
+def _open_session(client, keys):
+    response = client.post('/api/study_sessions', json={
+        'group_id': keys['group_id'], 'study_activity_id': keys['activity_id']
+    })
+    keys['open_session_id'] = response.get_json()['session_id']
+
+
+_user_names = itertools.count(1)
+
+
+def _reviews(keys):
+    rng = random.Random(keys['open_session_id'])
+    return [
+        {'word_id': keys['member_ids'][rng.randrange(len(keys['member_ids']))], 'is_correct': rng.random() < 0.7}
+        for _ in range(REVIEWS_PER_REQUEST)
+    ]
+
+
+SCENARIOS = [
+    Scenario('words_list', 'GET', '/api/words?page=1&per_page=50&sort_by=german'),
+    Scenario('words_list_last_page', 'GET', '/api/words?page={last_words_page}&per_page=50&sort_by=correct_count&order=desc'),
+    Scenario('words_list_cursor', 'GET', '/api/words?cursor=&per_page=50&sort_by=english'),
+    Scenario('words_search', 'GET', '/api/words/search?q=wort{word_id}'),
+    Scenario('words_export', 'GET', '/api/words/export', iterations=5),
+    Scenario('word_detail', 'GET', '/api/words/{word_id}'),
+    Scenario('groups_list', 'GET', '/api/groups'),
+    Scenario('group_detail', 'GET', '/api/groups/{group_id}'),
+    Scenario('group_words', 'GET', '/api/groups/{group_id}/words?page=1&per_page=50'),
+    Scenario('group_words_raw', 'GET', '/api/groups/{group_id}/words/raw'),
+    Scenario('group_due', 'GET', '/api/groups/{group_id}/due?limit=20'),
+    Scenario('group_study_sessions', 'GET', '/api/groups/{group_id}/study_sessions?sort_by=endTime&order=desc'),
+    Scenario('study_activities_list', 'GET', '/api/study-activities'),
+    Scenario('study_activity_detail', 'GET', '/api/study-activities/{activity_id}'),
+    Scenario('study_activity_sessions', 'GET', '/api/study-activities/{activity_id}/sessions?sort_by=accuracy'),
+    Scenario('study_activity_launch', 'GET', '/api/study-activities/{activity_id}/launch'),
+    Scenario('study_sessions_list', 'GET', '/api/study-sessions?page=1&per_page=10'),
+    Scenario('study_sessions_filtered', 'GET', '/api/study-sessions?sort_by=duration&min_accuracy=0.8'),
+    Scenario('study_session_detail', 'GET', '/api/study-sessions/{session_id}'),
+    Scenario('dashboard_recent_session', 'GET', '/api/dashboard/recent-session'),
+    Scenario('dashboard_stats', 'GET', '/api/dashboard/stats'),
+    Scenario('metrics', 'GET', '/api/_metrics'),
+    Scenario('users_list', 'GET', '/api/users'),
+    Scenario('user_detail', 'GET', '/api/users/1'),
+    Scenario('user_create', 'POST', '/api/users', body=lambda keys: {'name': f'bench-{next(_user_names)}'}),
+    Scenario('study_session_create', 'POST', '/api/study_sessions',
+             body=lambda keys: {'group_id': keys['group_id'], 'study_activity_id': keys['activity_id']}),
+    Scenario('study_session_review', 'POST', '/api/study_sessions/{open_session_id}/review',
+             body=lambda keys: {'reviews': _reviews(keys)}, prepare=_open_session),
+    Scenario('study_session_review_stream', 'POST', '/api/study_sessions/{open_session_id}/review/stream',
+             body=lambda keys: ''.join(json.dumps(review) + '\n' for review in _reviews(keys)),
+             prepare=_open_session, content_type='application/x-ndjson'),
+    Scenario('study_session_close', 'POST', '/api/study_sessions/{open_session_id}/close', prepare=_open_session),
+    Scenario('study_sessions_reset', 'POST', '/api/study-sessions/reset', destructive=True),
+]
+
+
+def percentiles(timings):
+    """
+    Latency summary of one scenario
+
+    Args:
+        timings: Request latencies in milliseconds
+
+    Returns:
+        dict: n, mean, p50, p90, p95, p99 and max in milliseconds
+    """
+    ordered = sorted(timings)
+    if len(ordered) > 1:
+        cuts = statistics.quantiles(ordered, n=100, method='inclusive')
+        p50, p90, p95, p99 = cuts[49], cuts[89], cuts[94], cuts[98]
+    else:
+        p50 = p90 = p95 = p99 = ordered[0]
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'p50_ms': round(p50, 3),
+        'p90_ms': round(p90, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def _keys(rng, size, members):
+    group_id = rng.randrange(1, size.groups + 1)
+    return {
+        'word_id': rng.randrange(1, size.words + 1),
+        'group_id': group_id,
+        'member_ids': members.get(group_id) or [1],
+        'session_id': rng.randrange(1, size.sessions + 1) if size.sessions else 1,
+        'activity_id': rng.randrange(1, len(STUDY_ACTIVITIES) + 1),
+        'last_words_page': max(1, -(-size.words // 50)),
+    }
+
+
+def run_scenarios(database, size, iterations=DEFAULT_ITERATIONS, cache=False, seed=42,
+                  scenarios=SCENARIOS, log=print):
+    """
+    Time every scenario against a copy of a dataset
+
+    Args:
+        database: Dataset path (left untouched; writes go to a copy)
+        size: DatasetSize of the dataset
+        iterations: Timed requests per scenario
+        cache: Keep the response caches enabled
+        seed: Seed for the sampled IDs
+        scenarios: Scenarios to run
+        log: Callback receiving one line per scenario, or None
+
+    Returns:
+        dict: scenario name -> percentiles()
+
+    Raises:
+        RuntimeError: If a request fails
+    """
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    copy = os.path.join(workdir, 'bench.db')
+    shutil.copyfile(database, copy)
+    app = create_app({
+        'DATABASE': copy,
+        'RESPONSE_CACHE_ENABLED': cache,
+        'SLOW_QUERY_MS': None,  # Instrumented as in production, without the log
+        'REVIEW_STREAM_CHUNK_SIZE': REVIEWS_PER_REQUEST,
+    })
+    try:
+        with app.app_context():
+            cursor = app.db.cursor(readonly=True)
+            cursor.execute('SELECT group_id, word_id FROM word_groups')
+            members = {}
+            for group_id, word_id in cursor.fetchall():
+                members.setdefault(group_id, []).append(word_id)
+            app.db.close()
+
+        client = app.test_client()
+        rng = random.Random(seed)
+        results = {}
+        for scenario in sorted(scenarios, key=lambda scenario: scenario.destructive):
+            count = 1 if scenario.destructive else (scenario.iterations or iterations)
+            warmup = 0 if scenario.destructive else min(WARMUP_ITERATIONS, count)
+            timings = []
+            for iteration in range(warmup + count):
+                method, path, kwargs = scenario.request(client, _keys(rng, size, members))
+                started = time.perf_counter()
+                response = client.open(path, method=method, **kwargs)
+                response.get_data()
+                elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{scenario.name}: {method} {path} returned {response.status_code}")
+                if iteration >= warmup:
+                    timings.append(elapsed)
+            results[scenario.name] = percentiles(timings)
+            if log:
+                summary = results[scenario.name]
+                log(f"  {scenario.name:30} p50 {summary['p50_ms']:9.2f} ms   p95 {summary['p95_ms']:9.2f} ms")
+        return results
+    finally:
+        app.db.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE, slack_ms=DEFAULT_SLACK_MS,
+                        metric=GATE_METRIC):
+    """
+    Find results that regressed against a baseline
+
+    Args:
+        results: {size name: {'scenarios': {name: percentiles}}}
+        baseline: Results of the same shape
+        tolerance: Allowed relative increase
+        slack_ms: Allowed absolute increase on top of it
+        metric: Percentile compared
+
+    Returns:
+        list: (size name, scenario, baseline value, result value) per
+        regression; scenarios missing from the baseline are skipped
+    """
+    regressions = []
+    for size_name, result in results.items():
+        expected = baseline.get(size_name, {}).get('scenarios', {})
+        for scenario, summary in result['scenarios'].items():
+            if scenario not in expected:
+                continue
+            limit = expected[scenario][metric] * (1 + tolerance) + slack_ms
+            if summary[metric] > limit:
+                regressions.append((size_name, scenario, expected[scenario][metric], summary[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', action='append', dest='sizes',
+                        help='Dataset preset or words=N,groups=N,sessions=N,reviews=N (repeatable, default small)')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cache', action='store_true', help='Keep the response caches enabled')
+    parser.add_argument('--scenario', action='append', dest='scenarios', help='Only run these scenarios')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Fail when a result regresses against this results file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--slack-ms', type=float, default=DEFAULT_SLACK_MS)
+    parser.add_argument('--write-baseline', help='Write the results to this file as the new baseline')
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.scenarios:
+        unknown = set(args.scenarios) - {scenario.name for scenario in SCENARIOS}
+        if unknown:
+            parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name in args.scenarios]
+
+    results = {}
+    for spec in args.sizes or ['small']:
+        name, size = parse_size(spec)
+        print(f"Dataset {name}: {size.words} words, {size.groups} groups, "
+              f"{size.sessions} sessions, {size.reviews} review items")
+        database = ensure_dataset(size, args.seed, args.cache_dir)
+        results[name] = {
+            'dataset': size._asdict(),
+            'iterations': args.iterations,
+            'cache': args.cache,
+            'scenarios': run_scenarios(database, size, args.iterations, args.cache, args.seed, scenarios),
+        }
+
+    if len(results) > 1:
+        smallest, largest = list(results.values())[0], list(results.values())[-1]
+        print("p50 growth from the first to the last dataset:")
+        for scenario, summary in largest['scenarios'].items():
+            base = smallest['scenarios'][scenario]['p50_ms']
+            print(f"  {scenario:30} {summary['p50_ms'] / base if base else float('inf'):7.1f}x")
+
+    for path in (args.output, args.write_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2)
+                file.write('\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(results, baseline, args.tolerance, args.slack_ms)
+        for size_name, scenario, expected, actual in regressions:
+            print(f"REGRESSION {size_name} {scenario}: {GATE_METRIC} {actual:.2f} ms (baseline {expected:.2f} ms)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+Synthetic benchmark databases of configurable size
+
+Builds a fully migrated words.db-style database with the requested number
+of words, groups, study sessions and review items, and the derived tables
+(word_reviews, learning statistics, review schedules) computed from them,
+so every endpoint sees consistent data. The whole history belongs to the
+default user, which the benchmark requests act as. Generation is deterministic for a
+given size, seed and day (the history ends on the day it is generated).
+Built databases are cached by size, seed and schema version, since the
+large presets take a while to generate.
+
+Usage (from backend-flask):
+    python benchmarks/dataset.py --size medium [--seed 42] [--cache-dir benchmarks/.data]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import create_app
+from lib.data_version import bump_versions
+from lib.migrations import load_migrations
+from lib.scheduler import TIMESTAMP_FORMAT, rebuild_schedule
+from lib.stats import rebuild_learning_stats
+
+DatasetSize = namedtuple('DatasetSize', ['words', 'groups', 'sessions', 'reviews'])
+
+PRESETS = {
+    'tiny': DatasetSize(words=200, groups=5, sessions=100, reviews=2_000),
+    'small': DatasetSize(words=2_000, groups=20, sessions=2_000, reviews=50_000),
+    'medium': DatasetSize(words=10_000, groups=100, sessions=20_000, reviews=1_000_000),
+    'large': DatasetSize(words=50_000, groups=500, sessions=100_000, reviews=5_000_000),
+}
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+
+STUDY_ACTIVITIES = [
+    ('Flashcards', 'about:blank', '/assets/study_activities/flashcards.png'),
+    ('Typing Tutor', 'about:blank', '/assets/study_activities/typing_tutor.png'),
+    ('Listening Quiz', 'about:blank', None),
+]
+
+# Share of words that also belong to a second group, of sessions that were
+# closed explicitly, and of correct answers
+SECOND_GROUP_RATE = 0.1
+CLOSED_SESSION_RATE = 0.9
+CORRECT_RATE = 0.7
+SECONDS_PER_REVIEW = 10
+HISTORY_DAYS = 365
+
+INSERT_BATCH = 100_000
+
+# Tables whose data versions are bumped once the data is in place
+ALL_TABLES = ('words', 'groups', 'word_groups', 'study_activities',
+              'study_sessions', 'word_review_items', 'word_reviews')
+
+
+def parse_size(spec):
+    """
+    Turn a preset name or 'words=N,groups=N,sessions=N,reviews=N' into a size
+
+    Returns:
+        (name, DatasetSize)
+    """
+    if spec in PRESETS:
+        return spec, PRESETS[spec]
+    try:
+        values = dict(part.split('=', 1) for part in spec.split(','))
+        size = DatasetSize(**{field: int(values[field]) for field in DatasetSize._fields})
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(
+            f"Unknown dataset size '{spec}': use one of {', '.join(PRESETS)} "
+            "or words=N,groups=N,sessions=N,reviews=N"
+        )
+    return f'{size.words}w-{size.groups}g-{size.sessions}s-{size.reviews}r', size
+
+
+def dataset_path(cache_dir, size, seed):
+    """Cache file for a size and seed at the current schema version"""
+    schema_version = load_migrations()[-1].version
+    name = f'bench-{size.words}w-{size.groups}g-{size.sessions}s-{size.reviews}r-seed{seed}-v{schema_version}.db'
+    return os.path.join(cache_dir, name)
+
+
+def ensure_dataset(size, seed=42, cache_dir=DEFAULT_CACHE_DIR, log=print):
+    """
+    Return the path of a built dataset, generating it if it is not cached
+
+    Args:
+        size: DatasetSize
+        seed: Random seed
+        cache_dir: Folder for the generated databases
+        log: Callback receiving progress messages, or None
+
+    Returns:
+        str: Database path
+    """
+    path = dataset_path(cache_dir, size, seed)
+    if os.path.exists(path):
+        return path
+    os.makedirs(cache_dir, exist_ok=True)
+    building = path + '.building'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(building + suffix):
+            os.unlink(building + suffix)
+    build_dataset(building, size, seed, log)
+    os.replace(building, path)
+    return path
+
+
+def build_dataset(path, size, seed=42, log=print):
+    """
+    Generate a database of the given size at ``path``
+
+    Args:
+        path: New database file
+        size: DatasetSize
+        seed: Random seed
+        log: Callback receiving progress messages, or None
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    app = create_app({'DATABASE': path, 'METRICS_ENABLED': False})
+    try:
+        with app.app_context():
+            connection = app.db.get()
+            cursor = connection.cursor()
+            app.db.setup_tables(app.db.cursor())
+
+            cursor.executemany('INSERT INTO study_activities (name, url, preview_url) VALUES (?, ?, ?)', STUDY_ACTIVITIES)
+            cursor.executemany(
+                "INSERT INTO words (german, pronunciation, english, parts, gender, plural) VALUES (?, ?, ?, ?, ?, ?)",
+                (_word(i, rng) for i in range(1, size.words + 1))
+            )
+            cursor.executemany(
+                'INSERT INTO groups (name) VALUES (?)',
+                [(f'Group {i}',) for i in range(1, size.groups + 1)]
+            )
+            members = _link_words(cursor, size, rng)
+            connection.commit()
+            log(f"  {size.words} words in {size.groups} groups")
+
+            _insert_history(cursor, connection, size, members, rng, log)
+
+            log("  deriving counters, statistics and schedules")
+            cursor.execute('''
+                INSERT INTO word_reviews (user_id, word_id, correct_count, wrong_count, last_reviewed)
+                SELECT user_id, word_id, SUM(correct), SUM(1 - correct), MAX(created_at)
+                FROM word_review_items
+                GROUP BY user_id, word_id
+            ''')
+            cursor.execute('''
+                UPDATE groups SET words_count = (
+                    SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id
+                )
+            ''')
+            rebuild_learning_stats(cursor)
+            rebuild_schedule(cursor)
+            bump_versions(cursor, *ALL_TABLES)
+            connection.commit()
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        log(f"  built in {time.perf_counter() - started:.1f}s")
+    finally:
+        app.db.dispose()
+
+
+def _word(i, rng):
+    gender = rng.choice(('der', 'die', 'das', None))
+    return (
+        f'wort{i}', f'/vɔʁt{i}/', f'word {i}', f'[{{"german": "wort{i}"}}]',
+        gender, f'wörter{i}' if gender else None
+    )
+
+
+def _link_words(cursor, size, rng):
+    # Every word gets a home group; some also join a second one
+    members = [[] for _ in range(size.groups + 1)]
+    links = []
+    for word_id in range(1, size.words + 1):
+        group_id = (word_id - 1) % size.groups + 1
+        links.append((word_id, group_id))
+        members[group_id].append(word_id)
+        if size.groups > 1 and rng.random() < SECOND_GROUP_RATE:
+            other = rng.randrange(1, size.groups + 1)
+            if other != group_id:
+                links.append((word_id, other))
+                members[other].append(word_id)
+    cursor.executemany('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)', links)
+    return members
+
+
+def _insert_history(cursor, connection, size, members, rng, log):
+    if not size.sessions:
+        return
+    # The history ends today; timestamps only depend on the seed and the date
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    history_start = today - timedelta(days=HISTORY_DAYS)
+    offsets = sorted(rng.random() * HISTORY_DAYS * 86400 for _ in range(size.sessions))
+    per_session, remainder = divmod(size.reviews, size.sessions)
+
+    sessions = []
+    reviews = []
+    inserted = 0
+    for index, offset in enumerate(offsets):
+        session_id = index + 1
+        group_id = rng.randrange(1, size.groups + 1)
+        started_at = history_start + timedelta(seconds=offset)
+        count = per_session + (1 if index < remainder else 0)
+        last_review_at = started_at + timedelta(seconds=SECONDS_PER_REVIEW * count)
+        ended_at = last_review_at.strftime(TIMESTAMP_FORMAT) if rng.random() < CLOSED_SESSION_RATE else None
+        sessions.append((
+            session_id, group_id, rng.randrange(1, len(STUDY_ACTIVITIES) + 1),
+            started_at.strftime(TIMESTAMP_FORMAT), ended_at
+        ))
+
+        words = members[group_id] or [rng.randrange(1, size.words + 1)]
+        for review in range(1, count + 1):
+            reviews.append((
+                rng.choice(words), session_id, 1 if rng.random() < CORRECT_RATE else 0,
+                (started_at + timedelta(seconds=SECONDS_PER_REVIEW * review)).strftime(TIMESTAMP_FORMAT)
+            ))
+        if len(reviews) >= INSERT_BATCH:
+            inserted += _flush_history(cursor, connection, sessions, reviews)
+            log(f"  {inserted} review items")
+
+    inserted += _flush_history(cursor, connection, sessions, reviews)
+    log(f"  {size.sessions} sessions, {inserted} review items")
+
+
+def _flush_history(cursor, connection, sessions, reviews):
+    cursor.executemany('''
+        INSERT INTO study_sessions (id, group_id, study_activity_id, created_at, ended_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', sessions)
+    cursor.executemany('''
+        INSERT INTO word_review_items (word_id, study_session_id, correct, created_at)
+        VALUES (?, ?, ?, ?)
+    ''', reviews)
+    connection.commit()
+    count = len(reviews)
+    sessions.clear()
+    reviews.clear()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='small',
+                        help=f"{', '.join(PRESETS)} or words=N,groups=N,sessions=N,reviews=N")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    name, size = parse_size(args.size)
+    print(f"Dataset {name}: {size.words} words, {size.groups} groups, "
+          f"{size.sessions} sessions, {size.reviews} review items")
+    print(ensure_dataset(size, args.seed, args.cache_dir))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark POST /api/study_sessions/<id>/review ingestion
+
+Compares the previous per-review loop (SELECT + INSERT + UPSERT for every
+review) against lib.reviews.ingest_reviews on a temporary database.
+
+Usage (from backend-flask):
+    python benchmarks/review_ingestion.py [--reviews 500] [--words 2000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import create_app
+from lib.reviews import missing_word_ids, ingest_reviews
+from lib.stats import record_reviews
+from lib.users import DEFAULT_USER_ID
+
+
+def legacy_ingest(cursor, session_id, reviews):
+    # The review loop as it was before the set-based rewrite
+    word_results = {}
+    for review in reviews:
+        cursor.execute('SELECT id FROM words WHERE id = ?', (review['word_id'],))
+        cursor.fetchone()
+        cursor.execute('''
+          INSERT INTO word_review_items (word_id, study_session_id, correct, created_at)
+          VALUES (?, ?, ?, datetime('now'))
+        ''', (review['word_id'], session_id, 1 if review['is_correct'] else 0))
+        cursor.execute('''
+          INSERT INTO word_reviews (user_id, word_id, correct_count, wrong_count, last_reviewed)
+          VALUES (?, ?, ?, ?, datetime('now'))
+          ON CONFLICT(user_id, word_id) DO UPDATE SET
+            correct_count = correct_count + ?,
+            wrong_count = wrong_count + ?,
+            last_reviewed = datetime('now')
+        ''', (
+            DEFAULT_USER_ID,
+            review['word_id'],
+            1 if review['is_correct'] else 0,
+            0 if review['is_correct'] else 1,
+            1 if review['is_correct'] else 0,
+            0 if review['is_correct'] else 1
+        ))
+        attempts, successes = word_results.get(review['word_id'], (0, 0))
+        word_results[review['word_id']] = (attempts + 1, successes + (1 if review['is_correct'] else 0))
+    record_reviews(cursor, DEFAULT_USER_ID, word_results)
+
+
+def bulk_ingest(cursor, session_id, reviews):
+    missing_word_ids(cursor, [review['word_id'] for review in reviews])
+    ingest_reviews(cursor, session_id, reviews, DEFAULT_USER_ID)
+
+
+def run(ingest, app, session_id, reviews, repeat):
+    timings = []
+    with app.app_context():
+        for _ in range(repeat):
+            cursor = app.db.cursor()
+            started = time.perf_counter()
+            ingest(cursor, session_id, reviews)
+            app.db.commit()
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reviews', type=int, default=500)
+    parser.add_argument('--words', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    try:
+        app = create_app({'DATABASE': db_path})
+        with app.app_context():
+            cursor = app.db.cursor()
+            app.db.setup_tables(cursor)
+            cursor.executemany(
+                "INSERT INTO words (german, pronunciation, english, parts) VALUES (?, '', ?, '[]')",
+                [(f'wort{i}', f'word{i}') for i in range(args.words)]
+            )
+            cursor.execute("INSERT INTO groups (name) VALUES ('Benchmark')")
+            cursor.execute("INSERT INTO study_activities (name, url) VALUES ('Benchmark', 'about:blank')")
+            cursor.execute("INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1)")
+            app.db.commit()
+
+        rng = random.Random(42)
+        reviews = [
+            {'word_id': rng.randint(1, args.words), 'is_correct': rng.random() < 0.7}
+            for _ in range(args.reviews)
+        ]
+
+        print(f"{args.reviews} reviews over {args.words} words, {args.repeat} runs each")
+        results = {}
+        for name, ingest in [('per-review loop', legacy_ingest), ('set-based', bulk_ingest)]:
+            timings = run(ingest, app, 1, reviews, args.repeat)
+            results[name] = statistics.median(timings)
+            print(f"  {name:16} median {results[name]:8.2f} ms   min {min(timings):8.2f} ms")
+        print(f"  speedup {results['per-review loop'] / results['set-based']:.1f}x")
+        app.db.dispose()
+    finally:
+        os.close(db_fd)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.unlink(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
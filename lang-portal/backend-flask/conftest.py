@@ -65,6 +65,7 @@ def app():
     yield app
     
     # Cleanup
+    app.db.dispose()
     os.close(db_fd)
     os.unlink(db_path)
 
@@ -0,0 +1,174 @@
+"""
+In-process response cache for read-mostly routes of the German Learning Portal API
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from flask import request, make_response, Response, g
+
+from lib.users import current_user_id
+
+
+class _Entry:
+    __slots__ = ('expires_at', 'tables', 'versions', 'body', 'status', 'mimetype')
+
+    def __init__(self, expires_at, tables, versions, body, status, mimetype):
+        self.expires_at = expires_at
+        self.tables = tables
+        self.versions = versions
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of rendered responses with per-route TTLs
+
+    Entries are keyed on the requesting user, the endpoint, its view
+    arguments and the sorted query arguments. Each entry records the
+    tables it was built from so write handlers can drop exactly the
+    entries they made stale with ``invalidate``. The cache is per process,
+    so under ``conditional_get`` entries also record the data versions
+    they were built at and are dropped once those move on; writes from
+    other workers or invoke tasks are then seen on the next request.
+    Elsewhere other processes' writes only show once entries expire.
+    """
+
+    def __init__(self, max_entries=512, default_ttl=60.0, enabled=True):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+
+        self._entries = OrderedDict()
+        self._generations = defaultdict(int)  # table -> invalidation count
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def cached(self, *tables, ttl=None):
+        """
+        Decorator caching a view's successful responses
+
+        Args:
+            tables: Tables the response is built from
+            ttl: Seconds an entry stays valid (defaults to ``default_ttl``)
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                key = self._make_key()
+                versions = g.get('data_versions')
+                entry = self._get(key, versions)
+                if entry is not None:
+                    return Response(entry.body, status=entry.status, mimetype=entry.mimetype)
+
+                generations = self._snapshot(tables)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self._set(key, tables, versions, generations, ttl, response)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tables):
+        """
+        Drop every entry built from any of the given tables
+
+        Call after the write transaction has been committed.
+
+        Args:
+            tables: Names of the modified tables
+        """
+        tables = set(tables)
+        with self._lock:
+            for table in tables:
+                self._generations[table] += 1
+            stale = [key for key, entry in self._entries.items() if tables & entry.tables]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Snapshot of the cache counters
+
+        Returns:
+            dict: Entry count, hits, misses, evictions, expirations, invalidations
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+    @staticmethod
+    def _make_key():
+        view_args = tuple(sorted((request.view_args or {}).items()))
+        query_args = tuple(sorted(request.args.items(multi=True)))
+        return (current_user_id(), request.endpoint, view_args, query_args)
+
+    def _snapshot(self, tables):
+        with self._lock:
+            return tuple(self._generations[table] for table in tables)
+
+    def _get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.versions != versions:
+                # Another process wrote to the tables since the entry was built
+                del self._entries[key]
+                self._invalidations += 1
+                self._misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def _set(self, key, tables, versions, generations, ttl, response):
+        ttl = self.default_ttl if ttl is None else ttl
+        entry = _Entry(
+            time.monotonic() + ttl,
+            frozenset(tables),
+            versions,
+            response.get_data(),
+            response.status_code,
+            response.mimetype
+        )
+        with self._lock:
+            # A write committed while the view ran may not be reflected in
+            # the response, so it must not be stored
+            if tuple(self._generations[table] for table in tables) != generations:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
@@ -0,0 +1,99 @@
+"""
+Per-table data versions and conditional GET support for the German Learning Portal API
+"""
+
+import functools
+import hashlib
+
+from flask import request, make_response, g
+
+from lib.storage import POSTGRES, Query, dialect_of
+from lib.users import current_user_id
+
+BUMP_VERSION = Query('''
+    INSERT INTO data_versions (table_name, version) VALUES (?, 1)
+    ON CONFLICT(table_name) DO UPDATE SET version = data_versions.version + 1
+''')
+
+
+def bump_versions(cursor, *tables):
+    """
+    Record that the given tables changed
+
+    Must run inside the same transaction as the write it describes.
+
+    Args:
+        cursor: Database cursor inside the write transaction
+        tables: Names of the modified tables
+    """
+    BUMP_VERSION.executemany(cursor, [(table,) for table in tables])
+
+
+def get_versions(cursor, tables):
+    """
+    Read the current version of each table
+
+    Args:
+        cursor: Database cursor
+        tables: Names of the tables
+
+    Returns:
+        dict: table name -> version (0 for tables never written)
+    """
+    # Shard connections (lib/shards.py) keep the versions of the user's
+    # tables in the shard and read the vocabulary's from the shared database
+    if dialect_of(cursor) == POSTGRES:
+        schemas = ('',)
+    else:
+        schemas = ('main.',) + tuple(f'{schema}.' for schema in getattr(cursor.connection, 'attached_schemas', ()))
+    placeholders = ','.join('?' * len(tables))
+    cursor.execute(
+        ' UNION ALL '.join(
+            f'SELECT table_name, version FROM {schema}data_versions WHERE table_name IN ({placeholders})'
+            for schema in schemas
+        ),
+        list(tables) * len(schemas)
+    )
+    versions = {table: 0 for table in tables}
+    for row in cursor.fetchall():
+        versions[row['table_name']] += row['version']
+    return versions
+
+
+def compute_etag(versions, path):
+    """Derive an ETag from table versions and the full request path"""
+    key = path + '|' + ','.join(f'{table}:{versions[table]}' for table in sorted(versions))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional_get(app, *tables):
+    """
+    Decorator adding ETag / If-None-Match handling to a read endpoint
+
+    The ETag is derived from the data versions of ``tables`` and the
+    requesting user, so a matching If-None-Match is answered with 304
+    without running the view's queries.
+
+    Args:
+        app: Flask application holding the storage backend
+        tables: Tables whose contents the endpoint's response depends on
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = get_versions(app.storage.cursor(readonly=True), tables)
+            etag = compute_etag(versions, f'{current_user_id()}:{request.full_path}')
+            # Views keying their own caches on the versions can reuse them
+            g.data_versions = versions
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+        return wrapper
+    return decorator
@@ -1,30 +1,142 @@
 import sqlite3
 import json
-from flask import g
+from flask import g, has_request_context
+
+from lib.pool import ConnectionPool
+from lib.seed import seed_words, seed_study_activities
+from lib.migrations import load_migrations, migrate as run_migrations, plan as plan_migrations
+from lib.metrics import TracedCursor
+from lib.shards import ShardRouter, connect_shard
+from lib.users import current_user_id
+
+DEFAULT_PRAGMAS = {
+  'journal_mode': 'WAL',       # Readers no longer block on the review writer
+  'synchronous': 'NORMAL',     # Safe with WAL, skips an fsync per commit
+  'mmap_size': 268435456,      # 256 MiB of memory-mapped I/O
+  'cache_size': -20000,        # Negative values are KiB, so ~20 MiB page cache
+  'busy_timeout': 5000         # Milliseconds to wait on a locked database
+}
 
 class Db:
-  def __init__(self, database='words.db'):
+  def __init__(self, database='words.db', pool_size=5, pool_timeout=30.0, pool_max_idle=300.0, pragmas=None,
+               shards_dir=None, shard_cache_size=64):
     self.database = database
     self.connection = None
+    self.tracer = None  # lib.metrics.MetricsRegistry timing every cursor, if set
+    self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+
+    # All writes go through a single connection so they are serialized in
+    # the pool rather than fighting over SQLite's database lock
+    self.pool = ConnectionPool(
+      self.connect,
+      max_size=1,
+      timeout=pool_timeout,
+      max_idle=pool_max_idle
+    )
+    self.read_pool = ConnectionPool(
+      lambda: self.connect(readonly=True),
+      max_size=pool_size,
+      timeout=pool_timeout,
+      max_idle=pool_max_idle
+    )
+
+    # Sharded storage (lib/shards.py): requests read and write the current
+    # user's shard file, with this database attached as the shared,
+    # read-only vocabulary. Work outside a request, like setup, migrations
+    # and seeding, and cursors asked for with shared=True use this
+    # database directly.
+    self.shards = None
+    if shards_dir is not None:
+      self.shards = ShardRouter(
+        shards_dir,
+        lambda path, readonly: self.connect(readonly=readonly, shard=path),
+        max_open=shard_cache_size,
+        pool_size=pool_size,
+        pool_timeout=pool_timeout,
+        pool_max_idle=pool_max_idle
+      )
 
-  def get(self):
-    if 'db' not in g:
-      g.db = sqlite3.connect(self.database)
-      g.db.row_factory = sqlite3.Row  # Return rows as dictionaries
+  def connect(self, readonly=False, shard=None):
+    # Pooled connections move between worker threads, one request at a time
+    if shard is None:
+      connection = sqlite3.connect(self.database, check_same_thread=False)
+    else:
+      connection = connect_shard(shard, self.database)
+    connection.row_factory = sqlite3.Row  # Return rows as dictionaries
+    for name, value in self.pragmas.items():
+      if value is not None:
+        connection.execute(f'PRAGMA {name} = {value}')
+    if readonly:
+      connection.execute('PRAGMA query_only = ON')
+    return connection
+
+  def get(self, readonly=False, shared=False):
+    # Check a connection out of the pool for the lifetime of the app context.
+    # Once a request holds the writer it also reads through it, so it always
+    # sees its own uncommitted changes.
+    if self.shards is not None and not shared and has_request_context():
+      return self.get_shard(current_user_id(), readonly=readonly)
+    if 'db' in g:
+      return g.db
+    if readonly:
+      if 'db_read' not in g:
+        g.db_read = self.read_pool.checkout()
+      return g.db_read
+    g.db = self.pool.checkout()
     return g.db
 
-  def commit(self):
-    self.get().commit()
+  # A user's shard connection, held like the shared ones. Connections are
+  # kept per user, as one app context can serve requests of several users.
+  def get_shard(self, user_id, readonly=False):
+    held = g.setdefault('db_shards', {})
+    if (user_id, False) in held:
+      return held[(user_id, False)][1]
+    if (user_id, readonly) not in held:
+      held[(user_id, readonly)] = self.shards.checkout(user_id, readonly=readonly)
+    return held[(user_id, readonly)][1]
+
+  def commit(self, shared=False):
+    self.get(shared=shared).commit()
 
-  def cursor(self):
+  def cursor(self, readonly=False, shared=False):
     # Ensure the connection is valid before getting a cursor
-    connection = self.get()
-    return connection.cursor()
+    connection = self.get(readonly=readonly, shared=shared)
+    if self.tracer is None:
+      return connection.cursor()
+    cursor = TracedCursor(connection.cursor(), self.tracer)
+    g.setdefault('db_cursors', []).append(cursor)
+    return cursor
+
+  # Report the current statement of every traced cursor of this context
+  def finish_cursors(self):
+    for cursor in g.get('db_cursors', ()):
+      cursor.finish()
 
   def close(self):
+    # Report the last statements while the connections are still ours, then
+    # return the connections to their pools
+    self.finish_cursors()
+    g.pop('db_cursors', None)
     db = g.pop('db', None)
     if db is not None:
-      db.close()
+      self.pool.checkin(db)
+    db_read = g.pop('db_read', None)
+    if db_read is not None:
+      self.read_pool.checkin(db_read)
+    for pool, connection in g.pop('db_shards', {}).values():
+      pool.checkin(connection)
+
+  def dispose(self):
+    self.pool.close_all()
+    self.read_pool.close_all()
+    if self.shards is not None:
+      self.shards.close_all()
+
+  def pool_stats(self):
+    return {
+      'write': self.pool.stats(),
+      'read': self.read_pool.stats()
+    }
 
   # Function to load SQL from a file
   def sql(self, filepath):
@@ -59,81 +171,44 @@ class Db:
     cursor.execute(self.sql('setup/create_table_study_sessions.sql'))
     self.get().commit()
 
-  def import_study_activities_json(self,cursor,data_json_path):
-    study_actvities = self.load_json(data_json_path)
-    for activity in study_actvities:
-      cursor.execute('''
-      INSERT INTO study_activities (name,url,preview_url) VALUES (?,?,?)
-      ''', (activity['name'],activity['url'],activity['preview_url'],))
-    self.get().commit()
+    self.migrate(cursor)
+
+  # List the versioned migrations in sql/migrations as (version, filename)
+  def migrations(self):
+    return [(migration.version, migration.filename) for migration in load_migrations()]
+
+  # Apply the migrations not yet recorded in schema_migrations, each in its
+  # own transaction; with dry_run only list them. Returns the filenames.
+  def migrate(self, cursor, dry_run=False, log=None):
+    results = run_migrations(self.get(), dry_run=dry_run, log=log)
+    return [migration.filename for migration, _ in results]
 
-  def import_word_json(self,cursor,group_name,data_json_path):
-      # Insert a new group
-      cursor.execute('''
-        INSERT INTO groups (name) VALUES (?)
-      ''', (group_name,))
-      self.get().commit()
-
-      # Get the ID of the group
-      cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
-      core_verbs_group_id = cursor.fetchone()[0]
-
-      # Insert some sample words (verbs) from JSON file and associate with the group
-      words = self.load_json(data_json_path)
-
-      for word in words:
-        # Insert the word into the words table
-        cursor.execute('''
-          INSERT INTO words (german, pronunciation, english, parts, gender, plural) VALUES (?, ?, ?, ?, ?, ?)
-        ''', (word['german'], word['pronunciation'], word['english'], json.dumps(word['parts']), word.get('gender'), word.get('plural')))
-        
-        # Get the last inserted word's ID
-        word_id = cursor.lastrowid
-
-        # Insert the word-group relationship into word_groups table
-        cursor.execute('''
-          INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)
-        ''', (word_id, core_verbs_group_id))
-      self.get().commit()
-
-      # Update the words_count in the groups table by counting all words in the group
-      cursor.execute('''
-        UPDATE groups
-        SET words_count = (
-          SELECT COUNT(*) FROM word_groups WHERE group_id = ?
-        )
-        WHERE id = ?
-      ''', (core_verbs_group_id, core_verbs_group_id))
-
-      self.get().commit()
-
-      print(f"Successfully added {len(words)} verbs to the '{group_name}' group.")
-
-  # Initialize the database with sample data
+  # Current version, pending and modified migrations, without writing
+  def migration_plan(self):
+    return plan_migrations(self.get(readonly=True), load_migrations())
+
+  # Initialize the database with sample data. Safe to run repeatedly: seed
+  # files that have not changed since the last run are skipped, and only new
+  # or changed records of the others are written.
   def init(self, app):
     with app.app_context():
-      cursor = self.cursor()
-      self.setup_tables(cursor)
-      self.import_word_json(
-        cursor=cursor,
-        group_name='Core Verbs',
-        data_json_path='seed/data_verbs.json'
-      )
-      self.import_word_json(
-        cursor=cursor,
-        group_name='Core Adjectives',
-        data_json_path='seed/data_adjectives.json'
-      )
-      self.import_word_json(
-        cursor=cursor,
-        group_name='Core Nouns',
-        data_json_path='seed/data_nouns.json'
-      )
-
-      self.import_study_activities_json(
-        cursor=cursor,
-        data_json_path='seed/study_activities.json'
-      )
+      try:
+        cursor = self.cursor()
+        self.setup_tables(cursor)
+        results = [
+          seed_words(self.get(), 'seed/data_verbs.json', 'Core Verbs'),
+          seed_words(self.get(), 'seed/data_adjectives.json', 'Core Adjectives'),
+          seed_words(self.get(), 'seed/data_nouns.json', 'Core Nouns'),
+          seed_study_activities(self.get(), 'seed/study_activities.json')
+        ]
+      finally:
+        self.close()
+      for result in results:
+        if result.skipped:
+          print(f"{result.path}: unchanged, skipped.")
+        else:
+          print(f"{result.path}: {result.added} added, {result.updated} updated, {result.unchanged} unchanged.")
+      return results
 
 # Create an instance of the Db class
 db = Db()
@@ -0,0 +1,280 @@
+"""
+Bulk vocabulary import for the German Learning Portal database
+
+Word lists are read record by record from JSON arrays, NDJSON or CSV files
+and written in batches: each batch goes into a temporary staging table with
+one executemany, and set-based statements then create missing groups, add
+words that do not exist yet and link them to their groups. A word is
+identified by its German and English text, so a word listed in several
+groups or imported twice is stored once. Group word counts are recomputed
+once per touched group at the end.
+"""
+
+import csv
+import json
+import os
+import time
+from collections import namedtuple
+
+from lib.data_version import bump_versions
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Bytes read at a time from JSON array files
+READ_SIZE = 64 * 1024
+
+REQUIRED_FIELDS = ('german', 'pronunciation', 'english')
+
+ImportResult = namedtuple('ImportResult', [
+    'records', 'words_added', 'links_added', 'groups', 'seconds'
+])
+
+
+def detect_format(path):
+    """Infer the input format ('json', 'ndjson' or 'csv') from a file name"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if extension == '.csv':
+        return 'csv'
+    return 'json'
+
+
+def iter_json_array_file(file, read_size=READ_SIZE):
+    """
+    Yield the elements of a top-level JSON array without loading the file
+
+    Args:
+        file: Text file positioned at the start of the array
+        read_size: Characters read per refill of the buffer
+
+    Yields:
+        Decoded array elements
+
+    Raises:
+        ValueError: If the file is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill():
+        # Drop the consumed prefix and append the next block of the file
+        nonlocal buffer, position, eof
+        data = file.read(read_size)
+        buffer = buffer[position:] + data
+        position = 0
+        eof = not data
+        return not eof
+
+    def next_character():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return ''
+
+    if next_character() != '[':
+        raise ValueError("Expected a JSON array of word records")
+    position += 1
+    if next_character() == ']':
+        return
+
+    while True:
+        next_character()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not fill():
+                    raise
+                continue
+            # A value ending exactly at the buffer end may be cut short
+            if end == len(buffer) and not eof and fill():
+                continue
+            break
+        position = end
+        yield value
+
+        character = next_character()
+        if character == ']':
+            return
+        if character != ',':
+            raise ValueError("Expected ',' or ']' in JSON array")
+        position += 1
+
+
+def iter_records(path, file_format=None):
+    """
+    Stream word records from a JSON array, NDJSON or CSV file
+
+    CSV files need german, pronunciation and english columns and may have
+    parts (as JSON text), gender, plural and group columns.
+
+    Args:
+        path: Input file
+        file_format: 'json', 'ndjson' or 'csv'; inferred from the extension
+            when omitted
+
+    Yields:
+        dict: Raw word records
+    """
+    file_format = file_format or detect_format(path)
+    with open(path, 'r', encoding='utf-8', newline='' if file_format == 'csv' else None) as file:
+        if file_format == 'csv':
+            for row in csv.DictReader(file):
+                if row.get('parts'):
+                    row['parts'] = json.loads(row['parts'])
+                yield row
+        elif file_format == 'ndjson':
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array_file(file)
+
+
+def normalize_record(record, number, group_name=None):
+    """
+    Validate a raw record and convert it to a staging row
+
+    Args:
+        record: Raw word record
+        number: 1-based position of the record, for error messages
+        group_name: Group for records without their own 'group' field
+
+    Returns:
+        tuple: Values for the staging table
+
+    Raises:
+        ValueError: If a required field is missing
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"Record {number}: expected an object")
+    for field in REQUIRED_FIELDS:
+        if not record.get(field):
+            raise ValueError(f"Record {number}: missing required field '{field}'")
+
+    group = record.get('group') or group_name
+    if not group:
+        raise ValueError(f"Record {number}: no group given")
+
+    parts = record.get('parts')
+    return (
+        record['german'],
+        record['pronunciation'],
+        record['english'],
+        parts if isinstance(parts, str) else json.dumps(parts if parts is not None else []),
+        record.get('gender') or None,
+        record.get('plural') or None,
+        group,
+    )
+
+
+def import_words(connection, records, group_name=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Import word records in batched transactions
+
+    Args:
+        connection: Writable database connection; every batch is committed
+        records: Iterable of raw word records
+        group_name: Group for records without a 'group' field
+        batch_size: Records per transaction
+        progress: Optional callback receiving the running record count
+
+    Returns:
+        ImportResult
+    """
+    started = time.perf_counter()
+    cursor = connection.cursor()
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS import_staging (
+            german TEXT NOT NULL,
+            pronunciation TEXT NOT NULL,
+            english TEXT NOT NULL,
+            parts TEXT NOT NULL,
+            gender TEXT,
+            plural TEXT,
+            group_name TEXT NOT NULL
+        )
+    ''')
+
+    total = words_added = links_added = 0
+    touched_groups = set()
+    batch = []
+
+    def flush():
+        nonlocal words_added, links_added
+        added_words, added_links, groups = _write_batch(cursor, batch)
+        bump_versions(cursor, 'words', 'groups', 'word_groups')
+        connection.commit()
+        words_added += added_words
+        links_added += added_links
+        touched_groups.update(groups)
+        batch.clear()
+        if progress:
+            progress(total)
+
+    for number, record in enumerate(records, start=1):
+        batch.append(normalize_record(record, number, group_name))
+        total = number
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if touched_groups:
+        placeholders = ','.join('?' * len(touched_groups))
+        cursor.execute(f'''
+            UPDATE groups SET words_count = (
+                SELECT COUNT(*) FROM word_groups WHERE word_groups.group_id = groups.id
+            )
+            WHERE name IN ({placeholders})
+        ''', sorted(touched_groups))
+        bump_versions(cursor, 'groups')
+        connection.commit()
+
+    cursor.execute('DROP TABLE IF EXISTS temp.import_staging')
+    return ImportResult(total, words_added, links_added, sorted(touched_groups), time.perf_counter() - started)
+
+
+def _write_batch(cursor, rows):
+    cursor.execute('DELETE FROM import_staging')
+    cursor.executemany('''
+        INSERT INTO import_staging (german, pronunciation, english, parts, gender, plural, group_name)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+    cursor.execute('''
+        INSERT INTO groups (name)
+        SELECT DISTINCT s.group_name FROM import_staging s
+        WHERE NOT EXISTS (SELECT 1 FROM groups g WHERE g.name = s.group_name)
+    ''')
+
+    # First occurrence of each word wins within a batch
+    cursor.execute('''
+        INSERT INTO words (german, pronunciation, english, parts, gender, plural)
+        SELECT s.german, s.pronunciation, s.english, s.parts, s.gender, s.plural
+        FROM import_staging s
+        WHERE s.rowid IN (SELECT MIN(rowid) FROM import_staging GROUP BY german, english)
+          AND NOT EXISTS (
+            SELECT 1 FROM words w WHERE w.german = s.german AND w.english = s.english
+          )
+        ORDER BY s.rowid
+    ''')
+    words_added = cursor.rowcount
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO word_groups (word_id, group_id)
+        SELECT DISTINCT w.id, g.id
+        FROM import_staging s
+        JOIN words w ON w.german = s.german AND w.english = s.english
+        JOIN groups g ON g.name = s.group_name
+    ''')
+    links_added = cursor.rowcount
+
+    return words_added, links_added, {row[6] for row in rows}
@@ -0,0 +1,109 @@
+"""
+Streaming JSON serialization for the German Learning Portal API
+
+Unpaginated and export endpoints write their rows straight from the cursor
+in ``fetchmany`` batches, so a response never holds more than one batch of
+rows and one encoded chunk in memory, however large the result.
+"""
+
+import json
+
+from flask import Response, stream_with_context
+
+# Rows fetched from the cursor and encoded per yielded chunk
+DEFAULT_BATCH_SIZE = 500
+
+
+def encode_row_dict(row):
+    """Default row encoder: every column of the row as a JSON object"""
+    return json.dumps(dict(row))
+
+
+def row_encoder(raw_columns=()):
+    """
+    Build a row encoder that embeds already serialized JSON columns as is
+
+    Columns such as words.parts hold JSON text; copying that text into the
+    output avoids parsing and re-encoding it for every row. The query must
+    map values that are not valid JSON to NULL (e.g. with json_valid()).
+
+    Args:
+        raw_columns: Names of the columns holding JSON text
+
+    Returns:
+        function: Encoder for iter_json_array / iter_json_document
+    """
+    raw_columns = frozenset(raw_columns)
+
+    def encode(row):
+        return '{' + ', '.join(
+            json.dumps(key) + ': ' + (
+                (row[key] or 'null') if key in raw_columns else json.dumps(row[key])
+            )
+            for key in row.keys()
+        ) + '}'
+    return encode
+
+
+def iter_json_array(cursor, encode_row=encode_row_dict, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Encode the remaining rows of an executed cursor as a JSON array
+
+    Args:
+        cursor: Cursor on which the query has been executed
+        encode_row: Function turning one row into a JSON text
+        batch_size: Rows fetched per chunk
+
+    Yields:
+        bytes: UTF-8 encoded chunks of the array
+    """
+    yield b'['
+    separator = ''
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        parts = []
+        for row in rows:
+            parts.append(separator)
+            parts.append(encode_row(row))
+            separator = ', '
+        yield ''.join(parts).encode('utf-8')
+    yield b']'
+
+
+def iter_json_document(fields, array_key, cursor, encode_row=encode_row_dict,
+                       batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Encode a JSON object of fixed fields plus one streamed array
+
+    Args:
+        fields: dict of small values written before the array
+        array_key: Key of the streamed array
+        cursor: Cursor on which the array's query has been executed
+        encode_row: Function turning one row into a JSON text
+        batch_size: Rows fetched per chunk
+
+    Yields:
+        bytes: UTF-8 encoded chunks of the object
+    """
+    head = json.dumps(fields)[1:-1]
+    yield ('{' + head + (', ' if head else '') + json.dumps(array_key) + ': ').encode('utf-8')
+    yield from iter_json_array(cursor, encode_row, batch_size)
+    yield b'}'
+
+
+def json_stream_response(chunks, mimetype='application/json'):
+    """
+    Send encoded chunks as a streamed response
+
+    The request context, and with it the request's database connection,
+    stays open until the last chunk has been sent.
+
+    Args:
+        chunks: Iterable of bytes, e.g. from iter_json_document
+
+    Returns:
+        Response
+    """
+    return Response(stream_with_context(chunks), mimetype=mimetype)
@@ -0,0 +1,383 @@
+"""
+Request and SQL instrumentation for the German Learning Portal API
+
+MetricsRegistry keeps per-process histograms of request wall time, queries
+per request and statement latency, plus counters of rows returned and slow
+statements, labelled by route. Db hands out TracedCursor wrappers while a
+registry is attached, so every statement a route runs is timed from
+``execute`` until the next statement or the end of the request, including
+the time spent fetching its rows. Statements slower than the threshold are
+logged to the ``lib.metrics.slow_queries`` logger with their query plan.
+``render`` produces the Prometheus text exposition format.
+"""
+
+import bisect
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from flask import g, has_app_context, request
+
+slow_query_logger = logging.getLogger('lib.metrics.slow_queries')
+
+# Seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# Endpoint label for statements run outside a request (startup, tasks)
+NO_ENDPOINT = 'none'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label combination"""
+
+    def __init__(self, name, help, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self, *labels):
+        """(bucket counts, sum, count) of one series, buckets not cumulative"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                return [0] * len(self.buckets), 0, 0
+            return list(series[:-2]), series[-2], series[-1]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{_format_labels(self.label_names, labels, ("le", _format_value(bound)))} {cumulative}'
+                )
+            lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, ("le", "+Inf"))} {values[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(float(values[-2]))}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {values[-1]}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label combination"""
+
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}')
+        return lines
+
+
+def render_samples(name, help, kind, samples):
+    """
+    Render a gauge or counter family from already collected values
+
+    Args:
+        name: Metric name
+        help: HELP text
+        kind: 'gauge' or 'counter'
+        samples: List of (labels dict, value) pairs
+
+    Returns:
+        list: Exposition format lines
+    """
+    lines = [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+    for labels, value in samples:
+        lines.append(f'{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}')
+    return lines
+
+
+class RequestTrace:
+    """Per-request totals, kept in ``g.request_trace``"""
+
+    __slots__ = ('endpoint', 'started', 'queries', 'query_seconds', 'rows')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.rows = 0
+
+
+def explain(connection, sql, parameters):
+    """
+    EXPLAIN QUERY PLAN of a statement, one plan step per line
+
+    Returns:
+        list: Plan details, or a single note if the plan is unavailable
+    """
+    try:
+        rows = connection.execute('EXPLAIN QUERY PLAN ' + sql, parameters or ()).fetchall()
+    except sqlite3.Error as error:
+        return [f'plan unavailable: {error}']
+    return [row[3] for row in rows]
+
+
+class MetricsRegistry:
+    """
+    Per-process request and query metrics
+
+    Args:
+        slow_query_ms: Statements at least this slow are counted and logged
+            with their query plan; None disables the slow-query log
+    """
+
+    def __init__(self, slow_query_ms=100.0):
+        self.slow_query_seconds = slow_query_ms / 1000 if slow_query_ms is not None else None
+
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'Request wall time until the response is returned.',
+            ('method', 'endpoint', 'status')
+        )
+        self.request_queries = Histogram(
+            'http_request_db_queries', 'SQL statements run per request.',
+            ('endpoint',), QUERY_COUNT_BUCKETS
+        )
+        self.query_duration = Histogram(
+            'db_query_duration_seconds', 'SQL statement latency including fetching its rows.',
+            ('endpoint',)
+        )
+        self.rows_returned = Counter('db_rows_returned_total', 'Rows fetched from SQL statements.', ('endpoint',))
+        self.slow_queries = Counter('db_slow_queries_total', 'SQL statements over the slow-query threshold.', ('endpoint',))
+
+    def record_query(self, connection, sql, parameters, seconds, rows):
+        """
+        Record one finished statement
+
+        Args:
+            connection: Connection the statement ran on, for EXPLAIN
+            sql: Statement text
+            parameters: Bound parameters, or None if it cannot be explained
+            seconds: Time spent executing and fetching
+            rows: Rows fetched
+        """
+        trace = g.get('request_trace') if has_app_context() else None
+        endpoint = trace.endpoint if trace is not None else NO_ENDPOINT
+        if trace is not None:
+            trace.queries += 1
+            trace.query_seconds += seconds
+            trace.rows += rows
+
+        self.query_duration.observe(seconds, endpoint)
+        if rows:
+            self.rows_returned.inc(rows, endpoint)
+
+        if self.slow_query_seconds is not None and seconds >= self.slow_query_seconds:
+            self.slow_queries.inc(1, endpoint)
+            plan = explain(connection, sql, parameters) if parameters is not None else []
+            slow_query_logger.warning(
+                "Slow query on %s: %.1f ms, %d rows\n  %s%s",
+                endpoint, seconds * 1000, rows, re.sub(r'\s+', ' ', re.sub(r'--[^\n]*', '', sql)).strip(),
+                ''.join(f'\n  plan: {step}' for step in plan)
+            )
+
+    def start_request(self):
+        rule = request.url_rule
+        g.request_trace = RequestTrace(rule.rule if rule is not None else 'unmatched')
+
+    def finish_request(self, response):
+        """Record the request and add a Server-Timing header to its response"""
+        trace = g.pop('request_trace', None)
+        if trace is None:
+            return response
+        seconds = time.perf_counter() - trace.started
+        self.request_duration.observe(seconds, request.method, trace.endpoint, str(response.status_code))
+        self.request_queries.observe(trace.queries, trace.endpoint)
+        response.headers['Server-Timing'] = (
+            f'db;dur={trace.query_seconds * 1000:.2f};desc="{trace.queries} queries, {trace.rows} rows", '
+            f'total;dur={seconds * 1000:.2f}'
+        )
+        return response
+
+    def render(self, extra_lines=()):
+        """
+        All metrics in the Prometheus text exposition format
+
+        Args:
+            extra_lines: Lines of further families, e.g. from render_samples
+
+        Returns:
+            str
+        """
+        lines = []
+        for metric in (self.request_duration, self.request_queries, self.query_duration,
+                       self.rows_returned, self.slow_queries):
+            lines.extend(metric.render())
+        lines.extend(extra_lines)
+        return '\n'.join(lines) + '\n'
+
+
+class TracedCursor:
+    """
+    sqlite3 cursor wrapper reporting each statement to a MetricsRegistry
+
+    A statement's time covers ``execute`` and every fetch up to the next
+    statement, ``close`` or ``finish``; Db.close finishes the cursors of a
+    request before returning its connections.
+    """
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._sql = None
+        self._parameters = None
+        self._seconds = 0.0
+        self._rows = 0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def execute(self, sql, parameters=()):
+        return self._run(self._cursor.execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(self._cursor.executemany, sql, seq_of_parameters, None)
+
+    def executescript(self, sql_script):
+        self.finish()
+        started = time.perf_counter()
+        try:
+            self._cursor.executescript(sql_script)
+        finally:
+            self._begin(sql_script, None, time.perf_counter() - started)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._seconds += time.perf_counter() - started
+        if row is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+        self._seconds += time.perf_counter() - started
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._seconds += time.perf_counter() - started
+        self._rows += len(rows)
+        return rows
+
+    def close(self):
+        self.finish()
+        self._cursor.close()
+
+    def finish(self):
+        """Report the current statement, if any"""
+        if self._sql is None:
+            return
+        sql, self._sql = self._sql, None
+        self._metrics.record_query(self._cursor.connection, sql, self._parameters, self._seconds, self._rows)
+
+    def _run(self, method, sql, arguments, parameters):
+        self.finish()
+        started = time.perf_counter()
+        try:
+            method(sql, arguments)
+        finally:
+            self._begin(sql, parameters, time.perf_counter() - started)
+        return self
+
+    def _begin(self, sql, parameters, seconds):
+        self._sql = sql
+        self._parameters = parameters
+        self._seconds = seconds
+        self._rows = 0
+
+
+def instrument(app, metrics):
+    """
+    Trace the app's requests and database cursors into ``metrics``
+
+    Args:
+        app: Flask app with ``app.db``
+        metrics: MetricsRegistry
+    """
+    app.db.tracer = metrics
+    app.before_request(metrics.start_request)
+
+    @app.after_request
+    def finish_request(response):
+        # Streamed responses are still reading from their cursors; those
+        # statements are reported when the app context closes
+        if not response.is_streamed:
+            app.db.finish_cursors()
+        return metrics.finish_request(response)
+
+
+def add_slow_query_log(path):
+    """Also write the slow-query log to ``path`` (once per process)"""
+    path = os.path.abspath(path)
+    if any(getattr(handler, 'baseFilename', None) == path for handler in slow_query_logger.handlers):
+        return
+    handler = logging.FileHandler(path, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    slow_query_logger.addHandler(handler)
@@ -0,0 +1,243 @@
+"""
+Versioned schema migrations for the German Learning Portal database
+
+Migrations are the numbered ``.sql`` files in sql/migrations. Applied
+versions are recorded in the schema_migrations table together with the
+file's checksum and how long it took; databases that predate the table are
+adopted from their ``PRAGMA user_version``, which is still kept in step.
+
+A regular migration runs in a single transaction: it is applied and
+recorded completely or not at all. A file whose first line is
+``-- migrate: online`` is applied one statement per transaction instead, so
+the write lock is only held while one statement (typically one CREATE INDEX
+on a large table) runs and the app's writers get through in between. Online
+migrations must therefore be idempotent (``IF NOT EXISTS``): an interrupted
+run is simply resumed by the next one.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+MIGRATIONS_DIR = 'sql/migrations'
+ONLINE_MARKER = '-- migrate: online'
+
+# Attempts and pause (seconds) for an online statement that finds the
+# database locked by the app's writer
+ONLINE_RETRIES = 5
+ONLINE_RETRY_DELAY = 1.0
+
+Migration = namedtuple('Migration', ['version', 'filename', 'sql', 'checksum', 'online'])
+MigrationPlan = namedtuple('MigrationPlan', ['current_version', 'pending', 'modified'])
+
+
+class MigrationError(Exception):
+    """Raised when a migration fails; its transaction has been rolled back"""
+
+    def __init__(self, migration, error):
+        super().__init__(f"Migration {migration.filename} failed: {error}")
+        self.migration = migration
+        self.error = error
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """
+    Read the migration files in version order
+
+    Args:
+        directory: Folder holding the NNNN_name.sql files
+
+    Returns:
+        list: Migration records
+    """
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.sql'):
+            continue
+        with open(os.path.join(directory, filename), 'r', encoding='utf-8') as file:
+            sql = file.read()
+        migrations.append(Migration(
+            version=int(filename.split('_', 1)[0]),
+            filename=filename,
+            sql=sql,
+            checksum=hashlib.sha256(sql.encode('utf-8')).hexdigest(),
+            online=sql.lstrip().startswith(ONLINE_MARKER)
+        ))
+    return migrations
+
+
+def split_statements(sql):
+    """
+    Split a migration script into complete statements
+
+    Uses sqlite3.complete_statement, so trigger bodies with their own
+    semicolons stay in one piece.
+    """
+    statements = []
+    current = ''
+    for line in sql.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            if current.strip():
+                statements.append(current.strip())
+            current = ''
+    if current.strip() and not all(
+        line.strip().startswith('--') or not line.strip() for line in current.splitlines()
+    ):
+        statements.append(current.strip())
+    return statements
+
+
+def ensure_migrations_table(connection, migrations):
+    """
+    Create schema_migrations, adopting versions recorded in user_version
+
+    Args:
+        connection: Writable database connection
+        migrations: Known migrations, for the adopted rows' checksums
+    """
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            filename TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            duration_ms REAL  -- NULL for versions adopted from user_version
+        )
+    ''')
+    if connection.execute('SELECT COUNT(*) FROM schema_migrations').fetchone()[0] == 0:
+        user_version = connection.execute('PRAGMA user_version').fetchone()[0]
+        connection.executemany(
+            'INSERT INTO schema_migrations (version, filename, checksum) VALUES (?, ?, ?)',
+            [(m.version, m.filename, m.checksum) for m in migrations if m.version <= user_version]
+        )
+    connection.commit()
+
+
+def applied_checksums(connection):
+    """
+    Map applied versions to their recorded checksums, without writing
+
+    Returns:
+        dict: version -> checksum (None for versions only known from
+        user_version because schema_migrations does not exist yet)
+    """
+    exists = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).fetchone()
+    if exists:
+        rows = connection.execute('SELECT version, checksum FROM schema_migrations').fetchall()
+        if rows:
+            return {row[0]: row[1] for row in rows}
+    user_version = connection.execute('PRAGMA user_version').fetchone()[0]
+    return {version: None for version in range(1, user_version + 1)}
+
+
+def plan(connection, migrations):
+    """
+    Work out which migrations a run would apply
+
+    Args:
+        connection: Database connection (read-only is enough)
+        migrations: Known migrations
+
+    Returns:
+        MigrationPlan: The current version, the pending migrations and the
+        applied migrations whose file changed since they ran
+    """
+    applied = applied_checksums(connection)
+    pending = [m for m in migrations if m.version not in applied]
+    modified = [
+        m for m in migrations
+        if applied.get(m.version) is not None and applied[m.version] != m.checksum
+    ]
+    return MigrationPlan(max(applied, default=0), pending, modified)
+
+
+def apply_migration(connection, migration, log=None):
+    """
+    Apply one migration and record it
+
+    Args:
+        connection: Writable database connection
+        migration: Migration to apply
+        log: Optional callback receiving progress messages
+
+    Returns:
+        float: Seconds taken
+
+    Raises:
+        MigrationError: If a statement fails; nothing of a regular
+            migration is kept, an online one keeps its finished statements
+    """
+    started = time.perf_counter()
+    try:
+        if migration.online:
+            _apply_online(connection, migration, log)
+            connection.execute('BEGIN IMMEDIATE')
+        else:
+            # executescript runs the file as is; the explicit BEGIN keeps
+            # its statements and the bookkeeping below in one transaction
+            connection.executescript('BEGIN IMMEDIATE;\n' + migration.sql)
+        connection.execute(
+            'INSERT INTO schema_migrations (version, filename, checksum, duration_ms) VALUES (?, ?, ?, ?)',
+            (migration.version, migration.filename, migration.checksum,
+             (time.perf_counter() - started) * 1000)
+        )
+        connection.execute(f'PRAGMA user_version = {int(migration.version)}')
+        connection.commit()
+    except sqlite3.Error as error:
+        connection.rollback()
+        raise MigrationError(migration, error) from error
+    return time.perf_counter() - started
+
+
+def _apply_online(connection, migration, log):
+    for statement in split_statements(migration.sql):
+        for attempt in range(1, ONLINE_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute(statement)
+                connection.commit()
+                break
+            except sqlite3.OperationalError as error:
+                connection.rollback()
+                if 'locked' not in str(error) or attempt == ONLINE_RETRIES:
+                    raise
+                time.sleep(ONLINE_RETRY_DELAY)
+        if log:
+            summary = next(line for line in statement.splitlines() if not line.startswith('--'))
+            log(f"  {summary} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+
+
+def migrate(connection, directory=MIGRATIONS_DIR, dry_run=False, log=None):
+    """
+    Apply every pending migration in version order
+
+    Args:
+        connection: Writable database connection
+        directory: Folder holding the migration files
+        dry_run: Only report the plan, without touching the database
+        log: Optional callback receiving progress messages
+
+    Returns:
+        list: (Migration, seconds) for each applied migration, or
+        (Migration, None) for each pending one on a dry run
+    """
+    migrations = load_migrations(directory)
+    if dry_run:
+        return [(migration, None) for migration in plan(connection, migrations).pending]
+
+    ensure_migrations_table(connection, migrations)
+    results = []
+    for migration in plan(connection, migrations).pending:
+        if log:
+            log(f"Applying {migration.filename}{' (online)' if migration.online else ''}")
+        seconds = apply_migration(connection, migration, log)
+        if log:
+            log(f"Applied {migration.filename} in {seconds * 1000:.1f} ms")
+        results.append((migration, seconds))
+    return results
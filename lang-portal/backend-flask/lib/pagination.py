@@ -0,0 +1,76 @@
+"""
+Keyset (cursor) pagination utilities for the German Learning Portal API
+"""
+
+import base64
+import json
+
+
+def encode_cursor(sort_by, order, last_value, last_id):
+    """
+    Encode the position after the last row of a page as an opaque cursor
+
+    Args:
+        sort_by: Column the listing is sorted by
+        order: Sort order ('asc' or 'desc')
+        last_value: Sort column value of the last row on the page
+        last_id: ID of the last row on the page (tie breaker)
+
+    Returns:
+        str: URL-safe cursor token
+    """
+    payload = json.dumps([sort_by, order, last_value, last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort_by, order):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        token: Cursor token from the client
+        sort_by: Column the current request is sorted by
+        order: Sort order of the current request
+
+    Returns:
+        tuple: (last_value, last_id, error_message)
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor_sort_by, cursor_order, last_value, last_id = json.loads(
+            base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        )
+    except (ValueError, TypeError, UnicodeError):
+        return None, None, "Invalid pagination cursor"
+
+    if cursor_sort_by != sort_by or cursor_order != order:
+        return None, None, "Pagination cursor does not match the requested sort order"
+
+    if not isinstance(last_id, int):
+        return None, None, "Invalid pagination cursor"
+
+    return last_value, last_id, None
+
+
+def keyset_condition(sort_expression, id_column, order, last_value, last_id):
+    """
+    Build the WHERE condition selecting rows after a cursor position
+
+    Args:
+        sort_expression: SQL expression the listing is ordered by
+        id_column: Unique column used to break ties
+        order: Sort order ('asc' or 'desc')
+        last_value: Sort value of the last row on the previous page
+        last_id: ID of the last row on the previous page
+
+    Returns:
+        tuple: (sql_condition, params)
+    """
+    operator = '>' if order == 'asc' else '<'
+    # The redundant single-column bound lets SQLite seek an index on
+    # expressions, which it does not do for the row-value comparison alone
+    condition = (
+        f'{sort_expression} {operator}= ? '
+        f'AND ({sort_expression}, {id_column}) {operator} (?, ?)'
+    )
+    return condition, [last_value, last_value, last_id]
@@ -0,0 +1,181 @@
+"""
+Pre-serialized payload cache for large read endpoints of the German Learning Portal API
+
+Stores finished response bodies as bytes, together with gzip and (when the
+optional ``brotli`` package is installed) brotli encoded copies made on
+first request. Entries are keyed on a resource and validated against the
+data versions they were built from, so a write that bumps one of the
+versions makes the next request rebuild the payload, in every process.
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+
+class Payload:
+    """A serialized body with lazily built compressed variants"""
+
+    __slots__ = ('versions', 'body', 'mimetype', '_encoded', '_lock')
+
+    def __init__(self, versions, body, mimetype):
+        self.versions = versions
+        self.body = body
+        self.mimetype = mimetype
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """Body compressed with ``encoding`` ('gzip' or 'br'), built once"""
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    if encoding == 'br':
+                        data = brotli.compress(self.body, quality=BROTLI_QUALITY)
+                    else:
+                        data = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+                    self._encoded[encoding] = data
+        return data
+
+    def size(self):
+        return len(self.body) + sum(len(data) for data in self._encoded.values())
+
+
+class PayloadCache:
+    """
+    Bounded LRU of Payloads, one per resource key
+
+    A lookup only hits when the stored data versions equal the current
+    ones; otherwise the caller rebuilds and ``put`` replaces the entry.
+    """
+
+    def __init__(self, max_entries=64, enabled=True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, versions):
+        """
+        Look up a payload built at the given data versions
+
+        Args:
+            key: Resource key, e.g. ('group_words_raw', group_id)
+            versions: Current data versions of the resource's tables
+
+        Returns:
+            Payload or None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None or payload.versions != versions:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return payload
+
+    def put(self, key, versions, body, mimetype='application/json'):
+        """
+        Store a freshly built body
+
+        Args:
+            key: Resource key
+            versions: Data versions the body was built from
+            body: Serialized response body (bytes)
+            mimetype: Response MIME type
+
+        Returns:
+            Payload: The stored (or, when disabled, unstored) payload
+        """
+        payload = Payload(versions, body, mimetype)
+        if not self.enabled:
+            return payload
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Snapshot of the cache counters
+
+        Returns:
+            dict: Entry count, stored bytes, hits, misses and evictions
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(payload.size() for payload in self._entries.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+def choose_encoding(accept_encodings):
+    """
+    Pick the best supported content coding the client accepts
+
+    Args:
+        accept_encodings: The request's parsed Accept-Encoding header
+
+    Returns:
+        str: 'br', 'gzip' or None for identity
+    """
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def payload_response(payload, accept_encodings):
+    """
+    Build the response for a payload, compressed if the client allows it
+
+    Args:
+        payload: Payload to send
+        accept_encodings: The request's parsed Accept-Encoding header
+
+    Returns:
+        Response
+    """
+    encoding = choose_encoding(accept_encodings) if len(payload.body) >= MIN_COMPRESS_BYTES else None
+    if encoding is None:
+        response = Response(payload.body, mimetype=payload.mimetype)
+    else:
+        response = Response(payload.encoded(encoding), mimetype=payload.mimetype)
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
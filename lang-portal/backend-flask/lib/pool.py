@@ -0,0 +1,179 @@
+"""
+Connection pooling for the German Learning Portal database
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of reusable database connections
+
+    Connections are created lazily by ``factory`` up to ``max_size``. A
+    checkout prefers the most recently returned connection, evicts
+    connections that have been idle for longer than ``max_idle`` seconds
+    and health checks the connection before handing it out.
+    """
+
+    def __init__(self, factory, max_size=5, timeout=30.0, max_idle=300.0):
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+
+        self._idle = deque()  # (connection, returned_at) pairs
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Condition()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._evictions = 0
+        self._failed_health_checks = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def checkout(self):
+        """
+        Take a connection out of the pool
+
+        Returns:
+            A healthy connection
+
+        Raises:
+            PoolTimeout: If the pool is exhausted for longer than ``timeout``
+        """
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        waited = False
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+
+                self._evict_idle()
+
+                if self._idle:
+                    connection, _ = self._idle.pop()
+                    if self._is_healthy(connection):
+                        break
+                    self._failed_health_checks += 1
+                    self._discard(connection)
+                    continue
+
+                if self._size < self.max_size:
+                    # Reserve the slot before connecting outside the lock
+                    self._size += 1
+                    self._lock.release()
+                    try:
+                        connection = self.factory()
+                    except Exception:
+                        self._lock.acquire()
+                        self._size -= 1
+                        self._lock.notify()
+                        raise
+                    self._lock.acquire()
+                    break
+
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s "
+                        f"(pool size {self.max_size})"
+                    )
+                if not waited:
+                    self._waits += 1
+                    waited = True
+                self._lock.wait(remaining)
+
+            elapsed = time.perf_counter() - started
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+
+        return connection
+
+    def checkin(self, connection):
+        """Return a connection to the pool, discarding any open transaction"""
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Exception:
+            with self._lock:
+                self._discard(connection)
+                self._lock.notify()
+            return
+
+        with self._lock:
+            if self._closed:
+                self._discard(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    def close_all(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                connection, _ = self._idle.popleft()
+                self._discard(connection)
+            self._lock.notify_all()
+
+    def stats(self):
+        """
+        Snapshot of the pool counters
+
+        Returns:
+            dict: Pool size, usage and checkout latency figures
+        """
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "evictions": self._evictions,
+                "failed_health_checks": self._failed_health_checks,
+                "checkout_latency_avg_ms": (
+                    self._checkout_time_total / self._checkouts * 1000 if self._checkouts else 0.0
+                ),
+                "checkout_latency_max_ms": self._checkout_time_max * 1000,
+            }
+
+    def _evict_idle(self):
+        # The oldest returned connections sit at the left end of the deque
+        if self.max_idle is None:
+            return
+        cutoff = time.monotonic() - self.max_idle
+        while self._idle and self._idle[0][1] < cutoff:
+            connection, _ = self._idle.popleft()
+            self._evictions += 1
+            self._discard(connection)
+
+    def _discard(self, connection):
+        self._size -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            connection.execute('SELECT 1').fetchone()
+            return True
+        except Exception:
+            return False
@@ -0,0 +1,799 @@
+"""
+Repositories of the German Learning Portal API
+
+Routes read and write through these repositories instead of building SQL.
+Each repository holds the Query objects of its operations (lib/storage.py)
+and runs them on the cursors of the app's storage backend, so the same
+route code serves SQLite and PostgreSQL. Writes commit their own
+transaction; the response caches are left to the routes.
+
+Column names and row shapes are those the routes formatted before, and
+rows are indexed by position and by column name on both backends.
+"""
+
+from lib.data_version import bump_versions, get_versions
+from lib.pagination import keyset_condition
+from lib.reviews import ingest_reviews, missing_word_ids
+from lib.scheduler import reset_schedule, utc_now
+from lib.search import build_match_query, build_tsquery
+from lib.sessions import (
+    accuracy_expression, duration_expression, end_time_expression, lifecycle_columns,
+    parse_session_filters, sort_expressions
+)
+from lib.stats import record_session, reset_learning_stats
+from lib.storage import POSTGRES, ConflictError, Query, order_term
+
+# NULL-free SQL expression behind each sortable column, so the last value of
+# a page can be compared against in a keyset cursor
+WORD_SORT_EXPRESSIONS = {
+    'german': 'w.german',
+    'pronunciation': 'w.pronunciation',
+    'english': 'w.english',
+    'correct_count': 'COALESCE(r.correct_count, 0)',
+    'wrong_count': 'COALESCE(r.wrong_count, 0)',
+    'gender': "COALESCE(w.gender, '')",
+    'plural': "COALESCE(w.plural, '')"
+}
+
+# Same for the group word listings, whose counters are joined as wr
+GROUP_WORD_SORT_EXPRESSIONS = {
+    'german': 'w.german',
+    'pronunciation': 'w.pronunciation',
+    'english': 'w.english',
+    'correct_count': 'COALESCE(wr.correct_count, 0)',
+    'wrong_count': 'COALESCE(wr.wrong_count, 0)'
+}
+
+
+class Repository:
+    """Base of the repositories: cursors and transactions of one backend"""
+
+    # Repositories of the shared tables use the shared database also with
+    # sharded SQLite storage (lib/shards.py)
+    shared = False
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    @property
+    def dialect(self):
+        return self.storage.dialect
+
+    def cursor(self, readonly=False, streaming=False):
+        return self.storage.cursor(readonly=readonly, shared=self.shared, streaming=streaming)
+
+    def commit(self):
+        self.storage.commit(shared=self.shared)
+
+    def rollback(self):
+        self.storage.rollback(shared=self.shared)
+
+
+class VersionRepository(Repository):
+    """Data versions behind ETags and cache keys"""
+
+    def get(self, tables):
+        return get_versions(self.cursor(readonly=True), tables)
+
+
+class UserRepository(Repository):
+    """Learners; kept in the shared database"""
+
+    shared = True
+
+    PAGE = Query('''
+        SELECT id, name, created_at
+        FROM users
+        ORDER BY id
+        LIMIT ? OFFSET ?
+    ''')
+    COUNT = Query('SELECT COUNT(*) FROM users')
+    GET = Query('SELECT id, name, created_at FROM users WHERE id = ?')
+    EXISTS = Query('SELECT id FROM users WHERE id = ?')
+    CREATE = Query('INSERT INTO users (name) VALUES (?)')
+
+    def page(self, limit, offset):
+        return self.PAGE.execute(self.cursor(readonly=True), (limit, offset)).fetchall()
+
+    def count(self):
+        return self.COUNT.execute(self.cursor(readonly=True)).fetchone()[0]
+
+    def get(self, user_id):
+        return self.GET.execute(self.cursor(readonly=True), (user_id,)).fetchone()
+
+    def exists(self, user_id):
+        return self.EXISTS.execute(self.cursor(readonly=True), (user_id,)).fetchone() is not None
+
+    def create(self, name):
+        """
+        Add a user
+
+        Returns:
+            Row of the new user
+
+        Raises:
+            ConflictError: If a user of that name exists
+        """
+        cursor = self.cursor()
+        try:
+            user_id = self.CREATE.insert(cursor, (name,))
+        except self.storage.IntegrityError:
+            self.rollback()
+            raise ConflictError(f"User '{name}' already exists")
+        self.commit()
+        return self.GET.execute(cursor, (user_id,)).fetchone()
+
+
+class ActivityRepository(Repository):
+    """Study activities"""
+
+    ALL = Query('SELECT id, name, url, preview_url FROM study_activities')
+    URLS = Query('SELECT url FROM study_activities')
+    GET = Query('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?')
+    EXISTS = Query('SELECT id FROM study_activities WHERE id = ?')
+
+    def all(self):
+        return self.ALL.execute(self.cursor(readonly=True)).fetchall()
+
+    def urls(self):
+        return [row['url'] for row in self.URLS.execute(self.cursor(readonly=True)).fetchall()]
+
+    def get(self, activity_id):
+        return self.GET.execute(self.cursor(readonly=True), (activity_id,)).fetchone()
+
+    def exists(self, activity_id):
+        return self.EXISTS.execute(self.cursor(readonly=True), (activity_id,)).fetchone() is not None
+
+
+class WordRepository(Repository):
+    """Words with the requesting user's review counters"""
+
+    PAGE = Query('''
+        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
+            COALESCE(r.correct_count, 0) AS correct_count,
+            COALESCE(r.wrong_count, 0) AS wrong_count
+        FROM words w
+        LEFT JOIN word_reviews r ON r.user_id = ? AND r.word_id = w.id
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
+    ''')
+    PAGE_AFTER = Query('''
+        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
+            COALESCE(r.correct_count, 0) AS correct_count,
+            COALESCE(r.wrong_count, 0) AS wrong_count,
+            {sort_expression} AS sort_value
+        FROM words w
+        LEFT JOIN word_reviews r ON r.user_id = ? AND r.word_id = w.id
+        {where_clause}
+        ORDER BY {sort_expression} {order}, w.id {order}
+        LIMIT ?
+    ''')
+    COUNT = Query('SELECT COUNT(*) FROM words')
+    EXPORT = Query('''
+        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
+            CASE WHEN json_valid(w.parts) THEN w.parts END AS parts,
+            COALESCE(r.correct_count, 0) AS correct_count,
+            COALESCE(r.wrong_count, 0) AS wrong_count
+        FROM words w
+        LEFT JOIN word_reviews r ON r.user_id = ? AND r.word_id = w.id
+        ORDER BY w.id
+    ''')
+    # Matches in the German word weigh most, then the English translation
+    SEARCH = Query('''
+        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
+            COALESCE(r.correct_count, 0) AS correct_count,
+            COALESCE(r.wrong_count, 0) AS wrong_count
+        FROM (
+          SELECT rowid, bm25(words_fts, 10.0, 5.0, 1.0, 2.0) AS score
+          FROM words_fts
+          WHERE words_fts MATCH ?
+          ORDER BY score
+          LIMIT ? OFFSET ?
+        ) matches
+        JOIN words w ON w.id = matches.rowid
+        LEFT JOIN word_reviews r ON r.user_id = ? AND r.word_id = w.id
+        ORDER BY matches.score
+    ''', postgres='''
+        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
+            COALESCE(r.correct_count, 0) AS correct_count,
+            COALESCE(r.wrong_count, 0) AS wrong_count
+        FROM (
+          SELECT id, ts_rank('{0.1, 0.2, 0.5, 1.0}', search_vector, query) AS score
+          FROM words, to_tsquery('simple', ?) AS query
+          WHERE search_vector @@ query
+          ORDER BY score DESC, id
+          LIMIT ? OFFSET ?
+        ) matches
+        JOIN words w ON w.id = matches.id
+        LEFT JOIN word_reviews r ON r.user_id = ? AND r.word_id = w.id
+        ORDER BY matches.score DESC, w.id
+    ''')
+    SEARCH_COUNT = Query(
+        'SELECT COUNT(*) FROM words_fts WHERE words_fts MATCH ?',
+        postgres="SELECT COUNT(*) FROM words WHERE search_vector @@ to_tsquery('simple', ?)"
+    )
+    GET = Query('''
+        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
+               COALESCE(r.correct_count, 0) AS correct_count,
+               COALESCE(r.wrong_count, 0) AS wrong_count,
+               GROUP_CONCAT(DISTINCT g.id || '::' || g.name) as groups
+        FROM words w
+        LEFT JOIN word_reviews r ON r.user_id = ? AND r.word_id = w.id
+        LEFT JOIN word_groups wg ON w.id = wg.word_id
+        LEFT JOIN groups g ON wg.group_id = g.id
+        WHERE w.id = ?
+        GROUP BY w.id
+    ''', postgres='''
+        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
+               COALESCE(r.correct_count, 0) AS correct_count,
+               COALESCE(r.wrong_count, 0) AS wrong_count,
+               string_agg(DISTINCT g.id || '::' || g.name, ',') as groups
+        FROM words w
+        LEFT JOIN word_reviews r ON r.user_id = ? AND r.word_id = w.id
+        LEFT JOIN word_groups wg ON w.id = wg.word_id
+        LEFT JOIN groups g ON wg.group_id = g.id
+        WHERE w.id = ?
+        GROUP BY w.id, r.correct_count, r.wrong_count
+    ''')
+
+    def page(self, user_id, sort_by, order, limit, offset):
+        """Words sorted by a column of WORD_SORT_EXPRESSIONS, one OFFSET page"""
+        return self.PAGE.execute(
+            self.cursor(readonly=True), (user_id, limit, offset),
+            order_by=order_term(sort_by, order, self.dialect)
+        ).fetchall()
+
+    def page_after(self, user_id, sort_by, order, limit, after=None):
+        """
+        Words after a keyset cursor position
+
+        Args:
+            after: (last_value, last_id) of the previous page, None for the first page
+
+        Returns:
+            list: Rows with a sort_value column for the next cursor
+        """
+        sort_expression = WORD_SORT_EXPRESSIONS[sort_by]
+        where_clause = ''
+        params = []
+        if after is not None:
+            condition, params = keyset_condition(sort_expression, 'w.id', order, *after)
+            where_clause = 'WHERE ' + condition
+        return self.PAGE_AFTER.execute(
+            self.cursor(readonly=True), (user_id, *params, limit),
+            sort_expression=sort_expression, where_clause=where_clause, order=order
+        ).fetchall()
+
+    def count(self):
+        return self.COUNT.execute(self.cursor(readonly=True)).fetchone()[0]
+
+    def export(self, user_id):
+        """Executed cursor over every word, for lib.json_stream"""
+        return self.EXPORT.execute(self.cursor(readonly=True, streaming=True), (user_id,))
+
+    def search(self, query, user_id, limit, offset):
+        """
+        Full-text search ranked by relevance
+
+        Returns:
+            tuple: (rows of the page, total number of matches)
+        """
+        cursor = self.cursor(readonly=True)
+        match = build_tsquery(query) if self.dialect == POSTGRES else build_match_query(query)
+        words = self.SEARCH.execute(cursor, (match, limit, offset, user_id)).fetchall()
+        total = self.SEARCH_COUNT.execute(cursor, (match,)).fetchone()[0]
+        return words, total
+
+    def get(self, word_id, user_id):
+        """Word with a groups column of comma separated 'id::name' pairs"""
+        return self.GET.execute(self.cursor(readonly=True), (user_id, word_id)).fetchone()
+
+    def missing_ids(self, word_ids):
+        return missing_word_ids(self.cursor(readonly=True), word_ids)
+
+    def snapshot(self, store, user_id):
+        """The user's snapshot of a lib.vocabulary.VocabularyStore"""
+        return store.snapshot(self.cursor(readonly=True), user_id)
+
+
+class GroupRepository(Repository):
+    """Groups and their words"""
+
+    PAGE = Query('''
+        SELECT id, name, words_count
+        FROM groups
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
+    ''')
+    COUNT = Query('SELECT COUNT(*) FROM groups')
+    ALL = Query('SELECT id, name FROM groups')
+    GET = Query('''
+        SELECT id, name, words_count
+        FROM groups
+        WHERE id = ?
+    ''')
+    WORD_COUNT = Query('''
+        SELECT COUNT(*)
+        FROM word_groups
+        WHERE group_id = ?
+    ''')
+    WORDS_PAGE = Query('''
+        SELECT w.*,
+               COALESCE(wr.correct_count, 0) as correct_count,
+               COALESCE(wr.wrong_count, 0) as wrong_count
+        FROM words w
+        JOIN word_groups wg ON w.id = wg.word_id
+        LEFT JOIN word_reviews wr ON wr.user_id = ? AND wr.word_id = w.id
+        WHERE wg.group_id = ?
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
+    ''')
+    WORDS_AFTER = Query('''
+        SELECT w.*,
+               COALESCE(wr.correct_count, 0) as correct_count,
+               COALESCE(wr.wrong_count, 0) as wrong_count,
+               {sort_expression} as sort_value
+        FROM words w
+        JOIN word_groups wg ON w.id = wg.word_id
+        LEFT JOIN word_reviews wr ON wr.user_id = ? AND wr.word_id = w.id
+        WHERE wg.group_id = ? {keyset_clause}
+        ORDER BY {sort_expression} {order}, w.id {order}
+        LIMIT ?
+    ''')
+    WORDS_RAW = Query('''
+        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
+               CASE WHEN json_valid(w.parts) THEN w.parts END as parts,
+               COALESCE(wr.correct_count, 0) as correct_count,
+               COALESCE(wr.wrong_count, 0) as wrong_count
+        FROM words w
+        JOIN word_groups wg ON w.id = wg.word_id
+        LEFT JOIN word_reviews wr ON wr.user_id = ? AND wr.word_id = w.id
+        WHERE wg.group_id = ?
+        ORDER BY w.german ASC, w.id ASC
+    ''')
+    # Due dates are the user's, read through the (user_id, word_id) key of
+    # word_reviews for the group's members
+    _SELECT_DUE_WORDS = '''
+        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural, w.parts,
+               wr.due_at,
+               COALESCE(wr.correct_count, 0) as correct_count,
+               COALESCE(wr.wrong_count, 0) as wrong_count,
+               wr.ease, wr.interval_days, wr.repetitions
+        FROM word_groups wg
+        JOIN words w ON w.id = wg.word_id
+        LEFT JOIN word_reviews wr ON wr.user_id = ? AND wr.word_id = wg.word_id
+    '''
+    DUE_WORDS = Query(_SELECT_DUE_WORDS + '''
+        WHERE wg.group_id = ? AND wr.due_at <= ?
+        ORDER BY wr.due_at
+        LIMIT ?
+    ''')
+    # Never reviewed words in the order they were added to the group
+    NEW_WORDS = Query(_SELECT_DUE_WORDS + '''
+        WHERE wg.group_id = ? AND wr.due_at IS NULL
+        ORDER BY wg.rowid
+        LIMIT ?
+    ''', postgres=_SELECT_DUE_WORDS + '''
+        WHERE wg.group_id = ? AND wr.due_at IS NULL
+        ORDER BY wg.id
+        LIMIT ?
+    ''')
+
+    def page(self, sort_by, order, limit, offset):
+        return self.PAGE.execute(
+            self.cursor(readonly=True), (limit, offset),
+            order_by=order_term(sort_by, order, self.dialect)
+        ).fetchall()
+
+    def count(self):
+        return self.COUNT.execute(self.cursor(readonly=True)).fetchone()[0]
+
+    def all(self):
+        return self.ALL.execute(self.cursor(readonly=True)).fetchall()
+
+    def get(self, group_id):
+        return self.GET.execute(self.cursor(readonly=True), (group_id,)).fetchone()
+
+    def word_count(self, group_id):
+        return self.WORD_COUNT.execute(self.cursor(readonly=True), (group_id,)).fetchone()[0]
+
+    def words_page(self, group_id, user_id, sort_by, order, limit, offset):
+        """A group's words sorted by a column of GROUP_WORD_SORT_EXPRESSIONS, one OFFSET page"""
+        return self.WORDS_PAGE.execute(
+            self.cursor(readonly=True), (user_id, group_id, limit, offset),
+            order_by=order_term(sort_by, order, self.dialect)
+        ).fetchall()
+
+    def words_after(self, group_id, user_id, sort_by, order, limit, after=None):
+        """
+        A group's words after a keyset cursor position
+
+        Args:
+            after: (last_value, last_id) of the previous page, None for the first page
+
+        Returns:
+            list: Rows with a sort_value column for the next cursor
+        """
+        sort_expression = GROUP_WORD_SORT_EXPRESSIONS[sort_by]
+        keyset_clause = ''
+        params = [user_id, group_id]
+        if after is not None:
+            condition, condition_params = keyset_condition(sort_expression, 'w.id', order, *after)
+            keyset_clause = 'AND ' + condition
+            params.extend(condition_params)
+        return self.WORDS_AFTER.execute(
+            self.cursor(readonly=True), (*params, limit),
+            sort_expression=sort_expression, keyset_clause=keyset_clause, order=order
+        ).fetchall()
+
+    def words_raw(self, group_id, user_id):
+        """
+        Executed cursor over every word of a group, for lib.json_stream
+
+        The stored parts JSON is selected as is; invalid parts become NULL.
+        """
+        return self.WORDS_RAW.execute(self.cursor(readonly=True, streaming=True), (user_id, group_id))
+
+    def due_words(self, group_id, user_id, limit, include_new=True):
+        """
+        The next words to review: due words, oldest due date first, then new words
+
+        Returns:
+            list: Rows with the words' parts JSON and schedules
+        """
+        cursor = self.cursor(readonly=True)
+        words = self.DUE_WORDS.execute(cursor, (user_id, group_id, utc_now(), limit)).fetchall()
+        if include_new and len(words) < limit:
+            words += self.NEW_WORDS.execute(cursor, (user_id, group_id, limit - len(words))).fetchall()
+        return words
+
+
+class SessionRepository(Repository):
+    """A user's study sessions, their reviews and the dashboard figures"""
+
+    CREATE = Query('''
+        INSERT INTO study_sessions (user_id, group_id, study_activity_id, created_at)
+        VALUES (?, ?, ?, ?)
+    ''')
+    COUNT = Query('''
+        SELECT COUNT(*) as count
+        FROM study_sessions ss
+        {where_clause}
+    ''')
+    # Pages through the user's study_sessions indexes before joining the
+    # names of just that page
+    PAGE = Query('''
+        SELECT
+          ss.id,
+          ss.group_id,
+          g.name as group_name,
+          sa.id as activity_id,
+          sa.name as activity_name,
+          ss.created_at,
+          {end_time} as end_time,
+          {lifecycle}
+        FROM (
+          SELECT *
+          FROM study_sessions ss
+          {where_clause}
+          ORDER BY {order_clause}
+          LIMIT ? OFFSET ?
+        ) ss
+        JOIN groups g ON g.id = ss.group_id
+        JOIN study_activities sa ON sa.id = ss.study_activity_id
+        ORDER BY {order_clause}
+    ''')
+    ACTIVITY_COUNT = Query('''
+        SELECT COUNT(*) as count
+        FROM study_sessions ss
+        JOIN groups g ON g.id = ss.group_id
+        WHERE {where_clause}
+    ''')
+    # Review counts, duration and accuracy are stored on the session and
+    # sorted through (user_id, study_activity_id, ...) indexes
+    ACTIVITY_PAGE = Query('''
+        SELECT
+            ss.id,
+            ss.group_id,
+            g.name as group_name,
+            sa.name as activity_name,
+            ss.created_at,
+            {end_time} as end_time,
+            ss.study_activity_id as activity_id,
+            {lifecycle}
+        FROM study_sessions ss
+        JOIN groups g ON g.id = ss.group_id
+        JOIN study_activities sa ON sa.id = ss.study_activity_id
+        WHERE {where_clause}
+        ORDER BY {order_by}, ss.id {order}
+        LIMIT ? OFFSET ?
+    ''')
+    GROUP_COUNT = Query('''
+        SELECT COUNT(*)
+        FROM study_sessions s
+        WHERE {where_clause}
+    ''')
+    GROUP_PAGE = Query('''
+        SELECT
+          s.id,
+          s.group_id,
+          s.study_activity_id,
+          s.created_at as start_time,
+          {end_time} as end_time,
+          a.name as activity_name,
+          g.name as group_name,
+          {lifecycle}
+        FROM study_sessions s
+        JOIN study_activities a ON s.study_activity_id = a.id
+        JOIN groups g ON s.group_id = g.id
+        WHERE {where_clause}
+        ORDER BY {order_by}, s.id {order}
+        LIMIT ? OFFSET ?
+    ''')
+    GET = Query('''
+        SELECT
+          ss.id,
+          ss.group_id,
+          g.name as group_name,
+          sa.id as activity_id,
+          sa.name as activity_name,
+          ss.created_at,
+          {end_time} as end_time,
+          {lifecycle}
+        FROM study_sessions ss
+        JOIN groups g ON g.id = ss.group_id
+        JOIN study_activities sa ON sa.id = ss.study_activity_id
+        WHERE ss.id = ? AND ss.user_id = ?
+    ''')
+    # The words reviewed in a session with their results in it
+    WORDS = Query('''
+        SELECT
+          w.*,
+          COALESCE(SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END), 0) as session_correct_count,
+          COALESCE(SUM(CASE WHEN wri.correct = 0 THEN 1 ELSE 0 END), 0) as session_wrong_count
+        FROM words w
+        JOIN word_review_items wri ON wri.word_id = w.id
+        WHERE wri.study_session_id = ?
+        GROUP BY w.id
+        ORDER BY w.german
+        LIMIT ? OFFSET ?
+    ''')
+    WORD_COUNT = Query('''
+        SELECT COUNT(DISTINCT w.id) as count
+        FROM words w
+        JOIN word_review_items wri ON wri.word_id = w.id
+        WHERE wri.study_session_id = ?
+    ''')
+    FIND = Query('SELECT id, ended_at FROM study_sessions WHERE id = ? AND user_id = ?')
+    CLOSE = Query('''
+        UPDATE study_sessions SET ended_at = ?
+        WHERE id = ? AND user_id = ? AND ended_at IS NULL
+    ''')
+    CLOSED = Query('''
+        SELECT ss.id, ss.created_at, {end_time} as end_time,
+          {lifecycle}
+        FROM study_sessions ss
+        WHERE ss.id = ? AND ss.user_id = ?
+    ''')
+    # Review items first, since they reference the sessions
+    RESET = (
+        Query('DELETE FROM word_review_items WHERE user_id = ?'),
+        Query('DELETE FROM study_sessions WHERE user_id = ?'),
+        Query('DELETE FROM word_reviews WHERE user_id = ?'),
+    )
+    # The session is picked first so the (user_id, created_at) index is used
+    # instead of aggregating every session before sorting
+    RECENT = Query('''
+        SELECT
+            ss.id,
+            ss.group_id,
+            sa.name as activity_name,
+            ss.created_at,
+            COUNT(CASE WHEN wri.correct = 1 THEN 1 END) as correct_count,
+            COUNT(CASE WHEN wri.correct = 0 THEN 1 END) as wrong_count
+        FROM (
+            SELECT id, group_id, study_activity_id, created_at
+            FROM study_sessions
+            WHERE user_id = ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+        ) ss
+        JOIN study_activities sa ON ss.study_activity_id = sa.id
+        LEFT JOIN word_review_items wri ON ss.id = wri.study_session_id
+        GROUP BY ss.id, ss.group_id, sa.name, ss.created_at
+    ''')
+    STATS = Query('''
+        SELECT total_sessions, total_attempts, total_correct,
+               words_studied, mastered_words, current_streak
+        FROM learning_stats
+        WHERE user_id = ?
+    ''')
+    ACTIVE_GROUPS = Query('''
+        SELECT COUNT(DISTINCT group_id) as active_groups
+        FROM study_sessions
+        WHERE user_id = ? AND created_at >= ?
+    ''')
+
+    def _columns(self, alias='ss'):
+        return {
+            'end_time': end_time_expression(alias),
+            'lifecycle': lifecycle_columns(alias, self.dialect),
+        }
+
+    def parse_filters(self, args, alias='ss'):
+        """
+        Duration and accuracy filters of a listing's query arguments
+
+        Returns:
+            tuple: (filters for the listing methods, error_message)
+        """
+        conditions, params, error = parse_session_filters(args, alias, self.dialect)
+        return (conditions, params), error
+
+    def sort_expression(self, sort_by, alias='ss'):
+        return sort_expressions(alias, self.dialect)[sort_by]
+
+    def create(self, user_id, group_id, activity_id):
+        """
+        Start a session, counting it in the user's statistics
+
+        Returns:
+            int: ID of the new session
+        """
+        cursor = self.cursor()
+        session_id = self.CREATE.insert(cursor, (user_id, group_id, activity_id, utc_now()))
+        record_session(cursor, session_id)
+        bump_versions(cursor, 'study_sessions')
+        self.commit()
+        return session_id
+
+    def count(self, user_id, filters):
+        conditions, params = filters
+        where_clause = f"WHERE {' AND '.join(['ss.user_id = ?'] + conditions)}"
+        return self.COUNT.execute(
+            self.cursor(readonly=True), [user_id] + params, where_clause=where_clause
+        ).fetchone()['count']
+
+    def page(self, user_id, filters, sort_by, order, limit, offset):
+        """A user's sessions sorted by a key of lib.sessions.sort_expressions"""
+        conditions, params = filters
+        where_clause = f"WHERE {' AND '.join(['ss.user_id = ?'] + conditions)}"
+        order_clause = f'{order_term(self.sort_expression(sort_by), order, self.dialect)}, ss.id {order}'
+        return self.PAGE.execute(
+            self.cursor(readonly=True), [user_id] + params + [limit, offset],
+            where_clause=where_clause, order_clause=order_clause, **self._columns()
+        ).fetchall()
+
+    def activity_count(self, user_id, activity_id, filters):
+        conditions, params = filters
+        where_clause = ' AND '.join(['ss.user_id = ?', 'ss.study_activity_id = ?'] + conditions)
+        return self.ACTIVITY_COUNT.execute(
+            self.cursor(readonly=True), [user_id, activity_id] + params, where_clause=where_clause
+        ).fetchone()['count']
+
+    def activity_page(self, user_id, activity_id, filters, sort_by, order, limit, offset):
+        """A user's sessions of one activity"""
+        conditions, params = filters
+        where_clause = ' AND '.join(['ss.user_id = ?', 'ss.study_activity_id = ?'] + conditions)
+        return self.ACTIVITY_PAGE.execute(
+            self.cursor(readonly=True), [user_id, activity_id] + params + [limit, offset],
+            where_clause=where_clause, order=order,
+            order_by=order_term(self.sort_expression(sort_by), order, self.dialect), **self._columns()
+        ).fetchall()
+
+    def group_count(self, user_id, group_id, filters):
+        conditions, params = filters
+        where_clause = ' AND '.join(['s.user_id = ?', 's.group_id = ?'] + conditions)
+        return self.GROUP_COUNT.execute(
+            self.cursor(readonly=True), [user_id, group_id] + params, where_clause=where_clause
+        ).fetchone()[0]
+
+    def group_page(self, user_id, group_id, filters, sort_by, order, limit, offset):
+        """
+        A user's sessions of one group
+
+        Args:
+            sort_by: startTime, endTime, activityName, groupName,
+                reviewItemsCount, duration or accuracy; others sort by start time
+        """
+        # Everything except the activity and group names is stored on the
+        # session and sorts through a (user_id, group_id, ...) index
+        sort_mapping = {
+            'startTime': 's.created_at',
+            'endTime': end_time_expression('s'),
+            'activityName': 'a.name',
+            'groupName': 'g.name',
+            'reviewItemsCount': 's.review_count',
+            'duration': duration_expression('s', self.dialect),
+            'accuracy': accuracy_expression('s')
+        }
+        conditions, params = filters
+        where_clause = ' AND '.join(['s.user_id = ?', 's.group_id = ?'] + conditions)
+        return self.GROUP_PAGE.execute(
+            self.cursor(readonly=True), [user_id, group_id] + params + [limit, offset],
+            where_clause=where_clause, order=order,
+            order_by=order_term(sort_mapping.get(sort_by, 's.created_at'), order, self.dialect),
+            **self._columns('s')
+        ).fetchall()
+
+    def get(self, session_id, user_id):
+        return self.GET.execute(self.cursor(readonly=True), (session_id, user_id), **self._columns()).fetchone()
+
+    def words(self, session_id, limit, offset):
+        """
+        The words reviewed in a session
+
+        Returns:
+            tuple: (rows of the page, number of distinct words)
+        """
+        cursor = self.cursor(readonly=True)
+        words = self.WORDS.execute(cursor, (session_id, limit, offset)).fetchall()
+        total = self.WORD_COUNT.execute(cursor, (session_id,)).fetchone()['count']
+        return words, total
+
+    def find(self, session_id, user_id):
+        """The user's session with its ended_at, or None"""
+        return self.FIND.execute(self.cursor(), (session_id, user_id)).fetchone()
+
+    def add_reviews(self, session_id, reviews, user_id):
+        """Record a batch of validated reviews (lib.reviews.ingest_reviews) and commit"""
+        ingest_reviews(self.cursor(), session_id, reviews, user_id)
+        self.commit()
+
+    def close(self, session_id, user_id):
+        """
+        Close a session; closing a closed session keeps its end time
+
+        Returns:
+            Row of the session, or None if the user has no such session
+        """
+        cursor = self.cursor()
+        self.CLOSE.execute(cursor, (utc_now(), session_id, user_id))
+        if cursor.rowcount:
+            bump_versions(cursor, 'study_sessions')
+        session = self.CLOSED.execute(cursor, (session_id, user_id), **self._columns()).fetchone()
+        if session is None:
+            self.rollback()
+            return None
+        self.commit()
+        return session
+
+    def reset(self, user_id):
+        """Clear a user's history, counters and schedules"""
+        cursor = self.cursor()
+        for query in self.RESET:
+            query.execute(cursor, (user_id,))
+        reset_learning_stats(cursor, user_id)
+        reset_schedule(cursor, user_id)
+        bump_versions(cursor, 'study_sessions', 'word_review_items', 'word_reviews')
+        self.commit()
+
+    def recent(self, user_id):
+        """The user's latest session with its review results, or None"""
+        return self.RECENT.execute(self.cursor(readonly=True), (user_id,)).fetchone()
+
+    def stats(self, user_id):
+        """The user's learning_stats row, None before the first session"""
+        return self.STATS.execute(self.cursor(readonly=True), (user_id,)).fetchone()
+
+    def active_groups(self, user_id, since):
+        """
+        Groups the user studied since a date
+
+        Args:
+            since: 'YYYY-MM-DD' (UTC)
+        """
+        return self.ACTIVE_GROUPS.execute(self.cursor(readonly=True), (user_id, since)).fetchone()['active_groups']
+
+
+class Repositories:
+    """The repositories of one storage backend, as ``app.repositories``"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.versions = VersionRepository(storage)
+        self.users = UserRepository(storage)
+        self.activities = ActivityRepository(storage)
+        self.words = WordRepository(storage)
+        self.groups = GroupRepository(storage)
+        self.sessions = SessionRepository(storage)
@@ -0,0 +1,153 @@
+"""
+Set-based word review ingestion for the German Learning Portal API
+"""
+
+import json
+
+from lib.stats import record_reviews
+from lib.scheduler import schedule_reviews, utc_now
+from lib.data_version import bump_versions
+from lib.storage import Query
+from lib.validation import validate_word_review
+
+# Stay well below SQLite's limit on host parameters per statement
+MAX_QUERY_PARAMETERS = 500
+
+# Longest accepted NDJSON review record, in bytes
+MAX_RECORD_LENGTH = 64 * 1024
+
+EXISTING_WORDS = Query('SELECT id FROM words WHERE id IN ({placeholders})')
+
+INSERT_REVIEW_ITEM = Query('''
+    INSERT INTO word_review_items (user_id, word_id, study_session_id, correct, created_at)
+    VALUES (?, ?, ?, ?, ?)
+''')
+
+ADD_REVIEW_COUNTERS = Query('''
+    INSERT INTO word_reviews (user_id, word_id, correct_count, wrong_count, last_reviewed)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, word_id) DO UPDATE SET
+        correct_count = word_reviews.correct_count + excluded.correct_count,
+        wrong_count = word_reviews.wrong_count + excluded.wrong_count,
+        last_reviewed = excluded.last_reviewed
+''')
+
+ADVANCE_SESSION = Query('''
+    UPDATE study_sessions SET
+        review_count = review_count + ?,
+        correct_count = correct_count + ?,
+        last_review_at = ?
+    WHERE id = ?
+''')
+
+
+def missing_word_ids(cursor, word_ids):
+    """
+    Find the word IDs that do not exist, with one query per 500 IDs
+
+    Args:
+        cursor: Database cursor
+        word_ids: Iterable of word IDs to check
+
+    Returns:
+        set: IDs that are not present in the words table
+    """
+    word_ids = list(set(word_ids))
+    found = set()
+    for start in range(0, len(word_ids), MAX_QUERY_PARAMETERS):
+        chunk = word_ids[start:start + MAX_QUERY_PARAMETERS]
+        EXISTING_WORDS.execute(cursor, chunk, placeholders=','.join('?' * len(chunk)))
+        found.update(row[0] for row in cursor.fetchall())
+    return set(word_ids) - found
+
+
+def ingest_reviews(cursor, session_id, reviews, user_id):
+    """
+    Record a batch of already validated reviews for a user's study session
+
+    All review items are inserted with a single executemany and the
+    correct/wrong counters are folded into one upsert per distinct word.
+    The session's last review time and review/correct counts and each
+    word's spaced repetition schedule are advanced in the same
+    transaction. The caller owns the transaction and commits.
+
+    Args:
+        cursor: Database cursor inside the write transaction
+        session_id: ID of the study session being reviewed
+        reviews: List of {'word_id': int, 'is_correct': bool} dicts
+        user_id: ID of the user owning the session
+
+    Returns:
+        dict: word_id -> (attempts, successes) for the batch
+    """
+    reviewed_at = utc_now()
+    INSERT_REVIEW_ITEM.executemany(cursor, [
+        (user_id, review['word_id'], session_id, 1 if review['is_correct'] else 0, reviewed_at)
+        for review in reviews
+    ])
+
+    word_results = {}
+    for review in reviews:
+        attempts, successes = word_results.get(review['word_id'], (0, 0))
+        word_results[review['word_id']] = (attempts + 1, successes + (1 if review['is_correct'] else 0))
+
+    ADD_REVIEW_COUNTERS.executemany(cursor, [
+        (user_id, word_id, successes, attempts - successes, reviewed_at)
+        for word_id, (attempts, successes) in word_results.items()
+    ])
+
+    ADVANCE_SESSION.execute(cursor, (len(reviews), sum(successes for _, successes in word_results.values()), reviewed_at, session_id))
+
+    schedule_reviews(cursor, user_id, reviews, reviewed_at)
+
+    record_reviews(cursor, user_id, word_results)
+    bump_versions(cursor, 'word_review_items', 'word_reviews', 'study_sessions')
+    return word_results
+
+
+def read_review_chunks(stream, chunk_size):
+    """
+    Incrementally parse newline-delimited review records into chunks
+
+    Only one chunk is held in memory at a time, however large the upload.
+
+    Args:
+        stream: Binary file-like request body
+        chunk_size: Number of reviews per yielded chunk
+
+    Yields:
+        list: Validated {'word_id': int, 'is_correct': bool} dicts
+
+    Raises:
+        ValueError: On the first malformed record, naming its line number
+    """
+    chunk = []
+    line_number = 0
+    while True:
+        line = stream.readline(MAX_RECORD_LENGTH + 1)
+        if not line:
+            break
+        line_number += 1
+        if len(line) > MAX_RECORD_LENGTH:
+            raise ValueError(f"Line {line_number}: Review record is too long")
+
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            review = json.loads(line)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError(f"Line {line_number}: Invalid JSON")
+
+        is_valid, error_msg = validate_word_review(review)
+        if not is_valid:
+            raise ValueError(f"Line {line_number}: {error_msg}")
+
+        chunk.append({'word_id': int(review['word_id']), 'is_correct': review['is_correct']})
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
@@ -0,0 +1,220 @@
+"""
+SM-2 spaced repetition scheduling for the German Learning Portal API
+
+Every review moves a word's ease factor, interval and due date as in the
+SuperMemo 2 algorithm. Schedules are kept per user on word_reviews.
+Reviews are pass/fail, so a correct answer is graded as quality 4
+("correct after hesitation") and a wrong one as quality 1. Repeated
+answers to a word within one batch of reviews count as a single review.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Intervals grow geometrically; without a cap a few dozen correct answers
+# push the due date past datetime's range
+MAX_INTERVAL_DAYS = 36500.0
+
+# SM-2 response quality for pass/fail reviews
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 1
+
+# Format of SQLite's datetime('now'), so stored dates compare as strings
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+ScheduleState = namedtuple('ScheduleState', ['ease', 'interval_days', 'repetitions', 'due_at'])
+
+NEW_STATE = ScheduleState(DEFAULT_EASE, 0.0, 0, None)
+
+
+def utc_now():
+    """Current UTC time in the database timestamp format"""
+    return datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def next_state(state, is_correct, reviewed_at):
+    """
+    Apply one review to a word's schedule
+
+    Args:
+        state: Current ScheduleState of the word
+        is_correct: Whether the answer was correct
+        reviewed_at: Review timestamp ('YYYY-MM-DD HH:MM:SS', UTC)
+
+    Returns:
+        ScheduleState: State after the review
+    """
+    ease, interval_days, repetitions = _advance(state, is_correct)
+    due_at = datetime.strptime(reviewed_at, TIMESTAMP_FORMAT) + timedelta(days=interval_days)
+    return ScheduleState(ease, interval_days, repetitions, due_at.strftime(TIMESTAMP_FORMAT))
+
+
+def _advance(state, is_correct):
+    # SM-2 update of (ease, interval, repetitions); the due date only
+    # depends on the last review, so replays compute it once at the end
+    quality = CORRECT_QUALITY if is_correct else WRONG_QUALITY
+
+    if quality >= 3:
+        if state.repetitions == 0:
+            interval_days = 1.0
+        elif state.repetitions == 1:
+            interval_days = 6.0
+        else:
+            interval_days = min(round(state.interval_days * state.ease), MAX_INTERVAL_DAYS)
+        repetitions = state.repetitions + 1
+    else:
+        # A lapse restarts the repetition sequence from a one day interval
+        interval_days = 1.0
+        repetitions = 0
+
+    ease = state.ease + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    ease = max(MIN_EASE, ease)
+    return ease, interval_days, repetitions
+
+
+def load_states(cursor, user_id, word_ids, chunk_size=500):
+    """
+    Read a user's schedule of the given words
+
+    Args:
+        cursor: Database cursor
+        user_id: ID of the user
+        word_ids: Iterable of word IDs
+        chunk_size: Maximum number of IDs per query
+
+    Returns:
+        dict: word_id -> ScheduleState for words that have been reviewed
+    """
+    word_ids = list(word_ids)
+    states = {}
+    for start in range(0, len(word_ids), chunk_size):
+        chunk = word_ids[start:start + chunk_size]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f'''
+            SELECT word_id, ease, interval_days, repetitions, due_at
+            FROM word_reviews
+            WHERE user_id = ? AND word_id IN ({placeholders})
+        ''', [user_id] + chunk)
+        for row in cursor.fetchall():
+            states[row['word_id']] = ScheduleState(
+                row['ease'], row['interval_days'], row['repetitions'], row['due_at']
+            )
+    return states
+
+
+def save_states(cursor, user_id, states):
+    """
+    Store a user's schedules on word_reviews
+
+    The word_reviews rows must already exist.
+
+    Args:
+        cursor: Database cursor inside the write transaction
+        user_id: ID of the user
+        states: dict word_id -> ScheduleState
+    """
+    _store(cursor, (
+        (user_id, word_id, state) for word_id, state in states.items()
+    ))
+
+
+def _store(cursor, rows):
+    cursor.executemany('''
+        UPDATE word_reviews SET ease = ?, interval_days = ?, repetitions = ?, due_at = ?
+        WHERE user_id = ? AND word_id = ?
+    ''', [
+        (state.ease, state.interval_days, state.repetitions, state.due_at, user_id, word_id)
+        for user_id, word_id, state in rows
+    ])
+
+
+def schedule_reviews(cursor, user_id, reviews, reviewed_at):
+    """
+    Advance a user's schedule of every word in a batch of reviews
+
+    Each word takes one scheduling step per batch, however often it was
+    answered: a lapse if any answer was wrong, otherwise a pass.
+
+    Args:
+        cursor: Database cursor inside the write transaction
+        user_id: ID of the reviewing user
+        reviews: List of {'word_id': int, 'is_correct': bool} dicts
+        reviewed_at: Timestamp of the batch
+
+    Returns:
+        dict: word_id -> new ScheduleState
+    """
+    outcomes = {}
+    for review in reviews:
+        outcomes[review['word_id']] = outcomes.get(review['word_id'], True) and bool(review['is_correct'])
+
+    states = load_states(cursor, user_id, outcomes)
+    for word_id, is_correct in outcomes.items():
+        states[word_id] = next_state(states.get(word_id, NEW_STATE), is_correct, reviewed_at)
+    save_states(cursor, user_id, states)
+    return states
+
+
+def reset_schedule(cursor, user_id=None):
+    """
+    Forget schedules, making the words new again
+
+    Args:
+        cursor: Database cursor inside the write transaction
+        user_id: Only reset this user's schedules; None resets every user
+    """
+    user_filter = '' if user_id is None else 'AND user_id = ?'
+    cursor.execute(f'''
+        UPDATE word_reviews SET ease = ?, interval_days = 0, repetitions = 0, due_at = NULL
+        WHERE due_at IS NOT NULL {user_filter}
+    ''', (DEFAULT_EASE,) if user_id is None else (DEFAULT_EASE, user_id))
+
+
+def rebuild_schedule(cursor):
+    """
+    Replay the whole review history to recompute every user's schedules
+
+    Review items of one session with the same timestamp were one batch and
+    take one scheduling step, as in schedule_reviews. Batches of a session
+    submitted within the same second are replayed as one.
+
+    Args:
+        cursor: Database cursor; the caller commits
+    """
+    reset_schedule(cursor)
+    states = {}  # (user_id, word_id) -> (ScheduleState without due date, last review time)
+    pending = {}  # (user_id, word_id) -> ((session, time) of the open batch, all answers correct)
+
+    def apply(key, batch, is_correct):
+        state = states[key][0] if key in states else NEW_STATE
+        states[key] = (ScheduleState(*_advance(state, is_correct), None), batch[1])
+
+    # Users' histories are independent, so they are replayed one after
+    # another in the order of the (user_id, created_at) index
+    rows = cursor.execute('''
+        SELECT wri.user_id, wri.word_id, wri.study_session_id, wri.correct, wri.created_at
+        FROM word_review_items wri
+        JOIN word_reviews wr ON wr.user_id = wri.user_id AND wr.word_id = wri.word_id
+        ORDER BY wri.user_id, wri.created_at, wri.id
+    ''')
+    for user_id, word_id, session_id, correct, created_at in rows:
+        key = (user_id, word_id)
+        batch = (session_id, created_at)
+        is_correct = correct == 1
+        if key in pending:
+            pending_batch, pending_correct = pending[key]
+            if pending_batch == batch:
+                is_correct = is_correct and pending_correct
+            else:
+                apply(key, pending_batch, pending_correct)
+        pending[key] = (batch, is_correct)
+    for key, (batch, is_correct) in pending.items():
+        apply(key, batch, is_correct)
+    _store(cursor, (
+        (user_id, word_id, state._replace(due_at=(
+            datetime.strptime(reviewed_at, TIMESTAMP_FORMAT) + timedelta(days=state.interval_days)
+        ).strftime(TIMESTAMP_FORMAT)))
+        for (user_id, word_id), (state, reviewed_at) in states.items()
+    ))
@@ -0,0 +1,70 @@
+"""
+Full-text search helpers for the German Learning Portal API
+"""
+
+import re
+
+# Longest search query accepted, in characters
+MAX_QUERY_LENGTH = 200
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Folding of fold_search_text() in sql/postgres/schema.sql, which indexes
+# words for the PostgreSQL backend; the two must stay identical
+POSTGRES_FOLD_FROM = 'ÀÁÂÃÄÅàáâãäåÇçÈÉÊËèéêëÌÍÎÏìíîïÑñÒÓÔÕÖòóôõöÙÚÛÜùúûüÝýÿABCDEFGHIJKLMNOPQRSTUVWXYZ'
+POSTGRES_FOLD_TO = 'aaaaaaaaaaaacceeeeeeeeiiiiiiiinnoooooooooouuuuuuuuyyyabcdefghijklmnopqrstuvwxyz'
+_POSTGRES_FOLD = str.maketrans(POSTGRES_FOLD_FROM, POSTGRES_FOLD_TO)
+
+
+def fold_search_text(text):
+    """
+    Apply the folding the words_fts triggers apply to indexed text
+
+    Umlauts and other diacritics are folded by the FTS5 tokenizer itself;
+    ß has no single-letter base form, so it is spelled out as ss.
+
+    Args:
+        text: Raw text
+
+    Returns:
+        str: Folded text
+    """
+    return text.replace('ß', 'ss').replace('ẞ', 'SS')
+
+
+def build_match_query(query):
+    """
+    Turn user input into an FTS5 MATCH expression
+
+    Every word of the input must match the start of an indexed token, so
+    "sch" finds "schön" and "to wo" finds "to work". FTS5 syntax in the
+    input is neutralized by quoting each token.
+
+    Args:
+        query: Search text from the client
+
+    Returns:
+        str: MATCH expression, or None if the input has no searchable words
+    """
+    tokens = _TOKEN_PATTERN.findall(fold_search_text(query))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def build_tsquery(query):
+    """
+    Turn user input into a PostgreSQL tsquery, the counterpart of build_match_query
+
+    Args:
+        query: Search text from the client
+
+    Returns:
+        str: Input for to_tsquery('simple', ...), or None if the input has
+        no searchable words
+    """
+    folded = query.replace('ß', 'ss').replace('ẞ', 'ss').translate(_POSTGRES_FOLD)
+    tokens = _TOKEN_PATTERN.findall(folded)
+    if not tokens:
+        return None
+    return ' & '.join(f"'{token}':*" for token in tokens)
@@ -0,0 +1,238 @@
+"""
+Idempotent, incremental seeding for the German Learning Portal database
+
+``invoke init-db`` runs on every deploy, so seeding must be safe to repeat.
+Each seed file's SHA-256 digest is stored in seed_files and an unchanged
+file is skipped without being parsed. For a changed file, every record is
+hashed and compared with seed_records: new records go through the bulk
+importer, changed records update their word in place and unchanged records
+are left alone. Records removed from a file keep their word, since reviews
+may refer to it.
+
+A record is identified by its German text. When a file's German text is
+corrected, the record that disappeared is matched to the new one by its
+English text, and the word is renamed in place so its reviews stay with
+it. A change that would turn a word into a copy of another existing word
+links that word to the group instead.
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+
+from lib.data_version import bump_versions
+from lib.importer import import_words, iter_records, normalize_record
+
+SeedResult = namedtuple('SeedResult', ['path', 'skipped', 'added', 'updated', 'unchanged'])
+
+
+def file_digest(path):
+    """SHA-256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(64 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def record_digest(row):
+    """SHA-256 hex digest of a normalized word record"""
+    return hashlib.sha256(json.dumps(row, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def seed_file_changed(cursor, path, digest):
+    cursor.execute('SELECT digest FROM seed_files WHERE path = ?', (path,))
+    row = cursor.fetchone()
+    return row is None or row[0] != digest
+
+
+def record_seed_file(cursor, path, digest):
+    cursor.execute('''
+        INSERT INTO seed_files (path, digest) VALUES (?, ?)
+        ON CONFLICT(path) DO UPDATE SET digest = excluded.digest, seeded_at = CURRENT_TIMESTAMP
+    ''', (path, digest))
+
+
+def seed_words(connection, path, group_name):
+    """
+    Bring a group in line with a seed word file
+
+    Args:
+        connection: Writable database connection; changes are committed
+        path: Seed file holding a JSON array of word records
+        group_name: Group the file's words belong to (created if missing)
+
+    Returns:
+        SeedResult: Counts of added, updated and unchanged records, or
+        skipped=True if the file is unchanged since the last seed
+    """
+    cursor = connection.cursor()
+    digest = file_digest(path)
+    if not seed_file_changed(cursor, path, digest):
+        return SeedResult(path, True, 0, 0, 0)
+
+    cursor.execute('SELECT record_key, digest, word_id FROM seed_records WHERE path = ?', (path,))
+    stored = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    new_keys, changed = [], []
+    seen = {}
+    keys = set()
+    unchanged = 0
+    for number, record in enumerate(iter_records(path, 'json'), start=1):
+        row = normalize_record(record, number, group_name)
+        # German text identifies a record; repeats within a file get a suffix
+        seen[row[0]] = seen.get(row[0], 0) + 1
+        key = row[0] if seen[row[0]] == 1 else f'{row[0]}#{seen[row[0]]}'
+        keys.add(key)
+        row_digest = record_digest(row[:6])
+        if key not in stored:
+            new_keys.append((key, row_digest, row, record))
+        elif stored[key][0] != row_digest:
+            changed.append((key, row_digest, row, stored[key][1]))
+        else:
+            unchanged += 1
+
+    # Records no longer in the file are forgotten, after a renamed one has
+    # handed its word over to its new key
+    vanished = {key: word_id for key, (_, word_id) in stored.items() if key not in keys}
+    renamed = _match_renames(cursor, vanished, new_keys)
+    changed.extend((key, row_digest, row, renamed[key]) for key, row_digest, row, _ in new_keys if key in renamed)
+    new_keys = [new for new in new_keys if new[0] not in renamed]
+    cursor.executemany('DELETE FROM seed_records WHERE path = ? AND record_key = ?',
+                       [(path, key) for key in vanished])
+
+    # New words are inserted, or linked if the same word already exists
+    if new_keys:
+        import_words(connection, [record for *_, record in new_keys], group_name=group_name)
+    seed_rows = []
+    for key, row_digest, row, _ in new_keys:
+        cursor.execute('SELECT id FROM words WHERE german = ? AND english = ? ORDER BY id LIMIT 1', (row[0], row[2]))
+        seed_rows.append((path, key, row_digest, cursor.fetchone()[0]))
+
+    if changed:
+        changed = _link_duplicates(cursor, changed, group_name)
+        cursor.executemany('''
+            UPDATE words SET german = ?, pronunciation = ?, english = ?, parts = ?, gender = ?, plural = ?
+            WHERE id = ?
+        ''', [row[:6] + (word_id,) for _, _, row, word_id, update in changed if update])
+        bump_versions(cursor, 'words')
+        seed_rows.extend((path, key, row_digest, word_id) for key, row_digest, _, word_id, _ in changed)
+
+    cursor.executemany('''
+        INSERT INTO seed_records (path, record_key, digest, word_id) VALUES (?, ?, ?, ?)
+        ON CONFLICT(path, record_key) DO UPDATE SET digest = excluded.digest, word_id = excluded.word_id
+    ''', seed_rows)
+    record_seed_file(cursor, path, digest)
+    connection.commit()
+    return SeedResult(path, False, len(new_keys), len(changed), unchanged)
+
+
+def _match_renames(cursor, vanished, new_keys):
+    """
+    Pair new records with records that vanished from the file by English text
+
+    Only unambiguous pairs count: one vanished record and one new record
+    with the same English text.
+
+    Args:
+        cursor: Database cursor
+        vanished: Record key -> word ID of the records no longer in the file
+        new_keys: (key, digest, row, record) of the records not seeded before
+
+    Returns:
+        dict: New record key -> ID of the word it renames
+    """
+    if not vanished or not new_keys:
+        return {}
+    placeholders = ','.join('?' * len(vanished))
+    cursor.execute(f'SELECT id, english FROM words WHERE id IN ({placeholders})', list(vanished.values()))
+    english = {row[0]: row[1] for row in cursor.fetchall()}
+
+    old_by_english, new_by_english = {}, {}
+    for key, word_id in vanished.items():
+        old_by_english.setdefault(english.get(word_id), []).append((key, word_id))
+    for key, _, row, _ in new_keys:
+        new_by_english.setdefault(row[2], []).append(key)
+
+    renamed = {}
+    for text, keys in new_by_english.items():
+        olds = old_by_english.get(text, [])
+        if len(keys) == 1 and len(olds) == 1:
+            renamed[keys[0]] = olds[0][1]
+    return renamed
+
+
+def _link_duplicates(cursor, changed, group_name):
+    """
+    Keep changed records from duplicating another word's (german, english)
+
+    Such a record is pointed at the existing word, which joins the group,
+    and its old word is left as it is.
+
+    Returns:
+        list: (key, digest, row, word_id, update) with update=False for linked records
+    """
+    result, linked = [], False
+    for key, row_digest, row, word_id in changed:
+        cursor.execute('SELECT id FROM words WHERE german = ? AND english = ? AND id != ? ORDER BY id LIMIT 1',
+                       (row[0], row[2], word_id))
+        existing = cursor.fetchone()
+        if existing is None:
+            result.append((key, row_digest, row, word_id, True))
+            continue
+        cursor.execute('''
+            INSERT OR IGNORE INTO word_groups (word_id, group_id)
+            SELECT ?, id FROM groups WHERE name = ?
+        ''', (existing[0], group_name))
+        linked = True
+        result.append((key, row_digest, row, existing[0], False))
+
+    if linked:
+        cursor.execute('''
+            UPDATE groups SET words_count = (
+                SELECT COUNT(*) FROM word_groups WHERE word_groups.group_id = groups.id
+            )
+            WHERE name = ?
+        ''', (group_name,))
+        bump_versions(cursor, 'groups', 'word_groups')
+    return result
+
+
+def seed_study_activities(connection, path):
+    """
+    Insert or update the study activities of a seed file, keyed on name
+
+    Args:
+        connection: Writable database connection; changes are committed
+        path: Seed file holding a JSON array of activities
+
+    Returns:
+        SeedResult
+    """
+    cursor = connection.cursor()
+    digest = file_digest(path)
+    if not seed_file_changed(cursor, path, digest):
+        return SeedResult(path, True, 0, 0, 0)
+
+    with open(path, 'r', encoding='utf-8') as file:
+        activities = json.load(file)
+    cursor.execute('SELECT name, url, preview_url FROM study_activities')
+    existing = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    added = updated = 0
+    for activity in activities:
+        values = (activity['url'], activity.get('preview_url'))
+        if activity['name'] not in existing:
+            cursor.execute('INSERT INTO study_activities (name, url, preview_url) VALUES (?, ?, ?)',
+                           (activity['name'],) + values)
+            added += 1
+        elif existing[activity['name']] != values:
+            cursor.execute('UPDATE study_activities SET url = ?, preview_url = ? WHERE name = ?',
+                           values + (activity['name'],))
+            updated += 1
+
+    if added or updated:
+        bump_versions(cursor, 'study_activities')
+    record_seed_file(cursor, path, digest)
+    connection.commit()
+    return SeedResult(path, False, added, updated, len(activities) - added - updated)
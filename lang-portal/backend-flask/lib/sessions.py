@@ -0,0 +1,120 @@
+"""
+Study session lifecycle helpers for the German Learning Portal API
+
+A session is open from creation until it is closed explicitly. Reviews
+advance its last_review_at, review_count and correct_count; closing sets
+ended_at. The SQL expressions below are indexed by migration 0007, per user
+since migration 0011, and must stay textually identical to the index
+definitions. The PostgreSQL variants are indexed by sql/postgres/schema.sql.
+"""
+
+from lib.storage import POSTGRES, SQLITE
+
+
+def end_time_expression(alias='ss'):
+    """SQL for when a session ended: closed, else last reviewed, else started"""
+    return f'COALESCE({alias}.ended_at, {alias}.last_review_at, {alias}.created_at)'
+
+
+def duration_expression(alias='ss', dialect=SQLITE):
+    """SQL for a session's duration in seconds"""
+    if dialect == POSTGRES:
+        return f'EXTRACT(EPOCH FROM {end_time_expression(alias)} - {alias}.created_at)'
+    return f'(julianday({end_time_expression(alias)}) - julianday({alias}.created_at)) * 86400'
+
+
+def accuracy_expression(alias='ss'):
+    """SQL for a session's share of correct reviews, NULL without reviews"""
+    return (
+        f'(CASE WHEN {alias}.review_count > 0 '
+        f'THEN {alias}.correct_count * 1.0 / {alias}.review_count END)'
+    )
+
+
+def sort_expressions(alias='ss', dialect=SQLITE):
+    """
+    Sort keys accepted by the session listings, created_at first
+
+    Args:
+        alias: Alias of the study_sessions table in the query
+        dialect: SQL dialect of the storage backend
+
+    Returns:
+        dict: sort key -> SQL expression
+    """
+    return {
+        'created_at': f'{alias}.created_at',
+        'duration': duration_expression(alias, dialect),
+        'accuracy': accuracy_expression(alias),
+    }
+
+
+def parse_session_filters(args, alias='ss', dialect=SQLITE):
+    """
+    Build WHERE conditions from the duration and accuracy query arguments
+
+    Supports min_duration/max_duration (seconds) and min_accuracy/max_accuracy
+    (0 to 1). Sessions without reviews have no accuracy and are excluded by
+    the accuracy filters.
+
+    Args:
+        args: Request query arguments
+        alias: Alias of the study_sessions table in the query
+        dialect: SQL dialect of the storage backend
+
+    Returns:
+        tuple: (list of SQL conditions, params, error_message)
+    """
+    bounds = [
+        ('min_duration', duration_expression(alias, dialect), '>=', None),
+        ('max_duration', duration_expression(alias, dialect), '<=', None),
+        ('min_accuracy', accuracy_expression(alias), '>=', 1),
+        ('max_accuracy', accuracy_expression(alias), '<=', 1),
+    ]
+
+    conditions = []
+    params = []
+    for name, expression, operator, upper_limit in bounds:
+        value = args.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            value = float(value)
+        except ValueError:
+            return [], [], f"{name} must be a number"
+        if value < 0 or (upper_limit is not None and value > upper_limit):
+            limit = f"between 0 and {upper_limit}" if upper_limit is not None else "non-negative"
+            return [], [], f"{name} must be {limit}"
+        conditions.append(f'{expression} {operator} ?')
+        params.append(value)
+
+    return conditions, params, None
+
+
+def format_session_lifecycle(session):
+    """
+    Lifecycle fields shared by every session representation
+
+    Args:
+        session: Row selecting ended_at, review_count, correct_count,
+            duration_seconds and accuracy
+
+    Returns:
+        dict: status, ended_at, correct_count, duration_seconds and accuracy
+    """
+    return {
+        'status': 'closed' if session['ended_at'] else 'open',
+        'ended_at': session['ended_at'],
+        'correct_count': session['correct_count'],
+        'duration_seconds': int(round(session['duration_seconds'] or 0)),
+        'accuracy': session['accuracy'],
+    }
+
+
+def lifecycle_columns(alias='ss', dialect=SQLITE):
+    """SQL select list for the columns format_session_lifecycle reads"""
+    return (
+        f'{alias}.ended_at, {alias}.last_review_at, {alias}.review_count, {alias}.correct_count, '
+        f'{duration_expression(alias, dialect)} as duration_seconds, '
+        f'{accuracy_expression(alias)} as accuracy'
+    )
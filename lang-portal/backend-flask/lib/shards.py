@@ -0,0 +1,358 @@
+"""
+Per-user database shards for the German Learning Portal
+
+With a single database file every learner's review writes queue behind
+the same SQLite write lock. In sharded mode the app's database only holds
+the shared vocabulary (words, groups, word_groups, study_activities and
+users) and each user's study history lives in a shard file of its own,
+``<directory>/user-<id>.db``, so learners only serialize against
+themselves.
+
+A shard connection opens the user's file as ``main`` and attaches the
+shared database read-only as ``vocab``. SQLite looks unqualified table
+names up in ``main`` before attached databases, so route SQL reads
+``study_sessions`` from the shard and ``words`` from the shared database
+without changes, and joins across the two work as before.
+
+The shard tables are copied from the shared database's schema when a
+shard is opened, so new shards match the applied migrations and indexes
+added by later migrations reach existing shards. A shard table whose
+definition a migration changed is rebuilt from the new definition,
+keeping the values of the columns both definitions have; ``invoke migrate
+--shards-dir`` does this for every shard right after the migrations.
+Migrations that also move data between columns of these tables need a
+shard step of their own.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+from lib.pool import ConnectionPool
+
+VOCAB_SCHEMA = 'vocab'
+
+# Tables kept per user; everything else is read from the shared database
+SHARD_TABLES = (
+    'study_sessions',
+    'word_review_items',
+    'word_reviews',
+    'word_stats',
+    'learning_stats',
+    'data_versions',
+)
+
+TOTAL_COLUMNS = ('total_sessions', 'total_attempts', 'total_correct', 'words_studied', 'mastered_words')
+
+SHARD_FILE = re.compile(r'^user-(\d+)\.db$')
+
+
+class ShardSchemaError(Exception):
+    """Raised when a shard table cannot be upgraded to the shared schema"""
+
+
+class ShardConnection(sqlite3.Connection):
+    """Connection to a user's shard with the shared database attached"""
+
+    # Read by lib.data_version, whose versions are split across both files
+    attached_schemas = (VOCAB_SCHEMA,)
+
+
+def shard_path(directory, user_id):
+    """Path of a user's shard file"""
+    return os.path.join(directory, f'user-{user_id}.db')
+
+
+def connect_shard(path, database):
+    """
+    Open a shard with the shared database attached read-only
+
+    Args:
+        path: Shard file, created if missing
+        database: Shared vocabulary database
+
+    Returns:
+        ShardConnection
+    """
+    connection = sqlite3.connect(
+        'file:' + quote(os.path.abspath(path)), uri=True,
+        check_same_thread=False, factory=ShardConnection
+    )
+    try:
+        connection.execute(
+            f'ATTACH DATABASE ? AS {VOCAB_SCHEMA}',
+            ('file:' + quote(os.path.abspath(database)) + '?mode=ro',)
+        )
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+
+def _schema(connection, schema):
+    # name -> CREATE statement of the shard tables and their indexes and
+    # triggers, tables first so they exist before what refers to them
+    placeholders = ','.join('?' * len(SHARD_TABLES))
+    rows = connection.execute(f'''
+        SELECT name, sql FROM {schema}.sqlite_master
+        WHERE tbl_name IN ({placeholders}) AND sql IS NOT NULL
+        ORDER BY type != 'table', rowid
+    ''', SHARD_TABLES).fetchall()
+    return OrderedDict((row[0], row[1]) for row in rows)
+
+
+def _columns(connection, table):
+    return [row[1] for row in connection.execute(f'PRAGMA main.table_info("{table}")')]
+
+
+def _drop(connection, name):
+    kind = connection.execute('SELECT type FROM main.sqlite_master WHERE name = ?', (name,)).fetchone()[0]
+    connection.execute(f'DROP {kind.upper()} main."{name}"')
+
+
+def _rebuild_table(connection, table, sql, current):
+    # Indexes and triggers go with the old table and are recreated from the
+    # shared schema afterwards. Renaming with legacy_alter_table keeps the
+    # other tables' references to the table as they are.
+    attached = connection.execute('''
+        SELECT name FROM main.sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''', (table,)).fetchall()
+    for (name,) in attached:
+        _drop(connection, name)
+        del current[name]
+    connection.execute('PRAGMA legacy_alter_table = ON')
+    try:
+        connection.execute(f'ALTER TABLE main."{table}" RENAME TO "{table}__old"')
+    finally:
+        connection.execute('PRAGMA legacy_alter_table = OFF')
+    connection.execute(sql)
+
+    kept = set(_columns(connection, f'{table}__old'))
+    columns = ', '.join(f'"{column}"' for column in _columns(connection, table) if column in kept)
+    try:
+        connection.execute(f'INSERT INTO main."{table}" ({columns}) SELECT {columns} FROM main."{table}__old"')
+    except sqlite3.IntegrityError as e:
+        raise ShardSchemaError(f"Shard table {table} cannot be upgraded: {e}")
+    connection.execute(f'DROP TABLE main."{table}__old"')
+    current[table] = sql
+
+
+def prepare_shard(connection):
+    """
+    Bring a shard's tables, indexes and triggers in line with the shared schema
+
+    Missing objects are created, changed tables are rebuilt with their
+    data and changed or removed indexes and triggers are replaced.
+
+    Args:
+        connection: Writable shard connection from ``connect_shard``
+
+    Raises:
+        ShardSchemaError: If a shard table's rows do not fit its new definition
+    """
+    expected = _schema(connection, VOCAB_SCHEMA)
+    if dict(_schema(connection, 'main')) == dict(expected):
+        return
+
+    # Concurrent first opens of the same shard wait here for each other
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        current = _schema(connection, 'main')
+        for name in [name for name in current if name not in expected and name not in SHARD_TABLES]:
+            _drop(connection, name)
+            del current[name]
+        for name, sql in expected.items():
+            if name not in current:
+                connection.execute(sql)
+            elif current[name] == sql:
+                continue
+            elif name in SHARD_TABLES:
+                _rebuild_table(connection, name, sql, current)
+            else:
+                _drop(connection, name)
+                connection.execute(sql)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+
+class ShardRouter:
+    """
+    Routes users to their shards, keeping the most recently used ones open
+
+    Each open shard has a pool with a single writer, like the shared
+    database, and a pool of read-only connections. At most ``max_open``
+    shards are kept open; the least recently used one is closed when
+    another is opened. Connections still checked out of an evicted
+    shard are closed when they are returned.
+    """
+
+    def __init__(self, directory, connect, max_open=64, pool_size=5, pool_timeout=30.0, pool_max_idle=300.0):
+        """
+        Args:
+            directory: Directory holding the shard files
+            connect: ``connect(path, readonly)`` opening a shard connection
+            max_open: Shards kept open at most
+            pool_size: Read-only connections per open shard
+            pool_timeout: Seconds to wait for a free connection
+            pool_max_idle: Seconds before an idle connection is closed
+        """
+        self.directory = directory
+        self.connect = connect
+        self.max_open = max_open
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.pool_max_idle = pool_max_idle
+
+        self._open = OrderedDict()  # user_id -> (write pool, read pool)
+        self._lock = threading.Lock()
+        self._opens = 0
+        self._evictions = 0
+
+    def path(self, user_id):
+        return shard_path(self.directory, user_id)
+
+    def checkout(self, user_id, readonly=False):
+        """
+        Take a connection to a user's shard out of its pool
+
+        Args:
+            user_id: User whose shard to use
+            readonly: Take a read-only connection instead of the writer
+
+        Returns:
+            tuple: (pool, connection); return the connection with
+            ``pool.checkin(connection)``
+        """
+        while True:
+            write_pool, read_pool = self._pools(user_id)
+            pool = read_pool if readonly else write_pool
+            try:
+                return pool, pool.checkout()
+            except RuntimeError:
+                # Evicted between the lookup and the checkout
+                continue
+
+    def user_ids(self):
+        """IDs of the users that have a shard file, in order"""
+        if not os.path.isdir(self.directory):
+            return []
+        matches = (SHARD_FILE.match(name) for name in os.listdir(self.directory))
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    def aggregate(self, sql, parameters=()):
+        """
+        Run a read query against every shard
+
+        Shards are opened one at a time outside the open-shard cache, so
+        an admin scan does not evict the shards serving requests.
+
+        Args:
+            sql: Query; the shared database is attached as ``vocab``
+            parameters: Query parameters
+
+        Yields:
+            tuple: (user_id, rows)
+        """
+        for user_id in self.user_ids():
+            connection = self.connect(self.path(user_id), True)
+            try:
+                yield user_id, connection.execute(sql, parameters).fetchall()
+            finally:
+                connection.close()
+
+    def close_all(self):
+        with self._lock:
+            while self._open:
+                _, pools = self._open.popitem(last=False)
+                self._close(pools)
+
+    def stats(self):
+        """
+        Snapshot of the router counters
+
+        Returns:
+            dict: Open shards and how often shards were opened and evicted
+        """
+        with self._lock:
+            return {
+                "open": len(self._open),
+                "max_open": self.max_open,
+                "opens": self._opens,
+                "evictions": self._evictions,
+            }
+
+    def _pools(self, user_id):
+        with self._lock:
+            pools = self._open.get(user_id)
+            if pools is not None:
+                self._open.move_to_end(user_id)
+                return pools
+
+        # Create or upgrade the shard outside the lock; other users' shards
+        # stay available meanwhile
+        path = self.path(user_id)
+        os.makedirs(self.directory, exist_ok=True)
+        connection = self.connect(path, False)
+        try:
+            prepare_shard(connection)
+        finally:
+            connection.close()
+
+        pools = (
+            ConnectionPool(
+                lambda: self.connect(path, False),
+                max_size=1,
+                timeout=self.pool_timeout,
+                max_idle=self.pool_max_idle
+            ),
+            ConnectionPool(
+                lambda: self.connect(path, True),
+                max_size=self.pool_size,
+                timeout=self.pool_timeout,
+                max_idle=self.pool_max_idle
+            ),
+        )
+        with self._lock:
+            existing = self._open.get(user_id)
+            if existing is not None:
+                # Another thread opened it first; ours never connected
+                self._open.move_to_end(user_id)
+                return existing
+            self._open[user_id] = pools
+            self._opens += 1
+            while len(self._open) > self.max_open:
+                _, evicted = self._open.popitem(last=False)
+                self._close(evicted)
+                self._evictions += 1
+            return pools
+
+    @staticmethod
+    def _close(pools):
+        for pool in pools:
+            pool.close_all()
+
+
+def shard_totals(router):
+    """
+    Learning statistics summed over every user's shard
+
+    Args:
+        router: ShardRouter
+
+    Returns:
+        dict: Number of shards and the summed learning_stats columns
+    """
+    totals = dict.fromkeys(TOTAL_COLUMNS, 0)
+    totals['shards'] = 0
+    for _, rows in router.aggregate(f'SELECT {", ".join(TOTAL_COLUMNS)} FROM learning_stats'):
+        totals['shards'] += 1
+        for row in rows:
+            for column, value in zip(TOTAL_COLUMNS, row):
+                totals[column] += value or 0
+    return totals
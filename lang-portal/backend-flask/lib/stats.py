@@ -0,0 +1,271 @@
+"""
+Incrementally maintained learning statistics for the German Learning Portal API
+
+Each user's learning_stats summary row and per-word word_stats counters are
+updated in the same transaction as the session and review writes, so the
+dashboard reads them without aggregating word_review_items. The summary row
+is created with the user's first session.
+
+The statements are Query objects (lib/storage.py) with PostgreSQL variants
+where SQLite's date functions are used.
+"""
+
+from lib.storage import Query
+
+# A word counts as mastered after this many attempts at this success rate
+MASTERY_MIN_ATTEMPTS = 5
+MASTERY_SUCCESS_RATE = 0.8
+
+SESSION_DAY = Query(
+    'SELECT user_id, date(created_at) AS study_date FROM study_sessions WHERE id = ?',
+    postgres='SELECT user_id, created_at::date AS study_date FROM study_sessions WHERE id = ?'
+)
+
+# A study day extends the streak when it directly follows the previous
+# study day; the first study day ever starts it at 1
+COUNT_SESSION = Query('''
+    INSERT INTO learning_stats (user_id, total_sessions, current_streak, last_study_date)
+    VALUES (:user_id, 1, 1, :study_date)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total_sessions = learning_stats.total_sessions + 1,
+        current_streak = CASE
+            WHEN learning_stats.last_study_date IS NULL THEN 1
+            WHEN julianday(:study_date) - julianday(learning_stats.last_study_date) = 1
+                THEN learning_stats.current_streak + 1
+            ELSE learning_stats.current_streak
+        END,
+        last_study_date = MAX(COALESCE(learning_stats.last_study_date, :study_date), :study_date)
+''', postgres='''
+    INSERT INTO learning_stats (user_id, total_sessions, current_streak, last_study_date)
+    VALUES (:user_id, 1, 1, :study_date)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total_sessions = learning_stats.total_sessions + 1,
+        current_streak = CASE
+            WHEN learning_stats.last_study_date IS NULL THEN 1
+            WHEN CAST(:study_date AS date) - learning_stats.last_study_date = 1
+                THEN learning_stats.current_streak + 1
+            ELSE learning_stats.current_streak
+        END,
+        last_study_date = GREATEST(COALESCE(learning_stats.last_study_date, CAST(:study_date AS date)),
+                                   CAST(:study_date AS date))
+''')
+
+WORD_COUNTERS = Query(
+    'SELECT word_id, attempts, successes FROM word_stats WHERE user_id = ? AND word_id IN ({placeholders})'
+)
+
+ADD_WORD_COUNTERS = Query('''
+    INSERT INTO word_stats (user_id, word_id, attempts, successes)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, word_id) DO UPDATE SET
+        attempts = word_stats.attempts + excluded.attempts,
+        successes = word_stats.successes + excluded.successes
+''')
+
+ADD_TOTALS = Query('''
+    INSERT INTO learning_stats (user_id, total_attempts, total_correct, words_studied, mastered_words)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total_attempts = learning_stats.total_attempts + excluded.total_attempts,
+        total_correct = learning_stats.total_correct + excluded.total_correct,
+        words_studied = learning_stats.words_studied + excluded.words_studied,
+        mastered_words = learning_stats.mastered_words + excluded.mastered_words
+''')
+
+# One pass over the history; only sessions whose stored values differ are
+# written, since every write also updates the session indexes
+_REBUILD_SESSION_TOTALS = '''
+    UPDATE study_sessions SET
+        last_review_at = totals.last_review_at,
+        review_count = totals.review_count,
+        correct_count = totals.correct_count
+    FROM (
+        SELECT study_session_id,
+               MAX(created_at) AS last_review_at,
+               COUNT(*) AS review_count,
+               SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) AS correct_count
+        FROM word_review_items
+        GROUP BY study_session_id
+    ) AS totals
+    WHERE totals.study_session_id = study_sessions.id
+      AND (study_sessions.last_review_at {is_distinct} totals.last_review_at
+           OR study_sessions.review_count != totals.review_count
+           OR study_sessions.correct_count != totals.correct_count)
+'''
+REBUILD_SESSION_TOTALS = Query(
+    _REBUILD_SESSION_TOTALS.format(is_distinct='IS NOT'),
+    postgres=_REBUILD_SESSION_TOTALS.format(is_distinct='IS DISTINCT FROM')
+)
+
+CLEAR_UNREVIEWED_SESSIONS = Query('''
+    UPDATE study_sessions SET last_review_at = NULL, review_count = 0, correct_count = 0
+    WHERE (last_review_at IS NOT NULL OR review_count != 0 OR correct_count != 0)
+      AND NOT EXISTS (
+        SELECT 1 FROM word_review_items WHERE study_session_id = study_sessions.id
+      )
+''')
+
+REBUILD_WORD_COUNTERS = Query('''
+    INSERT INTO word_stats (user_id, word_id, attempts, successes)
+    SELECT ss.user_id, wri.word_id, COUNT(*), SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END)
+    FROM word_review_items wri
+    JOIN study_sessions ss ON wri.study_session_id = ss.id
+    GROUP BY ss.user_id, wri.word_id
+''')
+
+# One summary row per user with sessions
+_REBUILD_SESSION_STATS = '''
+    WITH daily_sessions AS (
+        SELECT DISTINCT user_id, {day} AS study_date FROM study_sessions
+    ),
+    streak_calc AS (
+        SELECT
+            user_id,
+            study_date,
+            {days_between} as days_diff
+        FROM daily_sessions
+    )
+    INSERT INTO learning_stats (user_id, total_sessions, current_streak, last_study_date)
+    SELECT sessions.user_id, sessions.total, streaks.streak, sessions.last_study_date
+    FROM (
+        SELECT user_id, COUNT(*) AS total, MAX({day}) AS last_study_date
+        FROM study_sessions
+        GROUP BY user_id
+    ) AS sessions
+    JOIN (
+        SELECT user_id, COUNT(*) AS streak
+        FROM streak_calc
+        WHERE days_diff = 1 OR days_diff IS NULL
+        GROUP BY user_id
+    ) AS streaks ON streaks.user_id = sessions.user_id
+'''
+REBUILD_SESSION_STATS = Query(
+    _REBUILD_SESSION_STATS.format(
+        day='date(created_at)',
+        days_between='julianday(study_date) - julianday(lag(study_date, 1) over (partition by user_id order by study_date))'
+    ),
+    postgres=_REBUILD_SESSION_STATS.format(
+        day='created_at::date',
+        days_between='study_date - lag(study_date, 1) over (partition by user_id order by study_date)'
+    )
+)
+
+REBUILD_TOTALS = Query('''
+    UPDATE learning_stats SET
+        total_attempts = totals.attempts,
+        total_correct = totals.successes,
+        words_studied = totals.words,
+        mastered_words = totals.mastered
+    FROM (
+        SELECT user_id,
+               SUM(attempts) AS attempts,
+               SUM(successes) AS successes,
+               COUNT(*) AS words,
+               SUM(CASE WHEN attempts >= ? AND successes * 1.0 / attempts >= ? THEN 1 ELSE 0 END) AS mastered
+        FROM word_stats
+        GROUP BY user_id
+    ) AS totals
+    WHERE totals.user_id = learning_stats.user_id
+''')
+
+
+def is_mastered(attempts, successes):
+    """
+    Check whether a word's counters qualify it as mastered
+
+    Args:
+        attempts: Number of review items for the word
+        successes: Number of correct review items for the word
+
+    Returns:
+        bool: True if the word is mastered
+    """
+    # Same floating point division the SQL aggregate used, so the
+    # incremental and rebuilt counters agree at the 80% boundary
+    return attempts >= MASTERY_MIN_ATTEMPTS and successes * 1.0 / attempts >= MASTERY_SUCCESS_RATE
+
+
+def record_session(cursor, session_id):
+    """
+    Count a newly created study session and advance its user's streak
+
+    Args:
+        cursor: Database cursor inside the session's write transaction
+        session_id: ID of the inserted study session
+    """
+    session = SESSION_DAY.execute(cursor, (session_id,)).fetchone()
+    COUNT_SESSION.execute(cursor, {'user_id': session['user_id'], 'study_date': session['study_date']})
+
+
+def record_reviews(cursor, user_id, word_results):
+    """
+    Fold a batch of review results into a user's word and summary counters
+
+    Args:
+        cursor: Database cursor inside the review's write transaction
+        user_id: ID of the user who reviewed the words
+        word_results: dict mapping word_id to (attempts, successes) deltas
+    """
+    if not word_results:
+        return
+
+    word_ids = list(word_results)
+    WORD_COUNTERS.execute(cursor, [user_id] + word_ids, placeholders=','.join('?' * len(word_ids)))
+    previous = {row['word_id']: (row['attempts'], row['successes']) for row in cursor.fetchall()}
+
+    new_words = 0
+    mastered_delta = 0
+    for word_id, (attempts, successes) in word_results.items():
+        before = previous.get(word_id)
+        if before is None:
+            new_words += 1
+            before = (0, 0)
+        after = (before[0] + attempts, before[1] + successes)
+        mastered_delta += int(is_mastered(*after)) - int(before[0] > 0 and is_mastered(*before))
+
+    ADD_WORD_COUNTERS.executemany(cursor, [
+        (user_id, word_id, attempts, successes)
+        for word_id, (attempts, successes) in word_results.items()
+    ])
+
+    ADD_TOTALS.execute(cursor, (
+        user_id,
+        sum(attempts for attempts, _ in word_results.values()),
+        sum(successes for _, successes in word_results.values()),
+        new_words,
+        mastered_delta
+    ))
+
+
+def reset_learning_stats(cursor, user_id=None):
+    """
+    Drop the counters after the study history has been cleared
+
+    Args:
+        cursor: Database cursor inside the write transaction
+        user_id: Only reset this user's counters; None resets every user
+    """
+    if user_id is None:
+        cursor.execute('DELETE FROM word_stats')
+        cursor.execute('DELETE FROM learning_stats')
+    else:
+        cursor.execute('DELETE FROM word_stats WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM learning_stats WHERE user_id = ?', (user_id,))
+
+
+def rebuild_learning_stats(cursor):
+    """
+    Recompute every user's counters from word_review_items and study_sessions
+
+    Also restores the last review time and review/correct counts stored on
+    each session.
+
+    Args:
+        cursor: Database cursor; the caller commits
+    """
+    reset_learning_stats(cursor)
+    REBUILD_SESSION_TOTALS.execute(cursor)
+    CLEAR_UNREVIEWED_SESSIONS.execute(cursor)
+    REBUILD_WORD_COUNTERS.execute(cursor)
+    REBUILD_SESSION_STATS.execute(cursor)
+    REBUILD_TOTALS.execute(cursor, (MASTERY_MIN_ATTEMPTS, MASTERY_SUCCESS_RATE))
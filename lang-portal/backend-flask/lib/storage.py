@@ -0,0 +1,471 @@
+"""
+Storage backends for the German Learning Portal API
+
+Routes reach the database through the repositories in lib/repositories.py,
+which run Query objects on the cursors of a storage backend. A query is
+written once for SQLite; where PostgreSQL needs other SQL (date
+arithmetic, string aggregation, full-text search) it carries a PostgreSQL
+variant. Both backends hand out DB-API cursors that take SQLite's ``?`` and
+``:name`` placeholders and return rows indexed by position and by column
+name, so helpers written against a cursor (lib/stats.py, lib/scheduler.py,
+lib/reviews.py, lib/vocabulary.py) run on either.
+
+SQLite, through lib.db.Db with its pools, shards and query tracing, is the
+default. The PostgreSQL backend needs the optional ``psycopg`` package and
+a database set up from sql/postgres/schema.sql.
+"""
+
+import datetime
+import decimal
+import functools
+import os
+import re
+import sqlite3
+
+from flask import g
+
+from lib.pool import ConnectionPool
+
+try:
+    import psycopg
+except ImportError:  # Only needed for the postgres backend
+    psycopg = None
+
+SQLITE = 'sqlite'
+POSTGRES = 'postgres'
+
+POSTGRES_SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'postgres', 'schema.sql')
+
+# String literals are copied as is; ? and :name outside them are placeholders
+_PLACEHOLDER = re.compile(r"'(?:[^']|'')*'|(?<![:\w]):([A-Za-z_]\w*)|\?")
+
+
+class ConflictError(Exception):
+    """Raised by repositories when a write violates a unique constraint"""
+
+
+def dialect_of(cursor):
+    """SQL dialect of a backend cursor; plain sqlite3 cursors are SQLite"""
+    return getattr(cursor, 'dialect', SQLITE)
+
+
+class Query:
+    """
+    SQL of one storage operation
+
+    ``sql`` is the SQLite statement, with ``?`` or ``:name`` placeholders.
+    ``{name}`` fields are filled from the fragments passed when the query
+    runs; fragments are built by code (sort columns, IN lists, filter
+    conditions), never copied from request input. Queries run without
+    fragments are used as is and may contain braces.
+    """
+
+    __slots__ = ('sql', 'variants')
+
+    def __init__(self, sql, postgres=None):
+        """
+        Args:
+            sql: SQLite statement
+            postgres: PostgreSQL statement, if it differs
+        """
+        self.sql = sql
+        self.variants = {POSTGRES: postgres} if postgres is not None else {}
+
+    def render(self, dialect, **fragments):
+        """SQL for ``dialect`` with the fragments filled in"""
+        sql = self.variants.get(dialect, self.sql)
+        return sql.format(**fragments) if fragments else sql
+
+    def execute(self, cursor, parameters=(), **fragments):
+        """Run the query on a backend cursor; returns the cursor"""
+        cursor.execute(self.render(dialect_of(cursor), **fragments), parameters)
+        return cursor
+
+    def executemany(self, cursor, seq_of_parameters, **fragments):
+        """Run the query once per parameter set; returns the cursor"""
+        cursor.executemany(self.render(dialect_of(cursor), **fragments), seq_of_parameters)
+        return cursor
+
+    def insert(self, cursor, parameters=(), **fragments):
+        """
+        Run an INSERT of a single row
+
+        Returns:
+            int: ID of the new row
+        """
+        dialect = dialect_of(cursor)
+        if dialect == POSTGRES:
+            cursor.execute(self.render(dialect, **fragments) + ' RETURNING id', parameters)
+            return cursor.fetchone()[0]
+        cursor.execute(self.render(dialect, **fragments), parameters)
+        return cursor.lastrowid
+
+
+def order_term(expression, order, dialect):
+    """
+    ORDER BY term sorting NULLs first in ascending order, as SQLite does
+
+    Args:
+        expression: SQL expression to sort by
+        order: 'asc' or 'desc'
+        dialect: SQL dialect of the query
+
+    Returns:
+        str: Term for an ORDER BY clause
+    """
+    if dialect == POSTGRES:
+        return f"{expression} {order} NULLS {'FIRST' if order == 'asc' else 'LAST'}"
+    return f'{expression} {order}'
+
+
+class SQLiteBackend:
+    """Storage on the app's SQLite database (lib.db.Db)"""
+
+    dialect = SQLITE
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, readonly=False, shared=False, streaming=False):
+        """
+        Cursor on the request's connection
+
+        Args:
+            readonly: A read-only connection is enough
+            shared: Use the shared database also in sharded mode (lib/shards.py)
+            streaming: The result is read in batches (no effect on SQLite)
+        """
+        return self.db.cursor(readonly=readonly, shared=shared)
+
+    def commit(self, shared=False):
+        self.db.commit(shared=shared)
+
+    def rollback(self, shared=False):
+        self.db.get(shared=shared).rollback()
+
+    def close(self):
+        self.db.close()
+
+    def dispose(self):
+        self.db.dispose()
+
+    def pool_stats(self):
+        return self.db.pool_stats()
+
+
+@functools.lru_cache(maxsize=1024)
+def to_pyformat(sql, named=False):
+    """
+    Translate ``?`` (or ``:name``) placeholders to psycopg's ``%s`` (``%(name)s``)
+
+    Args:
+        sql: Statement with SQLite placeholders
+        named: The parameters are a mapping
+
+    Returns:
+        str: Statement for psycopg, with literal ``%`` doubled
+    """
+    def replace(match):
+        text = match.group(0)
+        if text.startswith("'"):
+            return text
+        if text == '?':
+            return '%s'
+        return f'%({match.group(1)})s' if named else text
+    return _PLACEHOLDER.sub(replace, sql.replace('%', '%%'))
+
+
+class Row:
+    """Result row indexed by position and by column name, like sqlite3.Row"""
+
+    __slots__ = ('_values', '_index')
+
+    def __init__(self, values, index):
+        self._values = values
+        self._index = index
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._values[self._index[key]]
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            other = other._values
+        return tuple(self._values) == tuple(other)
+
+    def __repr__(self):
+        return f'Row({dict(zip(self._index, self._values))!r})'
+
+    def keys(self):
+        return list(self._index)
+
+
+def _convert(value):
+    # Values as SQLite returns them, so responses do not depend on the
+    # backend: timestamps as 'YYYY-MM-DD HH:MM:SS' text, numerics as floats
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
+def _row_factory(cursor):
+    if cursor.description is None:
+        return tuple
+    index = {column.name: position for position, column in enumerate(cursor.description)}
+
+    def make_row(values):
+        return Row([_convert(value) for value in values], index)
+    return make_row
+
+
+class PostgresCursor:
+    """psycopg cursor taking SQLite placeholders"""
+
+    dialect = POSTGRES
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, parameters=()):
+        named = isinstance(parameters, dict)
+        # Always pass the parameters, even none, so the doubled % are undone
+        self._cursor.execute(to_pyformat(sql, named), parameters if named else tuple(parameters))
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        if seq_of_parameters:
+            named = isinstance(seq_of_parameters[0], dict)
+            self._cursor.executemany(to_pyformat(sql, named), seq_of_parameters)
+        return self
+
+    @property
+    def lastrowid(self):
+        raise AttributeError("PostgreSQL cursors have no lastrowid; use Query.insert")
+
+
+class PostgresStreamCursor(PostgresCursor):
+    """
+    Server-side cursor on a connection of its own
+
+    The connection goes back to the pool once the result has been read or
+    the cursor is closed.
+    """
+
+    def __init__(self, cursor, release):
+        self._release = release
+        super().__init__(cursor)
+
+    def fetchmany(self, size=0):
+        rows = self._cursor.fetchmany(size)
+        if not rows:
+            self.close()
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self.close()
+        return rows
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is not None:
+            self._cursor.close()
+            release()
+
+    def __del__(self):
+        # A response abandoned mid-stream still returns its connection
+        self.close()
+
+
+if psycopg is not None:
+    class PostgresConnection(psycopg.Connection):
+        """psycopg connection exposing ``in_transaction`` for lib.pool"""
+
+        @property
+        def in_transaction(self):
+            return self.info.transaction_status != psycopg.pq.TransactionStatus.IDLE
+
+
+class PostgresBackend:
+    """
+    Storage on a PostgreSQL server
+
+    A request checks one connection out of a bounded pool and uses it for
+    reads and writes. The server handles concurrent writers, so unlike
+    SQLite there is no single writer connection, and any number of web
+    processes can share the database.
+    """
+
+    dialect = POSTGRES
+
+    def __init__(self, dsn, pool_size=5, pool_timeout=30.0, pool_max_idle=300.0):
+        """
+        Args:
+            dsn: libpq connection string or URI
+            pool_size: Connections pooled per worker process
+            pool_timeout: Seconds a request waits for a free connection
+            pool_max_idle: Seconds before an idle connection is closed
+        """
+        if psycopg is None:
+            raise RuntimeError("The postgres storage backend needs the psycopg package")
+        self.dsn = dsn
+        self.IntegrityError = psycopg.IntegrityError
+        self.pool = ConnectionPool(self.connect, max_size=pool_size, timeout=pool_timeout, max_idle=pool_max_idle)
+
+    def connect(self):
+        return PostgresConnection.connect(self.dsn, row_factory=_row_factory)
+
+    def get(self):
+        # One connection per app context, returned to the pool by close()
+        if 'pg_db' not in g:
+            g.pg_db = self.pool.checkout()
+        return g.pg_db
+
+    def cursor(self, readonly=False, shared=False, streaming=False):
+        """
+        Cursor on the request's connection
+
+        Args:
+            readonly: Ignored; reads and writes share the connection
+            shared: Ignored; there are no shards
+            streaming: Read the result in batches through a server-side cursor
+        """
+        if streaming:
+            # Streamed responses are sent after the request's connection went
+            # back to the pool, so their rows are read on a connection of
+            # their own
+            connection = self.pool.checkout()
+            return PostgresStreamCursor(connection.cursor(name='stream'), lambda: self.pool.checkin(connection))
+        return PostgresCursor(self.get().cursor())
+
+    def commit(self, shared=False):
+        self.get().commit()
+
+    def rollback(self, shared=False):
+        self.get().rollback()
+
+    def close(self):
+        connection = g.pop('pg_db', None)
+        if connection is not None:
+            self.pool.checkin(connection)
+
+    def dispose(self):
+        self.pool.close_all()
+
+    def pool_stats(self):
+        return {'postgres': self.pool.stats()}
+
+    def setup_tables(self):
+        """Create the schema of sql/postgres/schema.sql where it is missing"""
+        with open(POSTGRES_SCHEMA, encoding='utf-8') as file:
+            schema = file.read()
+        connection = self.connect()
+        try:
+            connection.execute(schema)
+            connection.commit()
+        finally:
+            connection.close()
+
+
+# Tables copied to PostgreSQL, parents before the tables referencing them.
+# SQLite's word_groups has no id column; its rowid is copied as the id.
+COPY_TABLES = (
+    'users', 'words', 'groups', 'word_groups', 'study_activities', 'study_sessions',
+    'word_review_items', 'word_reviews', 'word_stats', 'learning_stats', 'data_versions'
+)
+
+
+def copy_sqlite_to_postgres(source, backend, batch_size=5000, log=None):
+    """
+    Copy the data of a SQLite database into a PostgreSQL backend
+
+    The schema is created where missing. Rows whose key already exists are
+    skipped, so an interrupted copy can be run again. Identity sequences
+    continue after the copied IDs.
+
+    Args:
+        source: sqlite3 connection to an unsharded, migrated database
+        backend: PostgresBackend to copy into
+        batch_size: Rows inserted per statement batch
+        log: Optional callable receiving (table, rows copied)
+
+    Returns:
+        dict: Rows read per table
+    """
+    backend.setup_tables()
+    connection = backend.connect()
+    copied = {}
+    try:
+        cursor = PostgresCursor(connection.cursor())
+        for table in COPY_TABLES:
+            cursor.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = ? AND is_generated = 'NEVER' "
+                "ORDER BY ordinal_position",
+                (table,)
+            )
+            columns = [row[0] for row in cursor.fetchall()]
+            source_columns = {row[1] for row in source.execute(f'PRAGMA table_info({table})')}
+            select = ', '.join('rowid AS id' if column == 'id' and 'id' not in source_columns else column
+                               for column in columns)
+            insert = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                      f"VALUES ({', '.join('?' * len(columns))}) ON CONFLICT DO NOTHING")
+
+            rows = source.execute(f'SELECT {select} FROM {table}')
+            copied[table] = 0
+            while True:
+                batch = rows.fetchmany(batch_size)
+                if not batch:
+                    break
+                cursor.executemany(insert, [tuple(row) for row in batch])
+                copied[table] += len(batch)
+            if 'id' in columns:
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), MAX(id)) FROM {table}")
+            connection.commit()
+            if log:
+                log(table, copied[table])
+    finally:
+        connection.close()
+    return copied
+
+
+def create_backend(app):
+    """
+    Build the storage backend selected by the app's STORAGE_BACKEND
+
+    Args:
+        app: Flask app with ``app.db``
+
+    Returns:
+        SQLiteBackend or PostgresBackend
+    """
+    name = app.config['STORAGE_BACKEND']
+    if name == SQLITE:
+        return SQLiteBackend(app.db)
+    if name == POSTGRES:
+        return PostgresBackend(
+            app.config['POSTGRES_DSN'],
+            pool_size=app.config['DB_POOL_SIZE'],
+            pool_timeout=app.config['DB_POOL_TIMEOUT'],
+            pool_max_idle=app.config['DB_POOL_MAX_IDLE']
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND {name!r}, expected '{SQLITE}' or '{POSTGRES}'")
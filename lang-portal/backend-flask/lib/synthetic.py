@@ -0,0 +1,366 @@
+"""
+Synthetic study history for the German Learning Portal database
+
+Simulates learners studying the groups already in the database for years
+and bulk-loads the resulting users, study sessions and review items, so indexes,
+caches and dashboards can be tried against production-sized data. The
+output depends only on the seed, the options and the vocabulary present.
+
+Each learner is added as a user and has an aptitude, a preferred time of day, a study rate and a
+time until they drop out. They work through their groups in order, moving
+on once most words of the newest group are well learned. Every word a
+learner has seen has a memory strength in days, the time after which they
+still recall it with 90% probability on a power-law forgetting curve. A
+correct answer multiplies the strength, more so after a longer gap, and a
+wrong one cuts it back. Sessions review the words a learner is closest to
+forgetting, new words included, so accuracy climbs over a learner's
+history the way it does for real users.
+
+With ``drop_indexes`` the secondary indexes of the loaded tables are
+dropped for the load and built again at the end, which is much faster than
+maintaining them row by row. The app must be stopped meanwhile, as its
+queries on these tables would scan them in full. The dropped statements
+are recorded in ``dropped_indexes`` first, and every run starts by
+rebuilding what a killed run left there.
+"""
+
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from lib.data_version import bump_versions
+from lib.scheduler import rebuild_schedule
+from lib.stats import rebuild_learning_stats
+
+DEFAULT_BATCH_SIZE = 200_000
+
+# Tables loaded by generate_history, whose secondary indexes are rebuilt
+LOADED_TABLES = ('study_sessions', 'word_review_items')
+
+SECONDS_PER_DAY = 86400
+
+# Words per group created when more groups are requested than exist
+SYNTHETIC_GROUP_SIZE = 40
+
+# Memory model. Strengths are in days.
+FIRST_CORRECT_RATE = 0.25      # Chance of knowing a new word, before aptitude
+FIRST_STRENGTH = 1.0           # Strength after first seeing a word, before aptitude
+LAPSE_STRENGTH = 1.0           # Lower bound of the strength after a mistake
+LAPSE_FACTOR = 0.3             # Strength kept after a mistake
+MIN_CORRECT_RATE = 0.05
+MAX_CORRECT_RATE = 0.92        # Even well known words are sometimes missed
+MAX_STRENGTH = 3650.0
+LEARNED_STRENGTH = 7.0         # A word counts as learned from this strength on
+NEXT_GROUP_SHARE = 0.6         # Share of learned words before starting a new group
+NEWEST_GROUP_SHARE = 0.7       # Share of sessions spent on the newest group
+DUE_RETENTION = 0.9            # Words are due once retention drops below this
+NEW_WORD_SHARE = 0.5           # Largest share of new words in a session
+MIN_SESSION_REVIEWS = 3
+CLOSED_SESSION_RATE = 0.9
+
+GenerationResult = namedtuple('GenerationResult', [
+    'learners', 'groups', 'sessions', 'reviews', 'seconds'
+])
+
+# A simulated session; reviews are (word_id, correct, unix time) tuples
+SimulatedSession = namedtuple('SimulatedSession', [
+    'group_id', 'study_activity_id', 'started_at', 'ended_at', 'reviews'
+])
+
+
+class Learner:
+    """Randomly drawn traits of one simulated learner"""
+
+    def __init__(self, rng, start, end):
+        self.aptitude = min(max(rng.lognormvariate(0, 0.3), 0.4), 2.5)
+        self.study_rate = rng.betavariate(2, 3)  # Chance of studying on a given day
+        self.hour = rng.uniform(6, 22)
+        # Learners join throughout the period and drop out after a while
+        self.joined = start + rng.random() * 0.9 * (end - start)
+        self.left = min(end, self.joined + rng.expovariate(2 / (end - start)) + SECONDS_PER_DAY)
+
+
+def simulate_learner(rng, learner, groups, activity_ids, reviews_per_session):
+    """
+    Simulate the study history of one learner
+
+    Args:
+        rng: random.Random
+        learner: Learner
+        groups: List of (group_id, [word_id, ...]) in the learner's order
+        activity_ids: Study activities to pick from
+        reviews_per_session: Typical number of reviews in a session with enough due words
+
+    Yields:
+        SimulatedSession, in time order
+    """
+    memory = {}  # word_id -> [strength in days, unix time of the last review]
+    active = 1
+    last_review = 0
+    day = learner.joined - learner.joined % SECONDS_PER_DAY
+    while day < learner.left:
+        starts = []
+        if rng.random() < learner.study_rate:
+            starts = sorted(
+                day + min(max(learner.hour + rng.gauss(0, 1.5), 0), 23.5) * 3600
+                for _ in range(2 if rng.random() < 0.2 else 1)
+            )
+        for started_at in starts:
+            # A second session starts after the first one's reviews
+            started_at = max(started_at, last_review + 60)
+            if started_at < learner.joined or started_at >= learner.left:
+                continue
+            if active > 1 and rng.random() >= NEWEST_GROUP_SHARE:
+                group_id, words = groups[rng.randrange(active - 1)]
+            else:
+                group_id, words = groups[active - 1]
+
+            size = max(MIN_SESSION_REVIEWS, int(rng.gauss(reviews_per_session, reviews_per_session * 0.3)))
+            reviews = _review_words(rng, learner, memory, words, size, started_at)
+            ended_at = reviews[-1][2] + rng.randint(2, 30) if rng.random() < CLOSED_SESSION_RATE else None
+            last_review = reviews[-1][2]
+            yield SimulatedSession(group_id, rng.choice(activity_ids), started_at, ended_at, reviews)
+
+            # Move on to the next group once the newest one is mostly learned
+            newest = groups[active - 1][1]
+            if active < len(groups):
+                learned = sum(1 for word_id in newest if memory.get(word_id, (0,))[0] >= LEARNED_STRENGTH)
+                if learned >= NEXT_GROUP_SHARE * len(newest):
+                    active += 1
+        day += SECONDS_PER_DAY
+
+
+def _review_words(rng, learner, memory, words, size, now):
+    # Review the words that are due, the ones that have only just become
+    # due first, add some new words and fill up with the least well known
+    # of the others. This runs for every session, so it stays lean.
+    due = []
+    fresh = []
+    unseen = []
+    for word_id in words:
+        state = memory.get(word_id)
+        if state is None:
+            unseen.append(word_id)
+        else:
+            # Power-law forgetting curve, 90% recall after ``strength`` days
+            recall = 1 / (1 + (now - state[1]) / (9 * SECONDS_PER_DAY * state[0]))
+            (due if recall < DUE_RETENTION else fresh).append((recall, word_id, state))
+    due.sort(reverse=True)
+    chosen = due[:size]
+    if unseen:
+        count = min(len(unseen), max(1, int(size * NEW_WORD_SHARE)), size - len(chosen))
+        chosen += [(None, word_id, None) for word_id in rng.sample(unseen, count)]
+    if len(chosen) < size and fresh:
+        fresh.sort()
+        chosen += fresh[:size - len(chosen)]
+    rng.shuffle(chosen)
+
+    random = rng.random
+    aptitude = learner.aptitude
+    reviews = []
+    for recall, word_id, state in chosen:
+        now += 3 + 12 * random()
+        if state is None:
+            correct = random() < FIRST_CORRECT_RATE * aptitude
+            memory[word_id] = [FIRST_STRENGTH * aptitude, now]
+        else:
+            correct = random() < min(max(recall, MIN_CORRECT_RATE), MAX_CORRECT_RATE)
+            if correct:
+                # Spacing effect: recalling a nearly forgotten word helps most
+                state[0] = min(state[0] * (1.5 + aptitude * (4 - 3 * recall)), MAX_STRENGTH)
+            else:
+                state[0] = max(state[0] * LAPSE_FACTOR, LAPSE_STRENGTH)
+            state[1] = now
+        reviews.append((word_id, 1 if correct else 0, int(now)))
+    return reviews
+
+
+def generate_history(connection, learners=100, groups=None, days=730, reviews_per_session=20,
+                     seed=42, end=None, batch_size=DEFAULT_BATCH_SIZE, drop_indexes=False, progress=None):
+    """
+    Simulate learners and bulk-load their study history
+
+    Every learner becomes a new user named "Learner <id>", and their
+    sessions are appended to any existing history. Afterwards the review
+    counters, learning statistics and review schedules are brought up to
+    date, as `invoke rebuild-stats` would.
+
+    Args:
+        connection: Writable database connection; every batch is committed
+        learners: Number of simulated learners
+        groups: Number of groups to study; missing groups are created from
+            random words. Defaults to every group that has words.
+        days: Length of the simulated period
+        reviews_per_session: Typical number of reviews in a session with enough due words
+        seed: Random seed
+        end: Last moment of the period (datetime); defaults to today 00:00 UTC
+        batch_size: Review items per transaction
+        drop_indexes: Drop the loaded tables' secondary indexes for the
+            load; only while the app is stopped
+        progress: Optional callback receiving the running session and
+            review counts
+
+    Returns:
+        GenerationResult
+
+    Raises:
+        ValueError: If the database has no words or no study activities
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    cursor = connection.cursor()
+    restore_indexes(connection)
+
+    group_words = _study_groups(cursor, rng, groups)
+    activity_ids = [row[0] for row in cursor.execute('SELECT id FROM study_activities ORDER BY id')]
+    if not group_words:
+        raise ValueError("No words to study: run `invoke init-db` first")
+    if not activity_ids:
+        raise ValueError("No study activities: run `invoke init-db` first")
+    connection.commit()
+
+    if end is None:
+        end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    end_time = int(end.timestamp())
+    start_time = end_time - days * SECONDS_PER_DAY
+
+    user_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM users').fetchone()[0]
+    session_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM study_sessions').fetchone()[0]
+    first_session_id = session_id + 1
+    total_sessions = total_reviews = 0
+    sessions = []
+    reviews = []
+
+    def flush():
+        _insert_batch(cursor, sessions, reviews)
+        connection.commit()
+        sessions.clear()
+        reviews.clear()
+        if progress:
+            progress(total_sessions, total_reviews)
+
+    if drop_indexes:
+        _drop_indexes(cursor, LOADED_TABLES)
+        connection.commit()
+    try:
+        for _ in range(learners):
+            learner = Learner(rng, start_time, end_time)
+            user_id += 1
+            cursor.execute('INSERT INTO users (id, name) VALUES (?, ?)', (user_id, f'Learner {user_id}'))
+            order = rng.sample(group_words, len(group_words))
+            for session in simulate_learner(rng, learner, order, activity_ids, reviews_per_session):
+                session_id += 1
+                correct = sum(review[1] for review in session.reviews)
+                sessions.append((
+                    session_id, user_id, session.group_id, session.study_activity_id, int(session.started_at),
+                    session.ended_at, session.reviews[-1][2], len(session.reviews), correct
+                ))
+                reviews.extend(
+                    (user_id, word_id, session_id, correct, at) for word_id, correct, at in session.reviews
+                )
+                total_sessions += 1
+                total_reviews += len(session.reviews)
+                if len(reviews) >= batch_size:
+                    flush()
+        flush()
+    finally:
+        if drop_indexes:
+            restore_indexes(connection)
+
+    _refresh_derived(cursor, first_session_id)
+    connection.commit()
+    return GenerationResult(learners, len(group_words), total_sessions, total_reviews,
+                            time.perf_counter() - started)
+
+
+def _study_groups(cursor, rng, count):
+    # (group_id, [word_id, ...]) for the groups to study, creating more if needed
+    links = {}
+    for group_id, word_id in cursor.execute('SELECT group_id, word_id FROM word_groups ORDER BY group_id, word_id'):
+        links.setdefault(group_id, []).append(word_id)
+    group_words = sorted(links.items())
+    if count is None or count <= len(group_words):
+        return group_words[:count]
+
+    word_ids = [row[0] for row in cursor.execute('SELECT id FROM words ORDER BY id')]
+    if not word_ids:
+        return []
+    for number in range(len(group_words) + 1, count + 1):
+        words = sorted(rng.sample(word_ids, min(SYNTHETIC_GROUP_SIZE, len(word_ids))))
+        cursor.execute('INSERT INTO groups (name, words_count) VALUES (?, ?)',
+                       (f'Practice Set {number}', len(words)))
+        group_id = cursor.lastrowid
+        cursor.executemany('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)',
+                           [(word_id, group_id) for word_id in words])
+        group_words.append((group_id, words))
+    bump_versions(cursor, 'groups', 'word_groups')
+    return group_words
+
+
+def restore_indexes(connection):
+    """
+    Rebuild the indexes recorded in dropped_indexes and forget them
+
+    Args:
+        connection: Writable database connection; changes are committed
+
+    Returns:
+        list: Names of the recorded indexes
+    """
+    cursor = connection.cursor()
+    rows = cursor.execute('SELECT name, sql FROM dropped_indexes ORDER BY name').fetchall()
+    for name, sql in rows:
+        if not cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone():
+            cursor.execute(sql)
+    cursor.execute('DELETE FROM dropped_indexes')
+    connection.commit()
+    return [row[0] for row in rows]
+
+
+def _drop_indexes(cursor, tables):
+    # Recorded in the same transaction, so restore_indexes finds them even
+    # if the process is killed before it rebuilds them
+    placeholders = ','.join('?' * len(tables))
+    rows = cursor.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+        ORDER BY name
+    ''', tables).fetchall()
+    cursor.executemany('INSERT OR REPLACE INTO dropped_indexes (name, sql) VALUES (?, ?)',
+                       [tuple(row) for row in rows])
+    for name, _ in rows:
+        cursor.execute(f'DROP INDEX "{name}"')
+
+
+def _insert_batch(cursor, sessions, reviews):
+    # Times are unix seconds; SQLite formats them as it does datetime('now')
+    cursor.executemany('''
+        INSERT INTO study_sessions (id, user_id, group_id, study_activity_id, created_at, ended_at,
+                                    last_review_at, review_count, correct_count)
+        VALUES (?, ?, ?, ?, datetime(?, 'unixepoch'), datetime(?, 'unixepoch'),
+                datetime(?, 'unixepoch'), ?, ?)
+    ''', sessions)
+    cursor.executemany('''
+        INSERT INTO word_review_items (user_id, word_id, study_session_id, correct, created_at)
+        VALUES (?, ?, ?, ?, datetime(?, 'unixepoch'))
+    ''', reviews)
+
+
+def _refresh_derived(cursor, first_session_id):
+    # Add the new reviews to the per-user word counters, then recompute the
+    # statistics and schedules from the whole history
+    cursor.execute('''
+        INSERT INTO word_reviews (user_id, word_id, correct_count, wrong_count, last_reviewed)
+        SELECT user_id, word_id, SUM(correct), SUM(1 - correct), MAX(created_at)
+        FROM word_review_items
+        WHERE study_session_id >= ?
+        GROUP BY user_id, word_id
+        ON CONFLICT (user_id, word_id) DO UPDATE SET
+            correct_count = correct_count + excluded.correct_count,
+            wrong_count = wrong_count + excluded.wrong_count,
+            last_reviewed = MAX(COALESCE(last_reviewed, ''), excluded.last_reviewed)
+    ''', (first_session_id,))
+    rebuild_learning_stats(cursor)
+    rebuild_schedule(cursor)
+    bump_versions(cursor, 'study_sessions', 'word_review_items', 'word_reviews')
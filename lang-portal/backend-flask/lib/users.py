@@ -0,0 +1,37 @@
+"""
+Request user selection for the German Learning Portal API
+
+Study history, review counters, schedules and dashboard statistics belong
+to a user. Requests name their user in the X-User-Id header; requests
+without it act as the default user that owns the history recorded before
+users existed.
+"""
+
+from flask import g, has_request_context
+
+from lib.validation import validate_positive_integer
+
+USER_HEADER = 'X-User-Id'
+DEFAULT_USER_ID = 1
+
+
+def parse_user_id(value):
+    """
+    Validate an X-User-Id header value
+
+    Args:
+        value: Header value, or None when the header is absent
+
+    Returns:
+        tuple: (user_id, error_message); a missing header is the default user
+    """
+    if value is None or value.strip() == '':
+        return DEFAULT_USER_ID, None
+    return validate_positive_integer(value.strip(), USER_HEADER)
+
+
+def current_user_id():
+    """ID of the user the current request acts as"""
+    if has_request_context():
+        return g.get('user_id', DEFAULT_USER_ID)
+    return DEFAULT_USER_ID
@@ -0,0 +1,250 @@
+"""
+In-memory vocabulary snapshot for the German Learning Portal API
+
+The word list changes rarely but is paged and sorted on every visit to the
+words and group words pages. VocabularyStore keeps one immutable snapshot
+of the words and the group memberships per worker process, and one copy
+with the review counters of each recently active user. Every sortable
+column has a pre-sorted permutation, so a page is an array slice instead of
+a query. The snapshots are rebuilt when the data versions of their tables
+change; review submissions only reload the requesting user's counters.
+"""
+
+import threading
+from array import array
+from collections import OrderedDict
+from operator import attrgetter
+
+from lib.data_version import get_versions
+from lib.users import DEFAULT_USER_ID
+
+# Tables whose changes rebuild the word records and group memberships
+WORD_TABLES = ('words', 'groups', 'word_groups')
+# Table whose changes only reload the review counters
+COUNTER_TABLE = 'word_reviews'
+
+TEXT_COLUMNS = ('german', 'pronunciation', 'english', 'gender', 'plural')
+COUNTER_COLUMNS = ('correct_count', 'wrong_count')
+SORT_COLUMNS = TEXT_COLUMNS + COUNTER_COLUMNS
+
+
+class VocabularyWord:
+    """Word record with the fields of the words listings"""
+
+    __slots__ = ('id',) + SORT_COLUMNS
+
+    def __init__(self, id, german, pronunciation, english, gender, plural,
+                 correct_count=0, wrong_count=0):
+        self.id = id
+        self.german = german
+        self.pronunciation = pronunciation
+        self.english = english
+        self.gender = gender
+        self.plural = plural
+        self.correct_count = correct_count
+        self.wrong_count = wrong_count
+
+    def __getitem__(self, key):
+        # Lets the route formatters read records like sqlite3.Row objects
+        return getattr(self, key)
+
+
+def _sort_key(column):
+    # NULLs sort before every string, like in SQLite; ties go by ID
+    if column in COUNTER_COLUMNS:
+        return attrgetter(column, 'id')
+    get_value = attrgetter(column)
+    return lambda word: (get_value(word) is not None, get_value(word) or '', word.id)
+
+
+class VocabularySnapshot:
+    """
+    Immutable view of the vocabulary at one set of data versions
+
+    ``orders`` holds, per sort column, the positions of ``words`` in
+    ascending (value, id) order. Descending pages read the same permutation
+    from the end. Group pages filter that order down to the group's members
+    once per group and column, on first use.
+    """
+
+    def __init__(self, versions, words, groups, orders=None):
+        self.versions = versions
+        self.words = words
+        self.groups = groups  # group_id -> array of positions in words
+        self.orders = orders if orders is not None else {
+            column: self._sort(column) for column in SORT_COLUMNS
+        }
+        self._ranks = {}
+        self._group_orders = {}
+        self._lock = threading.Lock()
+
+    def with_counters(self, versions, counters):
+        """
+        Copy of the snapshot with new review counters
+
+        Args:
+            versions: Data versions the counters were read at
+            counters: dict word_id -> (correct_count, wrong_count)
+
+        Returns:
+            VocabularySnapshot: Snapshot sharing the unchanged text orders
+        """
+        words = [
+            VocabularyWord(
+                word.id, word.german, word.pronunciation, word.english,
+                word.gender, word.plural, *counters.get(word.id, (0, 0))
+            )
+            for word in self.words
+        ]
+        snapshot = VocabularySnapshot(versions, words, self.groups, orders={
+            column: order for column, order in self.orders.items() if column in TEXT_COLUMNS
+        })
+        for column in COUNTER_COLUMNS:
+            snapshot.orders[column] = snapshot._sort(column)
+        return snapshot
+
+    def count(self, group_id=None):
+        if group_id is None:
+            return len(self.words)
+        return len(self.groups.get(group_id, ()))
+
+    def page(self, sort_by, order, offset, limit, group_id=None):
+        """
+        Slice one page of words out of a pre-sorted permutation
+
+        Args:
+            sort_by: Column in SORT_COLUMNS
+            order: 'asc' or 'desc'
+            offset: Number of words to skip
+            limit: Maximum number of words to return
+            group_id: Restrict to the members of this group
+
+        Returns:
+            list: VocabularyWord records
+        """
+        positions = self.orders[sort_by] if group_id is None else self._group_order(group_id, sort_by)
+        if order == 'desc':
+            end = len(positions) - offset
+            selected = positions[max(end - limit, 0):max(end, 0)][::-1]
+        else:
+            selected = positions[offset:offset + limit]
+        return [self.words[position] for position in selected]
+
+    def _sort(self, column):
+        key = _sort_key(column)
+        return array('l', sorted(range(len(self.words)), key=lambda position: key(self.words[position])))
+
+    def _group_order(self, group_id, column):
+        cache_key = (group_id, column)
+        group_order = self._group_orders.get(cache_key)
+        if group_order is None:
+            with self._lock:
+                ranks = self._ranks.get(column)
+                if ranks is None:
+                    ranks = array('l', [0]) * len(self.words)
+                    for rank, position in enumerate(self.orders[column]):
+                        ranks[position] = rank
+                    self._ranks[column] = ranks
+                members = self.groups.get(group_id, array('l'))
+                group_order = array('l', sorted(members, key=ranks.__getitem__))
+                self._group_orders[cache_key] = group_order
+        return group_order
+
+
+class VocabularyStore:
+    """
+    Per-process holder of the current VocabularySnapshot of each user
+
+    ``snapshot`` compares the stored data versions with the database on
+    every call, one query against data_versions, and reloads what changed.
+    Concurrent requests that notice the same change wait for a single
+    rebuild. Data edited without bumping its data version is not picked up.
+    The counter snapshots of the ``max_users`` most recently active users
+    are kept; a user's counters are read through the (user_id, word_id)
+    key of word_reviews, so a reload only touches that user's rows.
+    """
+
+    def __init__(self, max_users=32):
+        self.max_users = max_users
+        self._base = None  # Words and groups without counters
+        self._users = OrderedDict()  # user_id -> VocabularySnapshot
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.counter_reloads = 0
+
+    def snapshot(self, cursor, user_id=DEFAULT_USER_ID):
+        """
+        Return a user's snapshot matching the current data versions
+
+        Args:
+            cursor: Database cursor (read-only is enough)
+            user_id: User whose review counters the snapshot carries
+
+        Returns:
+            VocabularySnapshot
+        """
+        versions = get_versions(cursor, WORD_TABLES + (COUNTER_TABLE,))
+        snapshot = self._users.get(user_id)
+        if snapshot is not None and snapshot.versions == versions:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._users.get(user_id)
+            if snapshot is not None and snapshot.versions == versions:
+                self._users.move_to_end(user_id)
+                return snapshot
+
+            base = self._base
+            if base is None or any(base.versions[table] != versions[table] for table in WORD_TABLES):
+                base = self._base = self._load(cursor, versions)
+                self._users.clear()
+                self.loads += 1
+            else:
+                self.counter_reloads += 1
+            snapshot = base.with_counters(versions, self._load_counters(cursor, user_id))
+
+            self._users[user_id] = snapshot
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._base = None
+            self._users.clear()
+
+    def _load(self, cursor, versions):
+        cursor.execute('''
+            SELECT id, german, pronunciation, english, gender, plural
+            FROM words
+            ORDER BY id
+        ''')
+        words = [VocabularyWord(*row) for row in cursor.fetchall()]
+        positions = {word.id: position for position, word in enumerate(words)}
+
+        groups = {}
+        cursor.execute('SELECT id FROM groups')
+        for row in cursor.fetchall():
+            groups[row[0]] = array('l')
+        cursor.execute('SELECT group_id, word_id FROM word_groups ORDER BY group_id, word_id')
+        for group_id, word_id in cursor.fetchall():
+            if group_id in groups and word_id in positions:
+                groups[group_id].append(positions[word_id])
+
+        # Counter orders are only sorted on the per-user copies
+        base = VocabularySnapshot(versions, words, groups, orders={})
+        for column in TEXT_COLUMNS:
+            base.orders[column] = base._sort(column)
+        return base
+
+    @staticmethod
+    def _load_counters(cursor, user_id):
+        cursor.execute(
+            'SELECT word_id, correct_count, wrong_count FROM word_reviews WHERE user_id = ?',
+            (user_id,)
+        )
+        return {
+            word_id: (correct_count or 0, wrong_count or 0)
+            for word_id, correct_count, wrong_count in cursor.fetchall()
+        }
@@ -1,31 +1,39 @@
-import sqlite3
-import os
+"""
+Apply pending schema migrations to the app database (words.db)
+
+Equivalent to `invoke migrate`; pass --dry-run to only list what would run.
+"""
+import argparse
+import sys
+
+from flask import Flask
+
+from lib.db import db
+from lib.migrations import MigrationError
+
+
+def run_migrations(dry_run=False):
+    app = Flask(__name__)
+    with app.app_context():
+        try:
+            if dry_run:
+                pending = db.migration_plan().pending
+                for migration in pending:
+                    print(f"Pending migration: {migration.filename}")
+                print(f"{len(pending)} migrations pending")
+                return
+            applied = db.migrate(db.cursor(), log=print)
+            print(f"Migrations completed successfully ({len(applied)} applied)")
+        finally:
+            db.close()
 
-def run_migrations():
-    # Connect to the database
-    db_path = os.path.join(os.path.dirname(__file__), 'word_bank.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    
-    try:
-        # Get list of migration files
-        migrations_dir = os.path.join(os.path.dirname(__file__), 'sql', 'migrations')
-        migration_files = sorted([f for f in os.listdir(migrations_dir) if f.endswith('.sql')])
-        
-        # Run each migration
-        for migration_file in migration_files:
-            print(f"Running migration: {migration_file}")
-            with open(os.path.join(migrations_dir, migration_file)) as f:
-                migration_sql = f.read()
-                conn.executescript(migration_sql)
-                conn.commit()
-        
-        print("Migrations completed successfully")
-    except Exception as e:
-        print(f"Error running migrations: {str(e)}")
-        conn.rollback()
-    finally:
-        conn.close()
 
 if __name__ == '__main__':
-    run_migrations()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dry-run', action='store_true', help='list pending migrations only')
+    args = parser.parse_args()
+    try:
+        run_migrations(dry_run=args.dry_run)
+    except MigrationError as error:
+        print(f"Error running migrations: {error}", file=sys.stderr)
+        sys.exit(1)
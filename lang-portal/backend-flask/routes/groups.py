@@ -2,18 +2,56 @@ from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
 from lib.validation import validate_pagination_params, validate_sort_params, validate_positive_integer
+from lib.pagination import encode_cursor, decode_cursor
+from lib.data_version import conditional_get
+from lib.payload_cache import payload_response
+from lib.json_stream import iter_json_document, json_stream_response, row_encoder
+from lib.repositories import GROUP_WORD_SORT_EXPRESSIONS
+from lib.users import current_user_id
+from lib.sessions import format_session_lifecycle
 from lib.error_handler import (
     create_error_response, handle_database_error, handle_validation_error,
     handle_not_found_error, handle_generic_error
 )
 
+# Tables the /words/raw payload is built from
+RAW_WORDS_TABLES = ('groups', 'words', 'word_groups', 'word_reviews')
+
+def format_group_word(word):
+  return {
+    "id": word["id"],
+    "german": word["german"],
+    "pronunciation": word["pronunciation"],
+    "gender": word["gender"],
+    "plural": word["plural"],
+    "english": word["english"],
+    "correct_count": word["correct_count"],
+    "wrong_count": word["wrong_count"]
+  }
+
+def iter_group_words_raw(groups, group_id, group_name, total_words, user_id):
+  """
+  Serialize a group's words for /words/raw as a sequence of byte chunks
+
+  The stored parts JSON is embedded as is rather than parsed and
+  re-encoded; invalid parts become null. Review counters are the user's.
+  """
+  cursor = groups.words_raw(group_id, user_id)
+  return iter_json_document(
+    {"group_id": group_id, "group_name": group_name, "total_words": total_words},
+    'words', cursor, row_encoder(raw_columns=('parts',))
+  )
+
 def load(app):
+  groups = app.repositories.groups
+  sessions = app.repositories.sessions
+
   @app.route('/api/groups', methods=['GET'])
   @cross_origin()
+  @conditional_get(app, 'groups')
+  @app.cache.cached('groups', ttl=300)
   def get_groups():
     try:
-      cursor = app.db.cursor()
-
       # Validate pagination parameters
       page, _, page_error = validate_pagination_params(request.args.get('page'))
       groups_per_page = 10
@@ -25,24 +63,15 @@ def load(app):
       valid_columns = ['name', 'words_count']
       sort_by, order, sort_error = validate_sort_params(sort_by, order, valid_columns)
 
-      # Query to fetch groups with sorting and the cached word count
-      cursor.execute(f'''
-        SELECT id, name, words_count
-        FROM groups
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (groups_per_page, offset))
-
-      groups = cursor.fetchall()
-
-      # Query the total number of groups
-      cursor.execute('SELECT COUNT(*) FROM groups')
-      total_groups = cursor.fetchone()[0]
+      # Fetch groups with sorting and the cached word count, and the total
+      # number of groups
+      rows = groups.page(sort_by, order, groups_per_page, offset)
+      total_groups = groups.count()
       total_pages = (total_groups + groups_per_page - 1) // groups_per_page
 
       # Format the response
       groups_data = []
-      for group in groups:
+      for group in rows:
         groups_data.append({
           "id": group["id"],
           "group_name": group["name"],
@@ -66,17 +95,9 @@ def load(app):
       validated_id, id_error = validate_positive_integer(id, 'group_id')
       if id_error:
         return handle_validation_error(id_error)
-      
-      cursor = app.db.cursor()
 
       # Get group details
-      cursor.execute('''
-        SELECT id, name, words_count
-        FROM groups
-        WHERE id = ?
-      ''', (validated_id,))
-      
-      group = cursor.fetchone()
+      group = groups.get(validated_id)
       if not group:
         return handle_not_found_error("Group", validated_id)
 
@@ -90,10 +111,9 @@ def load(app):
 
   @app.route('/api/groups/<int:id>/words', methods=['GET'])
   @cross_origin()
+  @conditional_get(app, 'groups', 'words', 'word_groups', 'word_reviews')
   def get_group_words(id):
     try:
-      cursor = app.db.cursor()
-      
       # Get pagination parameters
       page = int(request.args.get('page', 1))
       words_per_page = 10
@@ -104,102 +124,128 @@ def load(app):
       order = request.args.get('order', 'asc')
 
       # Validate sort parameters
-      valid_columns = ['german', 'pronunciation', 'english', 'correct_count', 'wrong_count']
+      valid_columns = list(GROUP_WORD_SORT_EXPRESSIONS)
       if sort_by not in valid_columns:
         sort_by = 'german'
       if order not in ['asc', 'desc']:
         order = 'asc'
 
       # First, check if the group exists
-      cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
-      group = cursor.fetchone()
-      if not group:
+      if not groups.get(id):
         return handle_not_found_error("Group", id)
 
-      # Query to fetch words with pagination and sorting
-      cursor.execute(f'''
-        SELECT w.*, 
-               COALESCE(wr.correct_count, 0) as correct_count,
-               COALESCE(wr.wrong_count, 0) as wrong_count
-        FROM words w
-        JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN word_reviews wr ON w.id = wr.word_id
-        WHERE wg.group_id = ?
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (id, words_per_page, offset))
-      
-      words = cursor.fetchall()
-
-      # Get total words count for pagination
-      cursor.execute('''
-        SELECT COUNT(*) 
-        FROM word_groups 
-        WHERE group_id = ?
-      ''', (id,))
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      # Cursor mode (?cursor=, empty for the first page) seeks past the last
+      # row of the previous page instead of skipping OFFSET rows
+      cursor_token = request.args.get('cursor')
+      if cursor_token is not None:
+        after = None
+        if cursor_token:
+          last_value, last_id, cursor_error = decode_cursor(cursor_token, sort_by, order)
+          if cursor_error:
+            return handle_validation_error(cursor_error)
+          after = (last_value, last_id)
 
-      # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "german": word["german"],
-          "pronunciation": word["pronunciation"],
-          "gender": word["gender"],
-          "plural": word["plural"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
+        # One extra row tells us whether there is a next page
+        words = groups.words_after(id, current_user_id(), sort_by, order, words_per_page + 1, after)
+
+        next_cursor = None
+        if len(words) > words_per_page:
+          words = words[:words_per_page]
+          next_cursor = encode_cursor(sort_by, order, words[-1]["sort_value"], words[-1]["id"])
+
+        return jsonify({
+          'words': [format_group_word(word) for word in words],
+          'next_cursor': next_cursor
         })
 
+      # With the vocabulary store enabled the page is a slice of the group's
+      # pre-sorted in-memory permutation
+      if app.vocabulary is not None:
+        snapshot = app.repositories.words.snapshot(app.vocabulary, current_user_id())
+        total_words = snapshot.count(id)
+        total_pages = (total_words + words_per_page - 1) // words_per_page
+        return jsonify({
+          'words': [format_group_word(word) for word in snapshot.page(sort_by, order, offset, words_per_page, id)],
+          'total_pages': total_pages,
+          'current_page': page
+        })
+
+      # Fetch words with pagination and sorting, and the total words count
+      # for pagination
+      words = groups.words_page(id, current_user_id(), sort_by, order, words_per_page, offset)
+      total_words = groups.word_count(id)
+      total_pages = (total_words + words_per_page - 1) // words_per_page
+
       return jsonify({
-        'words': words_data,
+        'words': [format_group_word(word) for word in words],
         'total_pages': total_pages,
         'current_page': page
       })
     except Exception as e:
       return handle_generic_error(e, "fetching group words")
 
+  # Endpoint: GET /groups/:id/words/raw to get every word of a group at once.
+  # The serialized body is cached per user, group and data version, with gzip and
+  # brotli copies; groups above RAW_PAYLOAD_CACHE_MAX_WORDS, or every group
+  # when caching is disabled, are streamed.
   @app.route('/api/groups/<int:id>/words/raw', methods=['GET'])
   @cross_origin()
+  @conditional_get(app, *RAW_WORDS_TABLES)
   def get_group_words_raw(id):
     try:
-      cursor = app.db.cursor()
+      versions = g.get('data_versions') or app.repositories.versions.get(RAW_WORDS_TABLES)
+      user_id = current_user_id()
+      cache_key = ('group_words_raw', user_id, id)
+
+      payload = app.payload_cache.get(cache_key, versions)
+      if payload is not None:
+        return payload_response(payload, request.accept_encodings)
       
       # First, check if the group exists
-      cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
-      group = cursor.fetchone()
+      group = groups.get(id)
       if not group:
         return handle_not_found_error("Group", id)
 
-      # Query to fetch all words in the group without pagination
-      cursor.execute('''
-        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural, w.parts,
-               COALESCE(wr.correct_count, 0) as correct_count,
-               COALESCE(wr.wrong_count, 0) as wrong_count
-        FROM words w
-        JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN word_reviews wr ON w.id = wr.word_id
-        WHERE wg.group_id = ?
-        ORDER BY w.german ASC
-      ''', (id,))
+      total_words = groups.word_count(id)
+
+      chunks = iter_group_words_raw(groups, id, group["name"], total_words, user_id)
+      if not app.payload_cache.enabled or total_words > app.config['RAW_PAYLOAD_CACHE_MAX_WORDS']:
+        return json_stream_response(chunks)
+
+      payload = app.payload_cache.put(cache_key, versions, b''.join(chunks))
+      return payload_response(payload, request.accept_encodings)
       
-      words = cursor.fetchall()
+    except Exception as e:
+      return handle_generic_error(e, "fetching group words raw data")
+
+  # Endpoint: GET /groups/:id/due?limit=N to get the next words to review.
+  # Words whose spaced repetition due date has passed come first, oldest
+  # due date first, followed by words that were never reviewed. Due dates
+  # are the requesting user's, read through the (user_id, word_id) key of
+  # word_reviews for the group's members.
+  @app.route('/api/groups/<int:id>/due', methods=['GET'])
+  @cross_origin()
+  def get_group_due_words(id):
+    try:
+      limit, limit_error = validate_positive_integer(request.args.get('limit', 20), 'limit')
+      if limit_error:
+        return handle_validation_error(limit_error)
+      if limit > 100:
+        return handle_validation_error("limit cannot exceed 100")
+      include_new = request.args.get('include_new', 'true').lower() not in ('false', '0')
+
+      if not groups.get(id):
+        return handle_not_found_error("Group", id)
+
+      words = groups.due_words(id, current_user_id(), limit, include_new)
 
-      # Format the response as a simple array of word objects
       words_data = []
       for word in words:
-        # Parse parts JSON if it exists
-        parts = None
-        if word["parts"]:
-          try:
-            import json
-            parts = json.loads(word["parts"])
-          except:
-            parts = None
-            
+        try:
+          parts = json.loads(word["parts"]) if word["parts"] else None
+        except ValueError:
+          parts = None
+
         words_data.append({
           "id": word["id"],
           "german": word["german"],
@@ -209,25 +255,26 @@ def load(app):
           "plural": word["plural"],
           "parts": parts,
           "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
+          "wrong_count": word["wrong_count"],
+          "is_new": word["due_at"] is None,
+          "due_at": word["due_at"],
+          "interval_days": word["interval_days"] or 0,
+          "ease": word["ease"],
+          "repetitions": word["repetitions"] or 0
         })
 
       return jsonify({
         "group_id": id,
-        "group_name": group["name"],
-        "words": words_data,
-        "total_words": len(words_data)
+        "words": words_data
       })
-      
+
     except Exception as e:
-      return handle_generic_error(e, "fetching group words raw data")
+      return handle_generic_error(e, "fetching due words")
 
   @app.route('/api/groups/<int:id>/study_sessions', methods=['GET'])
   @cross_origin()
   def get_group_study_sessions(id):
     try:
-      cursor = app.db.cursor()
-      
       # Get pagination parameters
       page = int(request.args.get('page', 1))
       sessions_per_page = 10
@@ -236,74 +283,33 @@ def load(app):
       # Get sorting parameters
       sort_by = request.args.get('sort_by', 'created_at')
       order = request.args.get('order', 'desc')  # Default to newest first
+      if order not in ['asc', 'desc']:
+        order = 'desc'
 
-      # Map frontend sort keys to database columns
-      sort_mapping = {
-        'startTime': 'created_at',
-        'endTime': 'last_activity_time',
-        'activityName': 'a.name',
-        'groupName': 'g.name',
-        'reviewItemsCount': 'review_count'
-      }
-
-      # Use mapped sort column or default to created_at
-      sort_column = sort_mapping.get(sort_by, 'created_at')
+      # Frontend sort keys (startTime, endTime, activityName, groupName,
+      # reviewItemsCount, duration, accuracy); others sort by start time
+      filters, filter_error = sessions.parse_filters(request.args, 's')
+      if filter_error:
+        return handle_validation_error(filter_error)
+      user_id = current_user_id()
 
       # Get total count for pagination
-      cursor.execute('''
-        SELECT COUNT(*)
-        FROM study_sessions
-        WHERE group_id = ?
-      ''', (id,))
-      total_sessions = cursor.fetchone()[0]
+      total_sessions = sessions.group_count(user_id, id, filters)
       total_pages = (total_sessions + sessions_per_page - 1) // sessions_per_page
 
-      # Get study sessions for this group with dynamic calculations
-      cursor.execute(f'''
-        SELECT 
-          s.id,
-          s.group_id,
-          s.study_activity_id,
-          s.created_at as start_time,
-          (
-            SELECT MAX(created_at)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as last_activity_time,
-          a.name as activity_name,
-          g.name as group_name,
-          (
-            SELECT COUNT(*)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as review_count
-        FROM study_sessions s
-        JOIN study_activities a ON s.study_activity_id = a.id
-        JOIN groups g ON s.group_id = g.id
-        WHERE s.group_id = ?
-        ORDER BY {sort_column} {order}
-        LIMIT ? OFFSET ?
-      ''', (id, sessions_per_page, offset))
-      
-      sessions = cursor.fetchall()
-      sessions_data = []
-      
-      for session in sessions:
-        # If there's no last_activity_time, use start_time + 30 minutes
-        end_time = session["last_activity_time"]
-        if not end_time:
-            end_time = cursor.execute('SELECT datetime(?, "+30 minutes")', (session["start_time"],)).fetchone()[0]
-        
-        sessions_data.append({
-          "id": session["id"],
-          "group_id": session["group_id"],
-          "group_name": session["group_name"],
-          "study_activity_id": session["study_activity_id"],
-          "activity_name": session["activity_name"],
-          "start_time": session["start_time"],
-          "end_time": end_time,
-          "review_items_count": session["review_count"]
-        })
+      # Get study sessions for this group
+      rows = sessions.group_page(user_id, id, filters, sort_by, order, sessions_per_page, offset)
+      sessions_data = [{
+        "id": session["id"],
+        "group_id": session["group_id"],
+        "group_name": session["group_name"],
+        "study_activity_id": session["study_activity_id"],
+        "activity_name": session["activity_name"],
+        "start_time": session["start_time"],
+        "end_time": session["end_time"],
+        "review_items_count": session["review_count"],
+        **format_session_lifecycle(session)
+      } for session in rows]
 
       return jsonify({
         'study_sessions': sessions_data,
@@ -0,0 +1,61 @@
+from flask import Response
+
+from lib.metrics import render_samples
+
+# Pool counters that only grow; the other pool figures are gauges
+POOL_COUNTERS = ('checkouts', 'waits', 'timeouts', 'evictions', 'failed_health_checks')
+CACHE_COUNTERS = ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+
+def collect_app_metrics(app):
+    # Connection pool and cache figures, read when the metrics are scraped
+    lines = []
+    pools = app.storage.pool_stats()
+    for key in ('size', 'idle', 'in_use', 'max_size'):
+        lines += render_samples(
+            f'db_pool_{key}', f'Connection pool {key.replace("_", " ")}.', 'gauge',
+            [({'pool': pool}, stats[key]) for pool, stats in pools.items()]
+        )
+    for key in POOL_COUNTERS:
+        lines += render_samples(
+            f'db_pool_{key}_total', f'Connection pool {key.replace("_", " ")}.', 'counter',
+            [({'pool': pool}, stats[key]) for pool, stats in pools.items()]
+        )
+
+    caches = {'response': app.cache.stats(), 'payload': app.payload_cache.stats()}
+    lines += render_samples(
+        'cache_entries', 'Entries held by the in-process caches.', 'gauge',
+        [({'cache': cache}, stats['entries']) for cache, stats in caches.items()]
+    )
+    for key in CACHE_COUNTERS:
+        lines += render_samples(
+            f'cache_{key}_total', f'In-process cache {key}.', 'counter',
+            [({'cache': cache}, stats[key]) for cache, stats in caches.items() if key in stats]
+        )
+
+    if app.db.shards is not None:
+        shards = app.db.shards.stats()
+        lines += render_samples('db_shards_open', 'User shards kept open.', 'gauge', [({}, shards['open'])])
+        lines += render_samples('db_shard_opens_total', 'User shards opened.', 'counter', [({}, shards['opens'])])
+        lines += render_samples(
+            'db_shard_evictions_total', 'User shards closed to make room for another.', 'counter',
+            [({}, shards['evictions'])]
+        )
+
+    if app.vocabulary is not None:
+        lines += render_samples(
+            'vocabulary_store_loads_total', 'Vocabulary snapshot rebuilds.', 'counter',
+            [({'kind': 'full'}, app.vocabulary.loads), ({'kind': 'counters'}, app.vocabulary.counter_reloads)]
+        )
+    return lines
+
+def load(app):
+    if app.metrics is None:
+        return
+
+    # Prometheus scrape endpoint; figures are per worker process
+    @app.route('/api/_metrics', methods=['GET'])
+    def get_metrics():
+        return Response(
+            app.metrics.render(collect_app_metrics(app)),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
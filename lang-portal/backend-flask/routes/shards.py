@@ -0,0 +1,21 @@
+from flask import jsonify
+
+from lib.error_handler import handle_database_error
+from lib.shards import shard_totals
+
+def load(app):
+    if app.db.shards is None:
+        return
+
+    # Admin overview of sharded storage: open shards of this worker process
+    # and the learning statistics summed across every user's shard
+    @app.route('/api/_shards', methods=['GET'])
+    def get_shards():
+        try:
+            return jsonify({
+                'directory': app.db.shards.directory,
+                'router': app.db.shards.stats(),
+                'totals': shard_totals(app.db.shards)
+            })
+        except Exception as e:
+            return handle_database_error(e, "aggregating shards")
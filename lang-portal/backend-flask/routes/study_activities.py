@@ -1,28 +1,31 @@
 from flask import jsonify, request
 from flask_cors import cross_origin
 import math
+from lib.data_version import conditional_get
+from lib.error_handler import handle_validation_error
+from lib.users import current_user_id
+from lib.sessions import sort_expressions, format_session_lifecycle
 
 def load(app):
+    activities = app.repositories.activities
+    sessions = app.repositories.sessions
+
     @app.route('/api/study-activities', methods=['GET'])
     @cross_origin()
+    @conditional_get(app, 'study_activities')
+    @app.cache.cached('study_activities', ttl=300)
     def get_study_activities():
-        cursor = app.db.cursor()
-        cursor.execute('SELECT id, name, url, preview_url FROM study_activities')
-        activities = cursor.fetchall()
-        
         return jsonify([{
             'id': activity['id'],
             'title': activity['name'],
             'launch_url': activity['url'],
             'preview_url': activity['preview_url']
-        } for activity in activities])
+        } for activity in activities.all()])
 
     @app.route('/api/study-activities/<int:id>', methods=['GET'])
     @cross_origin()
     def get_study_activity(id):
-        cursor = app.db.cursor()
-        cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
-        activity = cursor.fetchone()
+        activity = activities.get(id)
         
         if not activity:
             return jsonify({'error': 'Activity not found'}), 404
@@ -37,11 +40,8 @@ def load(app):
     @app.route('/api/study-activities/<int:id>/sessions', methods=['GET'])
     @cross_origin()
     def get_study_activity_sessions(id):
-        cursor = app.db.cursor()
-        
         # Verify activity exists
-        cursor.execute('SELECT id FROM study_activities WHERE id = ?', (id,))
-        if not cursor.fetchone():
+        if not activities.exists(id):
             return jsonify({'error': 'Activity not found'}), 404
 
         # Get pagination parameters
@@ -49,35 +49,23 @@ def load(app):
         per_page = request.args.get('per_page', 10, type=int)
         offset = (page - 1) * per_page
 
-        # Get total count
-        cursor.execute('''
-            SELECT COUNT(*) as count 
-            FROM study_sessions ss
-            JOIN groups g ON g.id = ss.group_id
-            WHERE ss.study_activity_id = ?
-        ''', (id,))
-        total_count = cursor.fetchone()['count']
+        # Get sorting and filter parameters; like the other listings,
+        # unknown sort parameters fall back to newest first
+        sort_by = request.args.get('sort_by', 'created_at')
+        order = request.args.get('order', 'desc')
+        if sort_by not in sort_expressions('ss'):
+            sort_by = 'created_at'
+        if order not in ['asc', 'desc']:
+            order = 'desc'
 
-        # Get paginated sessions
-        cursor.execute('''
-            SELECT 
-                ss.id,
-                ss.group_id,
-                g.name as group_name,
-                sa.name as activity_name,
-                ss.created_at,
-                ss.study_activity_id as activity_id,
-                COUNT(wri.id) as review_items_count
-            FROM study_sessions ss
-            JOIN groups g ON g.id = ss.group_id
-            JOIN study_activities sa ON sa.id = ss.study_activity_id
-            LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-            WHERE ss.study_activity_id = ?
-            GROUP BY ss.id, ss.group_id, g.name, sa.name, ss.created_at, ss.study_activity_id
-            ORDER BY ss.created_at DESC
-            LIMIT ? OFFSET ?
-        ''', (id, per_page, offset))
-        sessions = cursor.fetchall()
+        filters, filter_error = sessions.parse_filters(request.args)
+        if filter_error:
+            return handle_validation_error(filter_error)
+        user_id = current_user_id()
+
+        # Get total count and the paginated sessions
+        total_count = sessions.activity_count(user_id, id, filters)
+        rows = sessions.activity_page(user_id, id, filters, sort_by, order, per_page, offset)
 
         return jsonify({
             'items': [{
@@ -87,9 +75,10 @@ def load(app):
                 'activity_id': session['activity_id'],
                 'activity_name': session['activity_name'],
                 'start_time': session['created_at'],
-                'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-                'review_items_count': session['review_items_count']
-            } for session in sessions],
+                'end_time': session['end_time'],
+                'review_items_count': session['review_count'],
+                **format_session_lifecycle(session)
+            } for session in rows],
             'total': total_count,
             'page': page,
             'per_page': per_page,
@@ -98,19 +87,16 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/launch', methods=['GET'])
     @cross_origin()
+    @app.cache.cached('study_activities', 'groups', ttl=300)
     def get_study_activity_launch_data(id):
-        cursor = app.db.cursor()
-        
         # Get activity details
-        cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
-        activity = cursor.fetchone()
+        activity = activities.get(id)
         
         if not activity:
             return jsonify({'error': 'Activity not found'}), 404
         
         # Get available groups
-        cursor.execute('SELECT id, name FROM groups')
-        groups = cursor.fetchall()
+        groups = app.repositories.groups.all()
         
         return jsonify({
             'activity': {
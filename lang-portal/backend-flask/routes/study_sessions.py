@@ -1,23 +1,27 @@
-from flask import request, jsonify, g
+from flask import request, jsonify, g, Response, stream_with_context
 from flask_cors import cross_origin
 from datetime import datetime
 import math
+import json
 from lib.validation import (
-    validate_pagination_params, validate_sort_params, validate_positive_integer,
+    validate_pagination_params, validate_positive_integer,
     validate_required_fields, validate_word_review
 )
 from lib.error_handler import (
     create_error_response, handle_database_error, handle_validation_error,
-    handle_not_found_error, handle_generic_error
+    handle_not_found_error, handle_generic_error, logger
 )
+from lib.reviews import read_review_chunks
+from lib.users import current_user_id
+from lib.sessions import sort_expressions, format_session_lifecycle
 
 def load(app):
+  sessions = app.repositories.sessions
+
   @app.route('/api/study_sessions', methods=['POST'])
   @cross_origin()
   def create_study_session():
     try:
-      cursor = app.db.cursor()
-      
       # Get and validate request data
       data = request.get_json()
       
@@ -37,23 +41,16 @@ def load(app):
         return handle_validation_error(activity_error)
       
       # Verify group exists
-      cursor.execute('SELECT id FROM groups WHERE id = ?', (group_id,))
-      if not cursor.fetchone():
+      if not app.repositories.groups.get(group_id):
         return handle_not_found_error("Group", group_id)
       
       # Verify study activity exists
-      cursor.execute('SELECT id FROM study_activities WHERE id = ?', (study_activity_id,))
-      if not cursor.fetchone():
+      if not app.repositories.activities.exists(study_activity_id):
         return handle_not_found_error("Study activity", study_activity_id)
       
-      # Create study session
-      cursor.execute('''
-        INSERT INTO study_sessions (group_id, study_activity_id, created_at)
-        VALUES (?, ?, datetime('now'))
-      ''', (group_id, study_activity_id))
-      
-      session_id = cursor.lastrowid
-      app.db.commit()
+      # Create study session for the requesting user
+      session_id = sessions.create(current_user_id(), group_id, study_activity_id)
+      app.cache.invalidate('study_sessions')
       
       return jsonify({"session_id": session_id}), 201
       
@@ -64,41 +61,29 @@ def load(app):
   @cross_origin()
   def get_study_sessions():
     try:
-      cursor = app.db.cursor()
-      
       # Get pagination parameters
       page = request.args.get('page', 1, type=int)
       per_page = request.args.get('per_page', 10, type=int)
       offset = (page - 1) * per_page
 
-      # Get total count
-      cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-      ''')
-      total_count = cursor.fetchone()['count']
+      # Get sorting and filter parameters; duration and accuracy are
+      # computed from stored session columns and backed by indexes. Like the
+      # other listings, unknown sort parameters fall back to newest first.
+      sort_by = request.args.get('sort_by', 'created_at')
+      order = request.args.get('order', 'desc')
+      if sort_by not in sort_expressions('ss'):
+        sort_by = 'created_at'
+      if order not in ['asc', 'desc']:
+        order = 'desc'
+
+      filters, filter_error = sessions.parse_filters(request.args)
+      if filter_error:
+        return handle_validation_error(filter_error)
+      user_id = current_user_id()
 
-      # Get paginated sessions
-      cursor.execute('''
-        SELECT 
-          ss.id,
-          ss.group_id,
-          g.name as group_name,
-          sa.id as activity_id,
-          sa.name as activity_name,
-          ss.created_at,
-          COUNT(wri.id) as review_items_count
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        GROUP BY ss.id
-        ORDER BY ss.created_at DESC
-        LIMIT ? OFFSET ?
-      ''', (per_page, offset))
-      sessions = cursor.fetchall()
+      # Get total count and the paginated sessions
+      total_count = sessions.count(user_id, filters)
+      rows = sessions.page(user_id, filters, sort_by, order, per_page, offset)
 
       return jsonify({
         'items': [{
@@ -108,9 +93,10 @@ def load(app):
           'activity_id': session['activity_id'],
           'activity_name': session['activity_name'],
           'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-          'review_items_count': session['review_items_count']
-        } for session in sessions],
+          'end_time': session['end_time'],
+          'review_items_count': session['review_count'],
+          **format_session_lifecycle(session)
+        } for session in rows],
         'total': total_count,
         'page': page,
         'per_page': per_page,
@@ -123,27 +109,8 @@ def load(app):
   @cross_origin()
   def get_study_session(id):
     try:
-      cursor = app.db.cursor()
-      
       # Get session details
-      cursor.execute('''
-        SELECT 
-          ss.id,
-          ss.group_id,
-          g.name as group_name,
-          sa.id as activity_id,
-          sa.name as activity_name,
-          ss.created_at,
-          COUNT(wri.id) as review_items_count
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        WHERE ss.id = ?
-        GROUP BY ss.id
-      ''', (id,))
-      
-      session = cursor.fetchone()
+      session = sessions.get(id, current_user_id())
       if not session:
         return jsonify({"error": "Study session not found"}), 404
 
@@ -152,31 +119,9 @@ def load(app):
       per_page = request.args.get('per_page', 10, type=int)
       offset = (page - 1) * per_page
 
-      # Get the words reviewed in this session with their review status
-      cursor.execute('''
-        SELECT 
-          w.*,
-          COALESCE(SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END), 0) as session_correct_count,
-          COALESCE(SUM(CASE WHEN wri.correct = 0 THEN 1 ELSE 0 END), 0) as session_wrong_count
-        FROM words w
-        JOIN word_review_items wri ON wri.word_id = w.id
-        WHERE wri.study_session_id = ?
-        GROUP BY w.id
-        ORDER BY w.german
-        LIMIT ? OFFSET ?
-      ''', (id, per_page, offset))
-      
-      words = cursor.fetchall()
-
-      # Get total count of words
-      cursor.execute('''
-        SELECT COUNT(DISTINCT w.id) as count
-        FROM words w
-        JOIN word_review_items wri ON wri.word_id = w.id
-        WHERE wri.study_session_id = ?
-      ''', (id,))
-      
-      total_count = cursor.fetchone()['count']
+      # Get the words reviewed in this session with their review status,
+      # and the total count of words
+      words, total_count = sessions.words(session['id'], per_page, offset)
 
       return jsonify({
         'session': {
@@ -186,8 +131,9 @@ def load(app):
           'activity_id': session['activity_id'],
           'activity_name': session['activity_name'],
           'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time
-          'review_items_count': session['review_items_count']
+          'end_time': session['end_time'],
+          'review_items_count': session['review_count'],
+          **format_session_lifecycle(session)
         },
         'words': [{
           'id': word['id'],
@@ -216,8 +162,6 @@ def load(app):
       if session_error:
         return handle_validation_error(session_error)
       
-      cursor = app.db.cursor()
-      
       # Get and validate request data
       data = request.get_json()
       
@@ -230,10 +174,17 @@ def load(app):
       if not isinstance(reviews, list) or len(reviews) == 0:
         return handle_validation_error("Reviews must be a non-empty array")
       
-      # Verify study session exists
-      cursor.execute('SELECT id FROM study_sessions WHERE id = ?', (validated_session_id,))
-      if not cursor.fetchone():
+      # Verify the user's study session exists and still accepts reviews
+      user_id = current_user_id()
+      session = sessions.find(validated_session_id, user_id)
+      if not session:
         return handle_not_found_error("Study session", validated_session_id)
+      if session['ended_at']:
+        return create_error_response(
+          f"Study session with ID {validated_session_id} is closed",
+          status_code=409,
+          error_code="SESSION_CLOSED"
+        )
       
       # Validate each review
       for i, review in enumerate(reviews):
@@ -241,39 +192,19 @@ def load(app):
         if not is_valid:
           return handle_validation_error(f"Review {i+1}: {error_msg}")
       
-      # Process each review
-      for review in reviews:
-        word_id = review['word_id']  # Already validated
-        is_correct = review['is_correct']  # Already validated
-        
-        # Verify word exists
-        cursor.execute('SELECT id FROM words WHERE id = ?', (word_id,))
-        if not cursor.fetchone():
-          return handle_not_found_error("Word", word_id)
-        
-        # Insert word review item
-        cursor.execute('''
-          INSERT INTO word_review_items (word_id, study_session_id, correct, created_at)
-          VALUES (?, ?, ?, datetime('now'))
-        ''', (word_id, validated_session_id, 1 if is_correct else 0))
-        
-        # Update or create word review aggregate
-        cursor.execute('''
-          INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
-          VALUES (?, ?, ?, datetime('now'))
-          ON CONFLICT(word_id) DO UPDATE SET
-            correct_count = correct_count + ?,
-            wrong_count = wrong_count + ?,
-            last_reviewed = datetime('now')
-        ''', (
-          word_id,
-          1 if is_correct else 0,
-          0 if is_correct else 1,
-          1 if is_correct else 0,
-          0 if is_correct else 1
-        ))
+      # Normalize IDs sent as strings so they compare equal to database IDs
+      reviews = [{'word_id': int(review['word_id']), 'is_correct': review['is_correct']} for review in reviews]
+      
+      # Verify every referenced word exists with a single set query,
+      # reporting the first unknown word in submission order
+      missing = app.repositories.words.missing_ids([review['word_id'] for review in reviews])
+      if missing:
+        first_missing = next(review['word_id'] for review in reviews if review['word_id'] in missing)
+        return handle_not_found_error("Word", first_missing)
       
-      app.db.commit()
+      # Insert all review items and one aggregated counter update per word
+      sessions.add_reviews(validated_session_id, reviews, user_id)
+      app.cache.invalidate('word_review_items', 'word_reviews', 'study_sessions')
       
       return jsonify({
         "message": f"Successfully recorded {len(reviews)} word reviews",
@@ -284,22 +215,118 @@ def load(app):
     except Exception as e:
       return handle_database_error(e, "submitting study session review")
 
+  # Endpoint: POST /study_sessions/:id/review/stream
+  # Accepts newline-delimited JSON review records (application/x-ndjson) and
+  # commits them in chunks of REVIEW_STREAM_CHUNK_SIZE while the body is
+  # still being read. Responds with one NDJSON progress line per committed
+  # chunk followed by a summary line.
+  @app.route('/api/study_sessions/<int:session_id>/review/stream', methods=['POST'])
+  @cross_origin()
+  def stream_study_session_review(session_id):
+    try:
+      if request.mimetype not in ('application/x-ndjson', 'application/jsonl'):
+        return create_error_response(
+          "Content-Type must be application/x-ndjson",
+          status_code=415,
+          error_code="UNSUPPORTED_MEDIA_TYPE"
+        )
+
+      # Verify the user's study session exists and is open before starting the stream
+      user_id = current_user_id()
+      session = sessions.find(session_id, user_id)
+      if not session:
+        return handle_not_found_error("Study session", session_id)
+      if session['ended_at']:
+        return create_error_response(
+          f"Study session with ID {session_id} is closed",
+          status_code=409,
+          error_code="SESSION_CLOSED"
+        )
+
+    except Exception as e:
+      return handle_database_error(e, "starting streamed study session review")
+
+    chunk_size = app.config['REVIEW_STREAM_CHUNK_SIZE']
+    # Connections are checked out again per chunk and returned once it is
+    # committed, so none is held while the client sends the body
+    app.storage.close()
+
+    def generate():
+      chunks = 0
+      reviews_count = 0
+      error = None
+      try:
+        for chunk in read_review_chunks(request.stream, chunk_size):
+          missing = app.repositories.words.missing_ids([review['word_id'] for review in chunk])
+          if missing:
+            first_missing = next(review['word_id'] for review in chunk if review['word_id'] in missing)
+            error = f"Word with ID {first_missing} not found"
+            break
+
+          sessions.add_reviews(session_id, chunk, user_id)
+          app.cache.invalidate('word_review_items', 'word_reviews', 'study_sessions')
+          app.storage.close()
+
+          chunks += 1
+          reviews_count += len(chunk)
+          yield json.dumps({
+            "chunk": chunks,
+            "chunk_reviews": len(chunk),
+            "reviews_count": reviews_count
+          }) + "\n"
+      except ValueError as e:
+        error = str(e)
+      except Exception as e:
+        logger.exception(f"Database error during streamed study session review: {e}")
+        sessions.rollback()
+        app.storage.close()
+        error = "Internal database error occurred"
+
+      summary = {
+        "session_id": session_id,
+        "status": "failed" if error else "completed",
+        "chunks": chunks,
+        "reviews_count": reviews_count
+      }
+      if error:
+        # Chunks committed before the error are kept
+        summary["error"] = error
+      yield json.dumps({"summary": summary}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+  # Endpoint: POST /study_sessions/:id/close
+  # Marks the session as finished. Closing is idempotent; a closed session
+  # keeps its original end time and rejects further reviews.
+  @app.route('/api/study_sessions/<int:session_id>/close', methods=['POST'])
+  @cross_origin()
+  def close_study_session(session_id):
+    try:
+      session = sessions.close(session_id, current_user_id())
+      if not session:
+        return handle_not_found_error("Study session", session_id)
+
+      app.cache.invalidate('study_sessions')
+
+      return jsonify({
+        'session_id': session['id'],
+        'start_time': session['created_at'],
+        'end_time': session['end_time'],
+        'review_items_count': session['review_count'],
+        **format_session_lifecycle(session)
+      }), 200
+
+    except Exception as e:
+      return handle_database_error(e, "closing study session")
+
   @app.route('/api/study-sessions/reset', methods=['POST'])
   @cross_origin()
   def reset_study_sessions():
     try:
-      cursor = app.db.cursor()
-      
-      # First delete all word review items since they have foreign key constraints
-      cursor.execute('DELETE FROM word_review_items')
-      
-      # Then delete all study sessions
-      cursor.execute('DELETE FROM study_sessions')
-      
-      # Reset word review statistics
-      cursor.execute('DELETE FROM word_reviews')
-      
-      app.db.commit()
+      # Only the requesting user's history, statistics and schedules are
+      # cleared
+      sessions.reset(current_user_id())
+      app.cache.invalidate('study_sessions', 'word_review_items', 'word_reviews')
       
       return jsonify({"message": "Study history cleared successfully"}), 200
     except Exception as e:
@@ -0,0 +1,96 @@
+from flask import request, jsonify, g
+from flask_cors import cross_origin
+import math
+from lib.validation import validate_pagination_params, validate_required_fields, validate_string_field
+from lib.error_handler import (
+  create_error_response, handle_database_error, handle_validation_error, handle_not_found_error
+)
+from lib.storage import ConflictError
+from lib.users import USER_HEADER, DEFAULT_USER_ID, parse_user_id
+
+def format_user(user):
+  return {
+    "id": user["id"],
+    "name": user["name"],
+    "created_at": user["created_at"]
+  }
+
+# Users live in the shared database, also with sharded storage
+def load(app):
+  users = app.repositories.users
+
+  # Every request acts as the user named in the X-User-Id header, or the
+  # default user without it. Unknown users are rejected before the view runs.
+  @app.before_request
+  def select_user():
+    user_id, user_error = parse_user_id(request.headers.get(USER_HEADER))
+    if user_error:
+      return handle_validation_error(user_error)
+
+    if user_id != DEFAULT_USER_ID and not users.exists(user_id):
+      return handle_not_found_error("User", user_id)
+    g.user_id = user_id
+
+  # Responses differ per user, so shared HTTP caches must key on the header
+  @app.after_request
+  def vary_on_user(response):
+    response.vary.add(USER_HEADER)
+    return response
+
+  @app.route('/api/users', methods=['GET'])
+  @cross_origin()
+  def get_users():
+    try:
+      page, per_page, page_error = validate_pagination_params(
+        request.args.get('page'), request.args.get('per_page', 50)
+      )
+      if page_error:
+        return handle_validation_error(page_error)
+      offset = (page - 1) * per_page
+
+      rows = users.page(per_page, offset)
+      total_users = users.count()
+
+      return jsonify({
+        'items': [format_user(user) for user in rows],
+        'total': total_users,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': math.ceil(total_users / per_page)
+      })
+    except Exception as e:
+      return handle_database_error(e, "fetching users")
+
+  @app.route('/api/users', methods=['POST'])
+  @cross_origin()
+  def create_user():
+    try:
+      data = request.get_json()
+
+      field_errors = validate_required_fields(data, ['name'])
+      if field_errors:
+        return handle_validation_error(field_errors)
+
+      name, name_error = validate_string_field(data.get('name'), 'name', min_length=1, max_length=100)
+      if name_error:
+        return handle_validation_error(name_error)
+
+      try:
+        user = users.create(name)
+      except ConflictError as e:
+        return create_error_response(str(e), status_code=409, error_code="USER_EXISTS")
+      return jsonify(format_user(user)), 201
+
+    except Exception as e:
+      return handle_database_error(e, "creating user")
+
+  @app.route('/api/users/<int:user_id>', methods=['GET'])
+  @cross_origin()
+  def get_user(user_id):
+    try:
+      user = users.get(user_id)
+      if not user:
+        return handle_not_found_error("User", user_id)
+      return jsonify(format_user(user))
+    except Exception as e:
+      return handle_database_error(e, "fetching user")
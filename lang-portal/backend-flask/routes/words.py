@@ -2,19 +2,40 @@ from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
 from lib.validation import validate_pagination_params, validate_sort_params, validate_positive_integer
+from lib.pagination import encode_cursor, decode_cursor
+from lib.data_version import conditional_get
+from lib.search import MAX_QUERY_LENGTH, build_match_query
+from lib.json_stream import iter_json_document, json_stream_response, row_encoder
+from lib.repositories import WORD_SORT_EXPRESSIONS
+from lib.users import current_user_id
 from lib.error_handler import (
     create_error_response, handle_database_error, handle_validation_error,
     handle_not_found_error, handle_generic_error, safe_execute
 )
 
+def format_word(word):
+  return {
+    "id": word["id"],
+    "german": word["german"],
+    "pronunciation": word["pronunciation"],
+    "english": word["english"],
+    "gender": word["gender"],
+    "plural": word["plural"],
+    "correct_count": word["correct_count"],
+    "wrong_count": word["wrong_count"]
+  }
+
 def load(app):
-  # Endpoint: GET /words with pagination (50 words per page)
+  # Review counters are the requesting user's (see lib.users).
+  words = app.repositories.words
+
+  # Endpoint: GET /words with pagination (50 words per page).
+  # Pass ?cursor= (empty for the first page) to page with next_cursor instead.
   @app.route('/api/words', methods=['GET'])
   @cross_origin()
+  @conditional_get(app, 'words', 'word_reviews')
   def get_words():
     try:
-      cursor = app.db.cursor()
-
       # Validate pagination parameters
       page, _, page_error = validate_pagination_params(request.args.get('page'))
       words_per_page = 50
@@ -23,7 +44,7 @@ def load(app):
       # Validate sorting parameters
       sort_by = request.args.get('sort_by', 'german')
       order = request.args.get('order', 'asc')
-      valid_columns = ['german', 'pronunciation', 'english', 'correct_count', 'wrong_count', 'gender', 'plural']
+      valid_columns = list(WORD_SORT_EXPRESSIONS)
       sort_by, order, sort_error = validate_sort_params(sort_by, order, valid_columns)
       
       # Collect validation errors (non-fatal, will use defaults)
@@ -33,40 +54,50 @@ def load(app):
       if sort_error:
         validation_warnings.append(sort_error)
 
-      # Query to fetch words with sorting
-      cursor.execute(f'''
-        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
-            COALESCE(r.correct_count, 0) AS correct_count,
-            COALESCE(r.wrong_count, 0) AS wrong_count
-        FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (words_per_page, offset))
-
-      words = cursor.fetchall()
-
-      # Query the total number of words
-      cursor.execute('SELECT COUNT(*) FROM words')
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      # Cursor mode seeks past the last row of the previous page instead of
+      # skipping OFFSET rows, so deep pages cost the same as the first one
+      cursor_token = request.args.get('cursor')
+      if cursor_token is not None:
+        after = None
+        if cursor_token:
+          last_value, last_id, cursor_error = decode_cursor(cursor_token, sort_by, order)
+          if cursor_error:
+            return handle_validation_error(cursor_error)
+          after = (last_value, last_id)
 
-      # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "german": word["german"],
-          "pronunciation": word["pronunciation"],
-          "english": word["english"],
-          "gender": word["gender"],
-          "plural": word["plural"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
+        # One extra row tells us whether there is a next page
+        rows = words.page_after(current_user_id(), sort_by, order, words_per_page + 1, after)
+
+        next_cursor = None
+        if len(rows) > words_per_page:
+          rows = rows[:words_per_page]
+          next_cursor = encode_cursor(sort_by, order, rows[-1]["sort_value"], rows[-1]["id"])
+
+        return jsonify({
+          "words": [format_word(word) for word in rows],
+          "next_cursor": next_cursor
+        })
+
+      # With the vocabulary store enabled the page is a slice of a pre-sorted
+      # in-memory permutation
+      if app.vocabulary is not None:
+        snapshot = words.snapshot(app.vocabulary, current_user_id())
+        total_words = snapshot.count()
+        total_pages = (total_words + words_per_page - 1) // words_per_page
+        return jsonify({
+          "words": [format_word(word) for word in snapshot.page(sort_by, order, offset, words_per_page)],
+          "total_pages": total_pages,
+          "current_page": page,
+          "total_words": total_words
         })
 
+      # Fetch the page of words with sorting and the total number of words
+      rows = words.page(current_user_id(), sort_by, order, words_per_page, offset)
+      total_words = words.count()
+      total_pages = (total_words + words_per_page - 1) // words_per_page
+
       return jsonify({
-        "words": words_data,
+        "words": [format_word(word) for word in rows],
         "total_pages": total_pages,
         "current_page": page,
         "total_words": total_words
@@ -75,7 +106,60 @@ def load(app):
     except Exception as e:
       return handle_database_error(e, "fetching words")
     finally:
-      app.db.close()
+      app.storage.close()
+
+  # Endpoint: GET /words/export to download the whole vocabulary with parts
+  # and review counters. Rows are streamed from the cursor, so memory use
+  # does not grow with the number of words.
+  @app.route('/api/words/export', methods=['GET'])
+  @cross_origin()
+  @conditional_get(app, 'words', 'word_reviews')
+  def export_words():
+    try:
+      total_words = words.count()
+      cursor = words.export(current_user_id())
+
+      return json_stream_response(iter_json_document(
+        {"total_words": total_words}, 'words', cursor, row_encoder(raw_columns=('parts',))
+      ))
+
+    except Exception as e:
+      return handle_database_error(e, "exporting words")
+
+  # Endpoint: GET /words/search?q= full-text search over german, english,
+  # pronunciation and word parts, ranked by relevance with prefix matching
+  @app.route('/api/words/search', methods=['GET'])
+  @cross_origin()
+  @conditional_get(app, 'words', 'word_reviews')
+  def search_words():
+    try:
+      query = request.args.get('q', '')
+      if len(query) > MAX_QUERY_LENGTH:
+        return handle_validation_error(f"Search query cannot exceed {MAX_QUERY_LENGTH} characters")
+
+      if not build_match_query(query):
+        return handle_validation_error("Search query 'q' must contain at least one word")
+
+      page, per_page, page_error = validate_pagination_params(
+        request.args.get('page'), request.args.get('per_page', 50)
+      )
+      if page_error:
+        return handle_validation_error(page_error)
+      offset = (page - 1) * per_page
+
+      rows, total_words = words.search(query, current_user_id(), per_page, offset)
+      total_pages = (total_words + per_page - 1) // per_page
+
+      return jsonify({
+        "words": [format_word(word) for word in rows],
+        "query": query,
+        "total_words": total_words,
+        "total_pages": total_pages,
+        "current_page": page
+      })
+
+    except Exception as e:
+      return handle_database_error(e, "searching words")
 
   # Endpoint: GET /words/:id to get a single word with its details
   @app.route('/api/words/<int:word_id>', methods=['GET'])
@@ -87,23 +171,8 @@ def load(app):
       if id_error:
         return handle_validation_error(id_error)
       
-      cursor = app.db.cursor()
-      
-      # Query to fetch the word and its details
-      cursor.execute('''
-        SELECT w.id, w.german, w.pronunciation, w.english, w.gender, w.plural,
-               COALESCE(r.correct_count, 0) AS correct_count,
-               COALESCE(r.wrong_count, 0) AS wrong_count,
-               GROUP_CONCAT(DISTINCT g.id || '::' || g.name) as groups
-        FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        LEFT JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN groups g ON wg.group_id = g.id
-        WHERE w.id = ?
-        GROUP BY w.id
-      ''', (validated_word_id,))
-      
-      word = cursor.fetchone()
+      # Fetch the word and its details
+      word = words.get(validated_word_id, current_user_id())
       
       if not word:
         return handle_not_found_error("Word", validated_word_id)
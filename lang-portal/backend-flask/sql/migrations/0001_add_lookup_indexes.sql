@@ -0,0 +1,26 @@
+-- Secondary indexes for the foreign-key lookups every route joins or filters on
+
+-- word_groups previously allowed the same word to be linked to a group twice
+DELETE FROM word_groups
+WHERE rowid NOT IN (
+  SELECT MIN(rowid) FROM word_groups GROUP BY group_id, word_id
+);
+
+UPDATE groups SET words_count = (
+  SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id
+);
+
+-- Group -> words listings; also enforces one link per (group, word)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_groups_group_word ON word_groups(group_id, word_id);
+-- Word -> groups lookup on the word detail page
+CREATE INDEX IF NOT EXISTS idx_word_groups_word_group ON word_groups(word_id, group_id);
+
+-- Per-session review counts, last activity and per-word results (covering)
+CREATE INDEX IF NOT EXISTS idx_word_review_items_session ON word_review_items(study_session_id, word_id, correct, created_at);
+-- Per-word attempt and success aggregates for the dashboard (covering)
+CREATE INDEX IF NOT EXISTS idx_word_review_items_word ON word_review_items(word_id, correct);
+
+-- Session listings are ordered newest first, globally and within a group or activity
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at ON study_sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group ON study_sessions(group_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_activity ON study_sessions(study_activity_id, created_at);
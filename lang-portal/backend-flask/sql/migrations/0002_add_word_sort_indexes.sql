@@ -0,0 +1,8 @@
+-- Indexes backing keyset pagination of /api/words for each sortable word column.
+-- The rowid is part of every index, so ORDER BY <column>, id is served directly.
+CREATE INDEX IF NOT EXISTS idx_words_german ON words(german);
+CREATE INDEX IF NOT EXISTS idx_words_pronunciation ON words(pronunciation);
+CREATE INDEX IF NOT EXISTS idx_words_english ON words(english);
+-- Expression indexes match the NULL-free sort expressions used by the cursor
+CREATE INDEX IF NOT EXISTS idx_words_gender ON words(COALESCE(gender, ''));
+CREATE INDEX IF NOT EXISTS idx_words_plural ON words(COALESCE(plural, ''));
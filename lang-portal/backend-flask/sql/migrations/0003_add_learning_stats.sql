@@ -0,0 +1,55 @@
+-- Incrementally maintained dashboard statistics, so /api/dashboard/stats no
+-- longer aggregates the whole review history on every request
+
+-- Single summary row, updated together with every session and review write
+CREATE TABLE IF NOT EXISTS learning_stats (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  total_sessions INTEGER NOT NULL DEFAULT 0,
+  total_attempts INTEGER NOT NULL DEFAULT 0,
+  total_correct INTEGER NOT NULL DEFAULT 0,
+  words_studied INTEGER NOT NULL DEFAULT 0,  -- Words with at least one review item
+  mastered_words INTEGER NOT NULL DEFAULT 0,  -- Words with >= 5 attempts and >= 80% success
+  current_streak INTEGER NOT NULL DEFAULT 0,
+  last_study_date DATE  -- Most recent day with a study session
+);
+
+-- Per-word attempt/success counters derived from word_review_items
+CREATE TABLE IF NOT EXISTS word_stats (
+  word_id INTEGER PRIMARY KEY,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  successes INTEGER NOT NULL DEFAULT 0,
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+-- Backfill from the existing history
+INSERT INTO word_stats (word_id, attempts, successes)
+SELECT wri.word_id, COUNT(*), SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END)
+FROM word_review_items wri
+JOIN study_sessions ss ON wri.study_session_id = ss.id
+GROUP BY wri.word_id;
+
+INSERT OR IGNORE INTO learning_stats (id) VALUES (1);
+
+UPDATE learning_stats SET
+  total_sessions = (SELECT COUNT(*) FROM study_sessions),
+  total_attempts = (SELECT COALESCE(SUM(attempts), 0) FROM word_stats),
+  total_correct = (SELECT COALESCE(SUM(successes), 0) FROM word_stats),
+  words_studied = (SELECT COUNT(*) FROM word_stats),
+  mastered_words = (
+    SELECT COUNT(*) FROM word_stats
+    WHERE attempts >= 5 AND successes * 1.0 / attempts >= 0.8
+  ),
+  current_streak = (
+    WITH daily_sessions AS (
+      SELECT DISTINCT date(created_at) as study_date FROM study_sessions
+    ),
+    streak_calc AS (
+      SELECT
+        study_date,
+        julianday(study_date) - julianday(lag(study_date, 1) over (order by study_date)) as days_diff
+      FROM daily_sessions
+    )
+    SELECT COUNT(*) FROM streak_calc WHERE days_diff = 1 OR days_diff IS NULL
+  ),
+  last_study_date = (SELECT MAX(date(created_at)) FROM study_sessions)
+WHERE id = 1;
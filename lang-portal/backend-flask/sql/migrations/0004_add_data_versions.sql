@@ -0,0 +1,15 @@
+-- Monotonic per-table data versions, bumped by every write path and used to
+-- derive ETags for the read endpoints
+CREATE TABLE IF NOT EXISTS data_versions (
+  table_name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO data_versions (table_name) VALUES
+  ('words'),
+  ('groups'),
+  ('word_groups'),
+  ('study_activities'),
+  ('study_sessions'),
+  ('word_review_items'),
+  ('word_reviews');
@@ -0,0 +1,56 @@
+-- Full-text index over words for /api/words/search.
+-- unicode61 with remove_diacritics folds umlauts (schon finds schön); ß is
+-- folded to ss by the triggers below and by the search endpoint.
+-- prefix='2 3' keeps short prefix queries on a large vocabulary fast.
+CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+  german,
+  english,
+  pronunciation,
+  parts,  -- Text leaves of the parts JSON, space separated
+  tokenize = "unicode61 remove_diacritics 2",
+  prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS words_fts_insert AFTER INSERT ON words BEGIN
+  INSERT INTO words_fts (rowid, german, english, pronunciation, parts)
+  VALUES (
+    new.id,
+    replace(replace(new.german, 'ß', 'ss'), 'ẞ', 'SS'),
+    new.english,
+    new.pronunciation,
+    CASE WHEN json_valid(new.parts) THEN replace((
+      SELECT group_concat(value, ' ') FROM json_tree(new.parts) WHERE type = 'text'
+    ), 'ß', 'ss') ELSE new.parts END
+  );
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_fts_delete AFTER DELETE ON words BEGIN
+  DELETE FROM words_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_fts_update AFTER UPDATE OF german, english, pronunciation, parts ON words BEGIN
+  DELETE FROM words_fts WHERE rowid = old.id;
+  INSERT INTO words_fts (rowid, german, english, pronunciation, parts)
+  VALUES (
+    new.id,
+    replace(replace(new.german, 'ß', 'ss'), 'ẞ', 'SS'),
+    new.english,
+    new.pronunciation,
+    CASE WHEN json_valid(new.parts) THEN replace((
+      SELECT group_concat(value, ' ') FROM json_tree(new.parts) WHERE type = 'text'
+    ), 'ß', 'ss') ELSE new.parts END
+  );
+END;
+
+-- Index the existing vocabulary
+INSERT INTO words_fts (rowid, german, english, pronunciation, parts)
+SELECT
+  id,
+  replace(replace(german, 'ß', 'ss'), 'ẞ', 'SS'),
+  english,
+  pronunciation,
+  CASE WHEN json_valid(parts) THEN replace((
+    SELECT group_concat(value, ' ') FROM json_tree(words.parts) WHERE type = 'text'
+  ), 'ß', 'ss') ELSE parts END
+FROM words
+WHERE id NOT IN (SELECT rowid FROM words_fts);
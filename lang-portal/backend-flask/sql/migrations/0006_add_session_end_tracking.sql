@@ -0,0 +1,20 @@
+-- Session end time and review count, maintained by the review writer so
+-- session listings no longer aggregate word_review_items per row
+ALTER TABLE study_sessions ADD COLUMN ended_at DATETIME;  -- Time of the latest review item
+ALTER TABLE study_sessions ADD COLUMN review_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE study_sessions SET
+  ended_at = (
+    SELECT MAX(created_at) FROM word_review_items
+    WHERE study_session_id = study_sessions.id
+  ),
+  review_count = (
+    SELECT COUNT(*) FROM word_review_items
+    WHERE study_session_id = study_sessions.id
+  );
+
+-- Sorting a group's session history by end time or size
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_ended
+  ON study_sessions (group_id, ended_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_review_count
+  ON study_sessions (group_id, review_count);
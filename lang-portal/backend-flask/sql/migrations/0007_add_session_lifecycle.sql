@@ -0,0 +1,35 @@
+-- Session lifecycle: ended_at is now set only when a session is closed
+-- through POST /api/study_sessions/<id>/close. The time of the latest
+-- review moves to last_review_at, and correct_count joins review_count so
+-- accuracy needs no aggregation over word_review_items.
+ALTER TABLE study_sessions ADD COLUMN last_review_at DATETIME;
+ALTER TABLE study_sessions ADD COLUMN correct_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE study_sessions SET
+  last_review_at = ended_at,
+  ended_at = NULL,
+  correct_count = (
+    SELECT COUNT(*) FROM word_review_items
+    WHERE study_session_id = study_sessions.id AND correct = 1
+  );
+
+-- Duration and accuracy indexes for sorting and filtering session listings.
+-- The expressions must match lib/sessions.py exactly to be used.
+CREATE INDEX IF NOT EXISTS idx_study_sessions_duration
+  ON study_sessions ((julianday(COALESCE(ended_at, last_review_at, created_at)) - julianday(created_at)) * 86400);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_accuracy
+  ON study_sessions ((CASE WHEN review_count > 0 THEN correct_count * 1.0 / review_count END));
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_duration
+  ON study_sessions (group_id, (julianday(COALESCE(ended_at, last_review_at, created_at)) - julianday(created_at)) * 86400);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_accuracy
+  ON study_sessions (group_id, (CASE WHEN review_count > 0 THEN correct_count * 1.0 / review_count END));
+CREATE INDEX IF NOT EXISTS idx_study_sessions_activity_duration
+  ON study_sessions (study_activity_id, (julianday(COALESCE(ended_at, last_review_at, created_at)) - julianday(created_at)) * 86400);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_activity_accuracy
+  ON study_sessions (study_activity_id, (CASE WHEN review_count > 0 THEN correct_count * 1.0 / review_count END));
+
+-- The group listing sorts by end time, which now falls back to the latest
+-- review and then the start time
+DROP INDEX IF EXISTS idx_study_sessions_group_ended;
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_end_time
+  ON study_sessions (group_id, COALESCE(ended_at, last_review_at, created_at));
@@ -0,0 +1,18 @@
+-- SM-2 spaced repetition state per word. due_at is copied onto every
+-- word_groups row of the word so a group's due queue is one index range.
+ALTER TABLE word_reviews ADD COLUMN ease REAL NOT NULL DEFAULT 2.5;
+ALTER TABLE word_reviews ADD COLUMN interval_days REAL NOT NULL DEFAULT 0;
+ALTER TABLE word_reviews ADD COLUMN repetitions INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE word_reviews ADD COLUMN due_at DATETIME;  -- NULL until first reviewed
+
+ALTER TABLE word_groups ADD COLUMN due_at DATETIME;  -- Copy of word_reviews.due_at
+
+-- Words reviewed before scheduling existed are due straight away;
+-- `invoke rebuild-stats` replays their history for a real schedule
+UPDATE word_reviews SET due_at = last_reviewed;
+UPDATE word_groups SET due_at = (
+  SELECT due_at FROM word_reviews WHERE word_reviews.word_id = word_groups.word_id
+);
+
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_due
+  ON word_groups (group_id, due_at);
@@ -0,0 +1,17 @@
+-- Content hashes of the imported seed files and of every word record in
+-- them, so init-db skips unchanged files and only upserts changed records
+CREATE TABLE IF NOT EXISTS seed_files (
+  path TEXT PRIMARY KEY,
+  digest TEXT NOT NULL,
+  seeded_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+
+-- One row per seed record, keyed on its German text within the file
+CREATE TABLE IF NOT EXISTS seed_records (
+  path TEXT NOT NULL,
+  record_key TEXT NOT NULL,
+  digest TEXT NOT NULL,
+  word_id INTEGER NOT NULL,
+  PRIMARY KEY (path, record_key),
+  FOREIGN KEY (word_id) REFERENCES words(id)
+) WITHOUT ROWID;
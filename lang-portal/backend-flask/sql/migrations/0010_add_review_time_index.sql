@@ -0,0 +1,5 @@
+-- migrate: online
+-- Review history in time order, for replaying schedules (rebuild_schedule)
+-- and per-period activity queries. word_review_items is the largest table,
+-- so this is built as an online migration: one statement per transaction.
+CREATE INDEX IF NOT EXISTS idx_word_review_items_created ON word_review_items(created_at, word_id, correct);
@@ -0,0 +1,124 @@
+-- Learners. Study sessions, review items, word counters and schedules and the
+-- dashboard statistics now belong to a user; the existing history is
+-- assigned to the default user, which requests without X-User-Id act as.
+CREATE TABLE IF NOT EXISTS users (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT NOT NULL UNIQUE,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT OR IGNORE INTO users (id, name) VALUES (1, 'default');
+
+-- ADD COLUMN cannot carry a REFERENCES clause with a non-NULL default, so
+-- the users(id) reference of these columns is kept by the application.
+-- word_review_items repeats its session's user so per-user history is one
+-- index range without joining study_sessions. Like here, rows written
+-- without a user belong to the default user in the tables rebuilt below.
+ALTER TABLE study_sessions ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE word_review_items ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+
+-- Word counters and schedules become per (user, word)
+CREATE TABLE word_reviews_by_user (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL DEFAULT 1,
+  word_id INTEGER NOT NULL,
+  correct_count INTEGER DEFAULT 0,
+  wrong_count INTEGER DEFAULT 0,
+  last_reviewed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  ease REAL NOT NULL DEFAULT 2.5,
+  interval_days REAL NOT NULL DEFAULT 0,
+  repetitions INTEGER NOT NULL DEFAULT 0,
+  due_at DATETIME,  -- NULL until first reviewed
+  UNIQUE (user_id, word_id),
+  FOREIGN KEY (user_id) REFERENCES users(id),
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+INSERT INTO word_reviews_by_user (id, user_id, word_id, correct_count, wrong_count, last_reviewed,
+                                  ease, interval_days, repetitions, due_at)
+SELECT id, 1, word_id, correct_count, wrong_count, last_reviewed, ease, interval_days, repetitions, due_at
+FROM word_reviews;
+DROP TABLE word_reviews;
+ALTER TABLE word_reviews_by_user RENAME TO word_reviews;
+
+-- Due dates are per user now, so the shared copy on word_groups goes. A
+-- group's due queue joins its members to the (user_id, word_id) key above;
+-- this index serves a user's due words across all groups.
+DROP INDEX IF EXISTS idx_word_groups_group_due;
+ALTER TABLE word_groups DROP COLUMN due_at;
+CREATE INDEX idx_word_reviews_user_due ON word_reviews (user_id, due_at);
+
+-- Dashboard counters per user
+CREATE TABLE word_stats_by_user (
+  user_id INTEGER NOT NULL DEFAULT 1,
+  word_id INTEGER NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  successes INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, word_id),
+  FOREIGN KEY (user_id) REFERENCES users(id),
+  FOREIGN KEY (word_id) REFERENCES words(id)
+) WITHOUT ROWID;
+INSERT INTO word_stats_by_user (user_id, word_id, attempts, successes)
+SELECT 1, word_id, attempts, successes FROM word_stats;
+DROP TABLE word_stats;
+ALTER TABLE word_stats_by_user RENAME TO word_stats;
+
+-- One summary row per user, created with the user's first session
+CREATE TABLE learning_stats_by_user (
+  user_id INTEGER PRIMARY KEY,
+  total_sessions INTEGER NOT NULL DEFAULT 0,
+  total_attempts INTEGER NOT NULL DEFAULT 0,
+  total_correct INTEGER NOT NULL DEFAULT 0,
+  words_studied INTEGER NOT NULL DEFAULT 0,  -- Words with at least one review item
+  mastered_words INTEGER NOT NULL DEFAULT 0,  -- Words with >= 5 attempts and >= 80% success
+  current_streak INTEGER NOT NULL DEFAULT 0,
+  last_study_date DATE,  -- Most recent day with a study session
+  FOREIGN KEY (user_id) REFERENCES users(id)
+);
+INSERT INTO learning_stats_by_user (user_id, total_sessions, total_attempts, total_correct,
+                                    words_studied, mastered_words, current_streak, last_study_date)
+SELECT 1, total_sessions, total_attempts, total_correct, words_studied, mastered_words,
+       current_streak, last_study_date
+FROM learning_stats
+WHERE id = 1;
+DROP TABLE learning_stats;
+ALTER TABLE learning_stats_by_user RENAME TO learning_stats;
+
+-- Every session listing and dashboard query is now filtered by user, so the
+-- session indexes lead with user_id. The expressions must match
+-- lib/sessions.py exactly to be used.
+DROP INDEX IF EXISTS idx_study_sessions_created_at;
+DROP INDEX IF EXISTS idx_study_sessions_group;
+DROP INDEX IF EXISTS idx_study_sessions_activity;
+DROP INDEX IF EXISTS idx_study_sessions_group_review_count;
+DROP INDEX IF EXISTS idx_study_sessions_duration;
+DROP INDEX IF EXISTS idx_study_sessions_accuracy;
+DROP INDEX IF EXISTS idx_study_sessions_group_duration;
+DROP INDEX IF EXISTS idx_study_sessions_group_accuracy;
+DROP INDEX IF EXISTS idx_study_sessions_activity_duration;
+DROP INDEX IF EXISTS idx_study_sessions_activity_accuracy;
+DROP INDEX IF EXISTS idx_study_sessions_group_end_time;
+
+CREATE INDEX idx_study_sessions_user_created_at ON study_sessions (user_id, created_at);
+CREATE INDEX idx_study_sessions_user_group ON study_sessions (user_id, group_id, created_at);
+CREATE INDEX idx_study_sessions_user_activity ON study_sessions (user_id, study_activity_id, created_at);
+CREATE INDEX idx_study_sessions_user_group_review_count ON study_sessions (user_id, group_id, review_count);
+CREATE INDEX idx_study_sessions_user_duration
+  ON study_sessions (user_id, (julianday(COALESCE(ended_at, last_review_at, created_at)) - julianday(created_at)) * 86400);
+CREATE INDEX idx_study_sessions_user_accuracy
+  ON study_sessions (user_id, (CASE WHEN review_count > 0 THEN correct_count * 1.0 / review_count END));
+CREATE INDEX idx_study_sessions_user_group_duration
+  ON study_sessions (user_id, group_id, (julianday(COALESCE(ended_at, last_review_at, created_at)) - julianday(created_at)) * 86400);
+CREATE INDEX idx_study_sessions_user_group_accuracy
+  ON study_sessions (user_id, group_id, (CASE WHEN review_count > 0 THEN correct_count * 1.0 / review_count END));
+CREATE INDEX idx_study_sessions_user_activity_duration
+  ON study_sessions (user_id, study_activity_id, (julianday(COALESCE(ended_at, last_review_at, created_at)) - julianday(created_at)) * 86400);
+CREATE INDEX idx_study_sessions_user_activity_accuracy
+  ON study_sessions (user_id, study_activity_id, (CASE WHEN review_count > 0 THEN correct_count * 1.0 / review_count END));
+CREATE INDEX idx_study_sessions_user_group_end_time
+  ON study_sessions (user_id, group_id, COALESCE(ended_at, last_review_at, created_at));
+
+-- Per-user review history: per-word aggregates and time order (schedule replay)
+DROP INDEX IF EXISTS idx_word_review_items_word;
+DROP INDEX IF EXISTS idx_word_review_items_created;
+CREATE INDEX idx_word_review_items_user_word ON word_review_items (user_id, word_id, correct);
+CREATE INDEX idx_word_review_items_user_created ON word_review_items (user_id, created_at, word_id, correct);
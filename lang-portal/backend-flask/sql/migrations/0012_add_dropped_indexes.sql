@@ -0,0 +1,7 @@
+-- CREATE INDEX statements of the indexes a bulk load dropped (invoke
+-- generate-history --drop-indexes), recorded in the transaction that drops
+-- them and removed once they are rebuilt, so a killed load can be recovered
+CREATE TABLE IF NOT EXISTS dropped_indexes (
+  name TEXT PRIMARY KEY,
+  sql TEXT NOT NULL
+) WITHOUT ROWID;
@@ -0,0 +1,194 @@
+-- Schema of the PostgreSQL storage backend (lib/storage.py), equivalent to
+-- the SQLite schema after sql/setup and every migration in sql/migrations.
+-- Safe to run repeatedly; only missing objects are created.
+--
+-- Differences from SQLite:
+--   * Text columns that listings sort by use the "C" collation, the byte
+--     order SQLite compares text in.
+--   * Timestamps are TIMESTAMP(0) in UTC; the backend returns them as
+--     'YYYY-MM-DD HH:MM:SS' text like SQLite stores them.
+--   * word_groups has an id, which the due queue orders by instead of rowid.
+--   * Full-text search uses a generated tsvector column instead of words_fts.
+
+-- SQLite's json_valid(), so queries mapping invalid parts JSON to NULL run
+-- unchanged
+CREATE OR REPLACE FUNCTION json_valid(value text) RETURNS boolean
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+  PERFORM value::jsonb;
+  RETURN true;
+EXCEPTION WHEN others THEN
+  RETURN false;
+END;
+$$;
+
+-- Folding the words_fts tokenizer applies: diacritics removed, ß spelled
+-- out as ss, lower case. lib.search.build_tsquery folds search input with
+-- the same table.
+CREATE OR REPLACE FUNCTION fold_search_text(value text) RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT translate(
+    replace(replace(value, 'ß', 'ss'), 'ẞ', 'ss'),
+    'ÀÁÂÃÄÅàáâãäåÇçÈÉÊËèéêëÌÍÎÏìíîïÑñÒÓÔÕÖòóôõöÙÚÛÜùúûüÝýÿABCDEFGHIJKLMNOPQRSTUVWXYZ',
+    'aaaaaaaaaaaacceeeeeeeeiiiiiiiinnoooooooooouuuuuuuuyyyabcdefghijklmnopqrstuvwxyz'
+  )
+$$;
+
+-- Text leaves of a parts JSON value, space separated; invalid JSON is
+-- indexed as is
+CREATE OR REPLACE FUNCTION json_text_leaves(value text) RETURNS text
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+  RETURN (
+    SELECT string_agg(leaf #>> '{}', ' ')
+    FROM jsonb_path_query(value::jsonb, 'strict $.** ? (@.type() == "string")') AS leaf
+  );
+EXCEPTION WHEN others THEN
+  RETURN value;
+END;
+$$;
+
+-- Weights follow the words_fts bm25 weights: german (A) before english (B)
+-- before parts (C) before pronunciation (D)
+CREATE OR REPLACE FUNCTION word_search_vector(german text, english text, pronunciation text, parts text)
+RETURNS tsvector
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT setweight(to_tsvector('simple', fold_search_text(coalesce(german, ''))), 'A')
+      || setweight(to_tsvector('simple', fold_search_text(coalesce(english, ''))), 'B')
+      || setweight(to_tsvector('simple', fold_search_text(coalesce(json_text_leaves(parts), ''))), 'C')
+      || setweight(to_tsvector('simple', fold_search_text(coalesce(pronunciation, ''))), 'D')
+$$;
+
+CREATE TABLE IF NOT EXISTS users (
+  id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  name TEXT COLLATE "C" NOT NULL UNIQUE,
+  created_at TIMESTAMP(0) DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+INSERT INTO users (id, name) VALUES (1, 'default') ON CONFLICT DO NOTHING;
+SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT MAX(id) FROM users));
+
+CREATE TABLE IF NOT EXISTS words (
+  id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  german TEXT COLLATE "C" NOT NULL,
+  pronunciation TEXT COLLATE "C" NOT NULL,
+  english TEXT COLLATE "C" NOT NULL,
+  parts TEXT NOT NULL,  -- Parts as JSON text, like in SQLite
+  gender TEXT COLLATE "C",
+  plural TEXT COLLATE "C",
+  search_vector tsvector GENERATED ALWAYS AS (word_search_vector(german, english, pronunciation, parts)) STORED
+);
+
+CREATE TABLE IF NOT EXISTS groups (
+  id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  name TEXT COLLATE "C" NOT NULL,
+  words_count INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS word_groups (
+  id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  word_id INTEGER NOT NULL REFERENCES words(id),
+  group_id INTEGER NOT NULL REFERENCES groups(id)
+);
+
+CREATE TABLE IF NOT EXISTS study_activities (
+  id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  name TEXT COLLATE "C" NOT NULL,
+  url TEXT NOT NULL,
+  preview_url TEXT
+);
+
+CREATE TABLE IF NOT EXISTS study_sessions (
+  id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  user_id INTEGER NOT NULL DEFAULT 1 REFERENCES users(id),
+  group_id INTEGER NOT NULL REFERENCES groups(id),
+  study_activity_id INTEGER NOT NULL REFERENCES study_activities(id),
+  created_at TIMESTAMP(0) DEFAULT (now() AT TIME ZONE 'utc'),
+  ended_at TIMESTAMP(0),
+  last_review_at TIMESTAMP(0),
+  review_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS word_review_items (
+  id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  user_id INTEGER NOT NULL DEFAULT 1 REFERENCES users(id),
+  word_id INTEGER NOT NULL REFERENCES words(id),
+  study_session_id INTEGER NOT NULL REFERENCES study_sessions(id),
+  correct INTEGER NOT NULL,  -- 1 correct, 0 wrong, as in SQLite
+  created_at TIMESTAMP(0) DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+CREATE TABLE IF NOT EXISTS word_reviews (
+  id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  user_id INTEGER NOT NULL DEFAULT 1 REFERENCES users(id),
+  word_id INTEGER NOT NULL REFERENCES words(id),
+  correct_count INTEGER DEFAULT 0,
+  wrong_count INTEGER DEFAULT 0,
+  last_reviewed TIMESTAMP(0) DEFAULT (now() AT TIME ZONE 'utc'),
+  ease DOUBLE PRECISION NOT NULL DEFAULT 2.5,
+  interval_days DOUBLE PRECISION NOT NULL DEFAULT 0,
+  repetitions INTEGER NOT NULL DEFAULT 0,
+  due_at TIMESTAMP(0),  -- NULL until first reviewed
+  UNIQUE (user_id, word_id)
+);
+
+CREATE TABLE IF NOT EXISTS word_stats (
+  user_id INTEGER NOT NULL DEFAULT 1 REFERENCES users(id),
+  word_id INTEGER NOT NULL REFERENCES words(id),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  successes INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, word_id)
+);
+
+CREATE TABLE IF NOT EXISTS learning_stats (
+  user_id INTEGER PRIMARY KEY REFERENCES users(id),
+  total_sessions INTEGER NOT NULL DEFAULT 0,
+  total_attempts INTEGER NOT NULL DEFAULT 0,
+  total_correct INTEGER NOT NULL DEFAULT 0,
+  words_studied INTEGER NOT NULL DEFAULT 0,
+  mastered_words INTEGER NOT NULL DEFAULT 0,
+  current_streak INTEGER NOT NULL DEFAULT 0,
+  last_study_date DATE
+);
+
+CREATE TABLE IF NOT EXISTS data_versions (
+  table_name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0
+);
+
+-- Indexes of the SQLite migrations; the duration and accuracy expressions
+-- are lib.sessions' PostgreSQL expressions
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_groups_group_word ON word_groups (group_id, word_id);
+CREATE INDEX IF NOT EXISTS idx_word_groups_word_group ON word_groups (word_id, group_id);
+CREATE INDEX IF NOT EXISTS idx_words_german ON words (german);
+CREATE INDEX IF NOT EXISTS idx_words_pronunciation ON words (pronunciation);
+CREATE INDEX IF NOT EXISTS idx_words_english ON words (english);
+CREATE INDEX IF NOT EXISTS idx_words_gender ON words ((COALESCE(gender, '')));
+CREATE INDEX IF NOT EXISTS idx_words_plural ON words ((COALESCE(plural, '')));
+CREATE INDEX IF NOT EXISTS idx_words_search ON words USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS idx_word_review_items_session
+  ON word_review_items (study_session_id, word_id, correct, created_at);
+CREATE INDEX IF NOT EXISTS idx_word_review_items_user_word ON word_review_items (user_id, word_id, correct);
+CREATE INDEX IF NOT EXISTS idx_word_review_items_user_created
+  ON word_review_items (user_id, created_at, word_id, correct);
+CREATE INDEX IF NOT EXISTS idx_word_reviews_user_due ON word_reviews (user_id, due_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_created_at ON study_sessions (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_group ON study_sessions (user_id, group_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_activity ON study_sessions (user_id, study_activity_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_group_review_count
+  ON study_sessions (user_id, group_id, review_count);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_duration
+  ON study_sessions (user_id, (EXTRACT(EPOCH FROM COALESCE(ended_at, last_review_at, created_at) - created_at)));
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_accuracy
+  ON study_sessions (user_id, (CASE WHEN review_count > 0 THEN correct_count * 1.0 / review_count END));
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_group_duration
+  ON study_sessions (user_id, group_id, (EXTRACT(EPOCH FROM COALESCE(ended_at, last_review_at, created_at) - created_at)));
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_group_accuracy
+  ON study_sessions (user_id, group_id, (CASE WHEN review_count > 0 THEN correct_count * 1.0 / review_count END));
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_activity_duration
+  ON study_sessions (user_id, study_activity_id, (EXTRACT(EPOCH FROM COALESCE(ended_at, last_review_at, created_at) - created_at)));
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_activity_accuracy
+  ON study_sessions (user_id, study_activity_id, (CASE WHEN review_count > 0 THEN correct_count * 1.0 / review_count END));
+CREATE INDEX IF NOT EXISTS idx_study_sessions_user_group_end_time
+  ON study_sessions (user_id, group_id, (COALESCE(ended_at, last_review_at, created_at)));
@@ -6,4 +6,133 @@ def init_db(c):
   from flask import Flask
   app = Flask(__name__)
   db.init(app)
-  print("Database initialized successfully.")
\ No newline at end of file
+  print("Database initialized successfully.")
+
+@task(help={
+  'dry_run': 'List the pending migrations without applying them',
+  'shards_dir': 'Also upgrade every user shard in this directory to the new schema (sharded storage)',
+})
+def migrate(c, dry_run=False, shards_dir=None):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    try:
+      plan = db.migration_plan()
+      for migration in plan.modified:
+        print(f"Warning: {migration.filename} changed after it was applied")
+      if dry_run:
+        print(f"Schema version {plan.current_version}, {len(plan.pending)} pending migrations:")
+        for migration in plan.pending:
+          print(f"  {migration.filename}{' (online)' if migration.online else ''}")
+        return
+      applied = db.migrate(db.cursor(), log=print)
+    finally:
+      db.close()
+  print(f"Database is up to date ({len(applied)} migrations applied).")
+  if shards_dir:
+    from lib.db import Db
+    from lib.shards import prepare_shard
+    shards = Db(database=db.database, shards_dir=shards_dir).shards
+    for user_id in shards.user_ids():
+      connection = shards.connect(shards.path(user_id), False)
+      try:
+        prepare_shard(connection)
+      finally:
+        connection.close()
+    print(f"{len(shards.user_ids())} shards are up to date.")
+
+@task(help={'shards_dir': 'Rebuild every user shard in this directory instead (sharded storage)'})
+def rebuild_stats(c, shards_dir=None):
+  from flask import Flask
+  from lib.db import Db
+  from lib.stats import rebuild_learning_stats
+  from lib.scheduler import rebuild_schedule
+  if shards_dir:
+    shards = Db(database=db.database, shards_dir=shards_dir).shards
+    for user_id in shards.user_ids():
+      connection = shards.connect(shards.path(user_id), False)
+      try:
+        cursor = connection.cursor()
+        rebuild_learning_stats(cursor)
+        rebuild_schedule(cursor)
+        connection.commit()
+      finally:
+        connection.close()
+    print(f"Learning statistics and review schedules of {len(shards.user_ids())} shards rebuilt.")
+    return
+  app = Flask(__name__)
+  with app.app_context():
+    cursor = db.cursor()
+    rebuild_learning_stats(cursor)
+    rebuild_schedule(cursor)
+    db.commit()
+  print("Learning statistics and review schedules rebuilt from study history.")
+
+@task(help={
+  'path': 'Word list to import (.json array, .ndjson/.jsonl or .csv)',
+  'group': 'Group for records without a "group" field',
+  'file_format': 'Input format when the extension is ambiguous: json, ndjson or csv',
+  'batch_size': 'Records written per transaction',
+})
+def import_words(c, path, group=None, file_format=None, batch_size=5000):
+  from flask import Flask
+  from lib.importer import import_words as run_import, iter_records
+  app = Flask(__name__)
+  with app.app_context():
+    result = run_import(
+      db.get(), iter_records(path, file_format), group_name=group, batch_size=int(batch_size),
+      progress=lambda count: print(f"  {count} records", end='\r', flush=True)
+    )
+  rate = result.records / result.seconds if result.seconds else 0
+  print(f"Imported {result.records} records in {result.seconds:.2f}s ({rate:,.0f} rows/sec): "
+        f"{result.words_added} new words, {result.links_added} new group links "
+        f"across {len(result.groups)} groups.")
+
+@task(help={
+  'learners': 'Number of simulated learners',
+  'groups': 'Groups to study; extra "Practice Set" groups are created from random words if needed',
+  'days': 'Length of the simulated history in days, ending today',
+  'reviews_per_session': 'Typical number of reviews per session',
+  'seed': 'Random seed; the same seed and options produce the same history',
+  'batch_size': 'Review items written per transaction',
+  'drop_indexes': 'Drop the secondary indexes of the loaded tables for a faster load; stop the app first',
+})
+def generate_history(c, learners=100, groups=None, days=730, reviews_per_session=20, seed=42, batch_size=200000,
+                     drop_indexes=False):
+  from flask import Flask
+  from lib.synthetic import generate_history as run_generator
+  app = Flask(__name__)
+  with app.app_context():
+    try:
+      result = run_generator(
+        db.get(), learners=int(learners), groups=int(groups) if groups else None, days=int(days),
+        reviews_per_session=int(reviews_per_session), seed=int(seed), batch_size=int(batch_size),
+        drop_indexes=drop_indexes,
+        progress=lambda sessions, reviews: print(f"  {sessions} sessions, {reviews} review items", end='\r', flush=True)
+      )
+    finally:
+      db.close()
+  rate = result.reviews / result.seconds if result.seconds else 0
+  print(f"Generated {result.sessions} study sessions and {result.reviews} review items for "
+        f"{result.learners} learners across {result.groups} groups in {result.seconds:.1f}s "
+        f"({rate:,.0f} rows/sec).")
+
+@task(help={
+  'dsn': 'libpq connection string or URI of the PostgreSQL database (default: POSTGRES_DSN)',
+  'batch_size': 'Rows inserted per statement batch',
+})
+def copy_to_postgres(c, dsn=None, batch_size=5000):
+  import os
+  from lib.storage import PostgresBackend, copy_sqlite_to_postgres
+  dsn = dsn or os.environ.get('POSTGRES_DSN')
+  if not dsn:
+    raise SystemExit("Pass --dsn or set POSTGRES_DSN")
+  connection = db.connect()
+  try:
+    copy_sqlite_to_postgres(
+      connection, PostgresBackend(dsn), batch_size=int(batch_size),
+      log=lambda table, rows: print(f"  {table}: {rows} rows")
+    )
+  finally:
+    connection.close()
+  print("Copied the SQLite database into PostgreSQL; run the app with STORAGE_BACKEND=postgres.")
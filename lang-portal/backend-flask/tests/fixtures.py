@@ -1,4 +1,6 @@
 """Test fixtures and data for German vocabulary tests."""
+import json
+
 
 def get_test_words():
     """Return a list of test German words."""
@@ -45,6 +47,11 @@ def get_test_words():
         }
     ]
 
+def word(german, english, **fields):
+    """Build a word record as found in seed and import files."""
+    return {'german': german, 'pronunciation': german.lower(), 'english': english,
+            'parts': [german], **fields}
+
 def get_test_groups():
     """Return a list of test groups."""
     return [
@@ -81,4 +88,30 @@ def get_test_word_reviews():
         {'word_id': 1, 'is_correct': True},
         {'word_id': 2, 'is_correct': False},
         {'word_id': 3, 'is_correct': True}
-    ]
\ No newline at end of file
+    ]
+
+
+def as_user(user_id):
+    """Headers making a request on behalf of a user."""
+    return {'X-User-Id': str(user_id)}
+
+
+def study(client, user_id, group_id, reviews):
+    """Start a session for a user in a group and submit reviews; returns its ID."""
+    response = client.post('/api/study_sessions',
+                           data=json.dumps({'group_id': group_id, 'study_activity_id': 1}),
+                           content_type='application/json', headers=as_user(user_id))
+    assert response.status_code == 201
+    session_id = json.loads(response.data)['session_id']
+    response = client.post(f'/api/study_sessions/{session_id}/review',
+                           data=json.dumps({'reviews': reviews}),
+                           content_type='application/json', headers=as_user(user_id))
+    assert response.status_code == 200
+    return session_id
+
+
+def get(client, url, user_id):
+    """GET a URL as a user and return the decoded JSON body."""
+    response = client.get(url, headers=as_user(user_id))
+    assert response.status_code == 200, url
+    return json.loads(response.data)
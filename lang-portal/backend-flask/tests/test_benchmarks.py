@@ -0,0 +1,56 @@
+"""Smoke tests for the API benchmark harness."""
+import pytest
+
+from app import create_app
+from benchmarks.api import SCENARIOS, compare_to_baseline, percentiles, run_scenarios
+from benchmarks.dataset import DatasetSize, build_dataset, parse_size
+
+SIZE = DatasetSize(words=60, groups=3, sessions=12, reviews=240)
+
+
+class TestBenchmarkHarness:
+    """Test cases for benchmarks/api.py and benchmarks/dataset.py."""
+
+    def test_every_endpoint_has_a_scenario(self, tmp_path):
+        """Each API route is exercised by at least one scenario."""
+        app = create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'routes.db')})
+        try:
+            adapter = app.url_map.bind('localhost')
+            keys = {'word_id': 1, 'group_id': 1, 'session_id': 1, 'open_session_id': 1,
+                    'activity_id': 1, 'last_words_page': 1, 'member_ids': [1]}
+            covered = set()
+            for scenario in SCENARIOS:
+                path = scenario.path(keys) if callable(scenario.path) else scenario.path.format(**keys)
+                covered.add(adapter.match(path.split('?')[0], method=scenario.method)[0])
+            endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint != 'static'}
+            assert endpoints - covered == set()
+        finally:
+            app.db.dispose()
+
+    def test_scenarios_run_against_a_generated_dataset(self, tmp_path):
+        """All scenarios succeed on a small synthetic dataset."""
+        database = str(tmp_path / 'bench.db')
+        build_dataset(database, SIZE, seed=1, log=None)
+        results = run_scenarios(database, SIZE, iterations=2, log=None)
+        assert set(results) == {scenario.name for scenario in SCENARIOS}
+        assert all(summary['n'] >= 1 for summary in results.values())
+
+    def test_regression_gate(self):
+        """Only results above baseline * (1 + tolerance) + slack fail."""
+        baseline = {'small': {'scenarios': {
+            'words_list': percentiles([10.0, 10.0]), 'groups_list': percentiles([10.0, 10.0])
+        }}}
+        results = {'small': {'scenarios': {
+            'words_list': percentiles([14.0, 14.0]),
+            'groups_list': percentiles([40.0, 40.0]),
+            'new_scenario': percentiles([99.0]),
+        }}}
+        regressions = compare_to_baseline(results, baseline, tolerance=0.5, slack_ms=1.0)
+        assert [(size, scenario) for size, scenario, _, _ in regressions] == [('small', 'groups_list')]
+
+    def test_dataset_sizes(self):
+        """Presets and explicit sizes are accepted."""
+        assert parse_size('small')[1].reviews == 50_000
+        assert parse_size('words=10,groups=2,sessions=3,reviews=40')[1] == DatasetSize(10, 2, 3, 40)
+        with pytest.raises(ValueError):
+            parse_size('huge')
@@ -0,0 +1,204 @@
+"""Tests for the in-process response cache."""
+import gzip
+import json
+import time
+import pytest
+from flask import Flask, jsonify
+
+from lib.cache import ResponseCache
+from lib.data_version import bump_versions
+
+
+@pytest.fixture
+def cache_app():
+    """Minimal app with cached views counting how often they run."""
+    app = Flask(__name__)
+    cache = ResponseCache(max_entries=2, default_ttl=60)
+    calls = []
+
+    @app.route('/items/<int:id>')
+    @cache.cached('items')
+    def get_item(id):
+        calls.append(id)
+        return jsonify({'id': id, 'calls': len(calls)})
+
+    @app.route('/short')
+    @cache.cached('items', ttl=0.01)
+    def get_short():
+        calls.append('short')
+        return jsonify({'calls': len(calls)})
+
+    @app.route('/missing')
+    @cache.cached('items')
+    def get_missing():
+        calls.append('missing')
+        return jsonify({'error': 'not found'}), 404
+
+    app.cache = cache
+    app.calls = calls
+    return app
+
+
+class TestResponseCache:
+    """Test cases for lib.cache.ResponseCache."""
+
+    def test_hit_returns_stored_response(self, cache_app):
+        client = cache_app.test_client()
+        first = client.get('/items/1?b=2&a=1')
+        second = client.get('/items/1?a=1&b=2')  # Query args are normalized
+        assert first.data == second.data
+        assert second.mimetype == 'application/json'
+        assert cache_app.calls == [1]
+        assert cache_app.cache.stats()['hits'] == 1
+
+    def test_lru_eviction(self, cache_app):
+        client = cache_app.test_client()
+        client.get('/items/1')
+        client.get('/items/2')
+        client.get('/items/1')  # 1 is now most recently used
+        client.get('/items/3')  # evicts 2
+
+        client.get('/items/1')
+        client.get('/items/2')
+        assert cache_app.calls == [1, 2, 3, 2]
+        assert cache_app.cache.stats()['evictions'] >= 1
+
+    def test_ttl_expiration(self, cache_app):
+        client = cache_app.test_client()
+        client.get('/short')
+        time.sleep(0.02)
+        client.get('/short')
+        assert cache_app.calls == ['short', 'short']
+        assert cache_app.cache.stats()['expirations'] == 1
+
+    def test_invalidate_by_table(self, cache_app):
+        client = cache_app.test_client()
+        client.get('/items/1')
+        cache_app.cache.invalidate('other')
+        client.get('/items/1')
+        cache_app.cache.invalidate('items')
+        client.get('/items/1')
+        assert cache_app.calls == [1, 1]
+        assert cache_app.cache.stats()['invalidations'] == 1
+
+    def test_errors_are_not_cached(self, cache_app):
+        client = cache_app.test_client()
+        client.get('/missing')
+        client.get('/missing')
+        assert cache_app.calls == ['missing', 'missing']
+
+    def test_response_from_before_invalidation_is_not_stored(self, cache_app):
+        client = cache_app.test_client()
+
+        @cache_app.route('/racy')
+        @cache_app.cache.cached('items')
+        def get_racy():
+            cache_app.calls.append('racy')
+            cache_app.cache.invalidate('items')  # A write commits mid-request
+            return jsonify({})
+
+        client.get('/racy')
+        client.get('/racy')
+        assert cache_app.calls == ['racy', 'racy']
+
+
+class TestCachedRoutes:
+    """Test cases for the cached API routes."""
+
+    def test_review_invalidates_group_words_raw(self, app, client):
+        response = client.get('/api/groups/1/words/raw')
+        words = {w['id']: w for w in json.loads(response.data)['words']}
+        assert words[1]['correct_count'] == 5
+        client.get('/api/groups/1/words/raw')
+        assert app.payload_cache.stats()['hits'] == 1
+
+        response = client.post('/api/study_sessions',
+                               data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                               content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        client.post(f'/api/study_sessions/{session_id}/review',
+                    data=json.dumps({'reviews': [{'word_id': 1, 'is_correct': True}]}),
+                    content_type='application/json')
+
+        response = client.get('/api/groups/1/words/raw')
+        words = {w['id']: w for w in json.loads(response.data)['words']}
+        assert words[1]['correct_count'] == 6
+
+    def test_write_from_another_process_is_seen(self, app, client):
+        response = client.get('/api/groups')
+        etag = response.headers['ETag']
+        assert len(json.loads(response.data)['groups']) == 3
+
+        # Written as an invoke task or another worker would, without
+        # invalidating this process's cache
+        cursor = app.db.cursor()
+        cursor.execute("INSERT INTO groups (name) VALUES ('Neu')")
+        bump_versions(cursor, 'groups')
+        app.db.commit()
+
+        response = client.get('/api/groups')
+        assert len(json.loads(response.data)['groups']) == 4
+        assert response.headers['ETag'] != etag
+        assert app.cache.stats()['hits'] == 0
+
+    def test_cache_can_be_disabled(self, app, client):
+        app.cache.enabled = False
+        client.get('/api/groups')
+        client.get('/api/groups')
+        assert app.cache.stats()['hits'] == 0
+        assert app.cache.stats()['entries'] == 0
+
+
+class TestGroupWordsRawPayload:
+    """Test cases for the pre-serialized /words/raw payload."""
+
+    def test_payload_matches_word_data(self, app, client):
+        data = json.loads(client.get('/api/groups/1/words/raw').data)
+        assert data['group_id'] == 1
+        assert data['group_name'] == 'Test Verbs'
+        assert data['total_words'] == 2
+        assert [w['german'] for w in data['words']] == ['arbeiten', 'gehen']
+        assert data['words'][1] == {
+            'id': 1, 'german': 'gehen', 'pronunciation': 'ˈɡeːən', 'english': 'to go',
+            'gender': None, 'plural': None, 'parts': ['geh', 'en'],
+            'correct_count': 5, 'wrong_count': 2
+        }
+
+    def test_invalid_parts_become_null(self, app, client):
+        cursor = app.db.cursor()
+        cursor.execute("UPDATE words SET parts = 'not json' WHERE id = 1")
+        app.db.commit()
+
+        data = json.loads(client.get('/api/groups/1/words/raw').data)
+        assert {w['id']: w['parts'] for w in data['words']}[1] is None
+
+    def test_compressed_payload(self, app, client):
+        cursor = app.db.cursor()
+        for i in range(50):
+            cursor.execute(
+                "INSERT INTO words (german, pronunciation, english, parts) VALUES (?, 'vɔʁt', ?, '[\"Wort\"]')",
+                (f'Wort{i}', f'word {i}')
+            )
+            cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, 1)', (cursor.lastrowid,))
+        app.db.commit()
+
+        plain = client.get('/api/groups/1/words/raw')
+        assert 'Content-Encoding' not in plain.headers
+        assert 'Accept-Encoding' in plain.headers['Vary']
+
+        compressed = client.get('/api/groups/1/words/raw', headers={'Accept-Encoding': 'gzip'})
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(compressed.data) == plain.data
+        assert len(compressed.data) < len(plain.data)
+        assert app.payload_cache.stats()['hits'] == 1
+
+    def test_large_group_is_streamed(self, app, client):
+        app.config['RAW_PAYLOAD_CACHE_MAX_WORDS'] = 1
+
+        response = client.get('/api/groups/1/words/raw')
+        assert response.is_streamed
+        assert len(json.loads(response.data)['words']) == 2
+        assert app.payload_cache.stats()['entries'] == 0
+
+    def test_unknown_group(self, client):
+        assert client.get('/api/groups/999/words/raw').status_code == 404
@@ -0,0 +1,72 @@
+"""Tests for ETag / If-None-Match support on read endpoints."""
+import json
+import pytest
+
+
+def submit_review(client, word_id=1):
+    response = client.post('/api/study_sessions',
+                           data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                           content_type='application/json')
+    session_id = json.loads(response.data)['session_id']
+    client.post(f'/api/study_sessions/{session_id}/review',
+                data=json.dumps({'reviews': [{'word_id': word_id, 'is_correct': True}]}),
+                content_type='application/json')
+
+
+class TestConditionalGet:
+    """Test cases for data-version based ETags."""
+    
+    @pytest.mark.parametrize('endpoint', [
+        '/api/words',
+        '/api/groups',
+        '/api/groups/1/words',
+        '/api/groups/1/words/raw',
+        '/api/study-activities',
+    ])
+    def test_matching_etag_returns_304(self, client, endpoint):
+        """Test that a repeated request with If-None-Match is answered with 304."""
+        response = client.get(endpoint)
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert etag
+        
+        response = client.get(endpoint, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+    
+    def test_etag_differs_per_query(self, client):
+        """Test that different pages of a listing get different ETags."""
+        first = client.get('/api/words?sort_by=german').headers['ETag']
+        second = client.get('/api/words?sort_by=english').headers['ETag']
+        assert first != second
+    
+    def test_review_invalidates_dependent_etags(self, client):
+        """Test that writes only change the ETags of endpoints reading the written tables."""
+        words_etag = client.get('/api/words').headers['ETag']
+        groups_etag = client.get('/api/groups').headers['ETag']
+        
+        submit_review(client)
+        
+        response = client.get('/api/words', headers={'If-None-Match': words_etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != words_etag
+        
+        response = client.get('/api/groups', headers={'If-None-Match': groups_etag})
+        assert response.status_code == 304
+    
+    def test_reset_invalidates_etags(self, client):
+        """Test that clearing the study history bumps the review version."""
+        submit_review(client)
+        etag = client.get('/api/groups/1/words/raw').headers['ETag']
+        
+        client.post('/api/study-sessions/reset')
+        
+        response = client.get('/api/groups/1/words/raw', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+    
+    def test_not_found_has_no_etag(self, client):
+        """Test that error responses are not tagged."""
+        response = client.get('/api/groups/999/words/raw')
+        assert response.status_code == 404
+        assert 'ETag' not in response.headers
@@ -156,4 +156,57 @@ class TestDashboardAPI:
         assert data['total_sessions'] == 3
         assert data['total_words_studied'] == 1  # Only 1 word studied (word_id=1)
         # 2 correct out of 3 reviews (as decimal)
-        assert abs(data['success_rate'] - 0.6667) < 0.01
\ No newline at end of file
+        assert abs(data['success_rate'] - 0.6667) < 0.01
+    
+    def test_dashboard_stats_match_rebuild(self, app, client):
+        """Incrementally maintained stats equal a rebuild from history."""
+        from lib.stats import rebuild_learning_stats
+        
+        for i in range(4):
+            response = client.post('/api/study_sessions',
+                                 data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                                 content_type='application/json')
+            session_id = json.loads(response.data)['session_id']
+            
+            # Word 1 becomes mastered, word 4 stays below the success threshold
+            reviews = [{'word_id': 1, 'is_correct': True}, {'word_id': 1, 'is_correct': i != 0}]
+            reviews.append({'word_id': 4, 'is_correct': i % 2 == 0})
+            client.post(f'/api/study_sessions/{session_id}/review',
+                      data=json.dumps({'reviews': reviews}),
+                      content_type='application/json')
+        
+        incremental = json.loads(client.get('/api/dashboard/stats').data)
+        assert incremental['total_sessions'] == 4
+        assert incremental['total_words_studied'] == 2
+        assert incremental['mastered_words'] == 1
+        assert incremental['current_streak'] == 1
+        
+        # The test request context already holds the writer connection
+        cursor = app.db.cursor()
+        session_query = 'SELECT id, last_review_at, review_count, correct_count FROM study_sessions ORDER BY id'
+        sessions = [tuple(row) for row in cursor.execute(session_query).fetchall()]
+        cursor.execute('UPDATE study_sessions SET review_count = 0, last_review_at = NULL WHERE id = ?', (session_id,))
+        rebuild_learning_stats(cursor)
+        app.db.commit()
+        
+        rebuilt = json.loads(client.get('/api/dashboard/stats').data)
+        assert rebuilt == incremental
+        assert [tuple(row) for row in cursor.execute(session_query).fetchall()] == sessions
+    
+    def test_dashboard_stats_cleared_by_reset(self, client):
+        """Resetting the study history zeroes the maintained stats."""
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        client.post(f'/api/study_sessions/{session_id}/review',
+                  data=json.dumps({'reviews': [{'word_id': 1, 'is_correct': True}]}),
+                  content_type='application/json')
+        
+        client.post('/api/study-sessions/reset')
+        
+        data = json.loads(client.get('/api/dashboard/stats').data)
+        assert data['total_sessions'] == 0
+        assert data['total_words_studied'] == 0
+        assert data['success_rate'] == 0
+        assert data['current_streak'] == 0
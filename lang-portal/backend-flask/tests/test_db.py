@@ -0,0 +1,52 @@
+"""Tests for database connection configuration."""
+import sqlite3
+import pytest
+
+
+class TestDbConnections:
+    """Test cases for lib.db.Db connection handling."""
+
+    def test_connections_use_wal(self, app):
+        """Connections are configured with the tuned PRAGMAs."""
+        with app.app_context():
+            cursor = app.db.cursor(readonly=True)
+            assert cursor.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            assert cursor.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+            assert cursor.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+    def test_pragmas_are_configurable(self, app):
+        """DB_PRAGMAS overrides individual defaults."""
+        app.db.pragmas['busy_timeout'] = 250
+        connection = app.db.connect()
+        try:
+            assert connection.execute('PRAGMA busy_timeout').fetchone()[0] == 250
+        finally:
+            connection.close()
+
+    def test_read_connection_rejects_writes(self, app):
+        """Read-only handlers cannot modify the database."""
+        with app.app_context():
+            cursor = app.db.cursor(readonly=True)
+            with pytest.raises(sqlite3.OperationalError):
+                cursor.execute("DELETE FROM words")
+
+    def test_reads_after_write_use_the_writer(self, app):
+        """Within one context, reads see the request's own uncommitted writes."""
+        with app.app_context():
+            writer = app.db.cursor()
+            writer.execute("INSERT INTO groups (name) VALUES ('Uncommitted')")
+
+            reader = app.db.cursor(readonly=True)
+            reader.execute("SELECT COUNT(*) FROM groups WHERE name = 'Uncommitted'")
+            assert reader.fetchone()[0] == 1
+
+    def test_readers_see_committed_writes(self, app):
+        """A separate read connection sees data committed by the writer."""
+        with app.app_context():
+            app.db.cursor().execute("INSERT INTO groups (name) VALUES ('Committed')")
+            app.db.commit()
+
+        with app.app_context():
+            cursor = app.db.cursor(readonly=True)
+            cursor.execute("SELECT COUNT(*) FROM groups WHERE name = 'Committed'")
+            assert cursor.fetchone()[0] == 1
@@ -172,4 +172,76 @@ class TestGroupsAPI:
         
         data = json.loads(response.data)
         assert len(data['study_sessions']) == 0
-        assert data['total_pages'] == 0
\ No newline at end of file
+        assert data['total_pages'] == 0
+    
+    def test_get_group_study_sessions_end_time_and_sorting(self, client):
+        """Test stored end times and review counts in GET /api/groups/:id/study_sessions."""
+        session_ids = []
+        for reviews_count in [3, 1]:
+            response = client.post('/api/study_sessions',
+                                 data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                                 content_type='application/json')
+            session_id = json.loads(response.data)['session_id']
+            session_ids.append(session_id)
+            reviews = [{'word_id': 1, 'is_correct': True}] * reviews_count
+            response = client.post(f'/api/study_sessions/{session_id}/review',
+                                 data=json.dumps({'reviews': reviews}),
+                                 content_type='application/json')
+            assert response.status_code == 200
+        
+        # A session without reviews ends when it started
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_ids.append(json.loads(response.data)['session_id'])
+        
+        response = client.get('/api/groups/1/study_sessions?sort_by=reviewItemsCount&order=desc')
+        assert response.status_code == 200
+        sessions = json.loads(response.data)['study_sessions']
+        assert [s['id'] for s in sessions] == session_ids
+        assert [s['review_items_count'] for s in sessions] == [3, 1, 0]
+        assert sessions[0]['end_time'] >= sessions[0]['start_time']
+        
+        assert sessions[2]['end_time'] == sessions[2]['start_time']
+        
+        response = client.get('/api/groups/1/study_sessions?sort_by=endTime&order=asc')
+        assert [s['id'] for s in json.loads(response.data)['study_sessions']] == session_ids
+    
+    def test_get_group_study_sessions_invalid_order(self, client):
+        """Test GET /api/groups/:id/study_sessions falls back to newest first."""
+        response = client.get('/api/groups/1/study_sessions?order=sideways')
+        assert response.status_code == 200
+        assert response.data == client.get('/api/groups/1/study_sessions').data
+    
+    def test_get_group_words_cursor_pagination(self, app, client):
+        """Test GET /api/groups/:id/words walking every page with next_cursor."""
+        with app.app_context():
+            cursor = app.db.cursor()
+            for i in range(25):
+                cursor.execute(
+                    "INSERT INTO words (german, pronunciation, english, parts) VALUES (?, 'vɔʁt', ?, '[]')",
+                    (f'Wort{i % 7}', f'word {i}')
+                )
+                cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, 1)', (cursor.lastrowid,))
+            app.db.commit()
+        
+        seen = []
+        url = '/api/groups/1/words?sort_by=german&order=desc&cursor='
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            assert len(data['words']) <= 10
+            seen.extend(data['words'])
+            url = data['next_cursor'] and f'/api/groups/1/words?sort_by=german&order=desc&cursor={data["next_cursor"]}'
+        
+        assert len(seen) == 27  # 2 fixture verbs + 25 new words
+        assert len({w['id'] for w in seen}) == 27
+        keys = [(w['german'], w['id']) for w in seen]
+        assert keys == sorted(keys, reverse=True)
+        
+        # A cursor from one sort order is rejected for another
+        response = client.get('/api/groups/1/words?sort_by=german&order=desc&cursor=')
+        next_cursor = json.loads(response.data)['next_cursor']
+        response = client.get(f'/api/groups/1/words?sort_by=english&cursor={next_cursor}')
+        assert response.status_code == 400
@@ -0,0 +1,111 @@
+"""Tests for the bulk vocabulary importer."""
+import io
+import json
+import pytest
+
+from lib.data_version import get_versions
+from lib.importer import import_words, iter_json_array_file, iter_records
+from tests.fixtures import word
+
+
+class TestImportFormats:
+    """Test cases for reading JSON, NDJSON and CSV word lists."""
+
+    @pytest.mark.parametrize('read_size', [1, 7, 4096])
+    def test_json_array_is_streamed(self, read_size):
+        """Array elements are decoded whatever the read block size."""
+        records = [word('Baum', 'tree'), word('Straße', 'street', plural='Straßen')]
+        file = io.StringIO(json.dumps(records, ensure_ascii=False, indent=2))
+        assert list(iter_json_array_file(file, read_size)) == records
+
+    @pytest.mark.parametrize('text', ['{"german": "Baum"}', '[{"german": "Baum"} {}]', '[{"german": '])
+    def test_malformed_json_is_rejected(self, text):
+        """Input that is not a well-formed array raises ValueError."""
+        with pytest.raises(ValueError):
+            list(iter_json_array_file(io.StringIO(text), 4))
+
+    def test_ndjson_and_csv_files(self, tmp_path):
+        """NDJSON lines and CSV rows produce the same records."""
+        ndjson = tmp_path / 'words.ndjson'
+        ndjson.write_text('\n'.join(json.dumps(record) for record in [
+            word('Baum', 'tree'), word('Tisch', 'table')
+        ]) + '\n', encoding='utf-8')
+        csv_file = tmp_path / 'words.csv'
+        csv_file.write_text(
+            'german,pronunciation,english,parts,gender,plural\n'
+            'Baum,baum,tree,"[""Baum""]",der,Bäume\n'
+            'Tisch,tisch,table,"[""Tisch""]",,\n',
+            encoding='utf-8'
+        )
+
+        ndjson_records = list(iter_records(str(ndjson)))
+        csv_records = list(iter_records(str(csv_file)))
+        assert [record['german'] for record in ndjson_records] == ['Baum', 'Tisch']
+        assert [record['german'] for record in csv_records] == ['Baum', 'Tisch']
+        assert csv_records[0]['parts'] == ['Baum']
+        assert csv_records[0]['plural'] == 'Bäume'
+
+
+class TestImportWords:
+    """Test cases for lib.importer.import_words."""
+
+    def test_import_creates_group_and_words(self, app):
+        """New words are inserted and linked to a new group with its count."""
+        with app.app_context():
+            before = get_versions(app.db.cursor(), ('words', 'groups', 'word_groups'))
+            result = import_words(app.db.get(), [
+                word('Baum', 'tree', gender='der'), word('Tisch', 'table'), word('Stuhl', 'chair')
+            ], group_name='Furniture', batch_size=2)
+
+            assert (result.records, result.words_added, result.links_added) == (3, 3, 3)
+            assert result.groups == ['Furniture']
+
+            cursor = app.db.cursor()
+            cursor.execute("SELECT words_count FROM groups WHERE name = 'Furniture'")
+            assert cursor.fetchone()[0] == 3
+            cursor.execute("SELECT parts, gender FROM words WHERE german = 'Baum'")
+            row = cursor.fetchone()
+            assert json.loads(row['parts']) == ['Baum']
+            assert row['gender'] == 'der'
+
+            after = get_versions(cursor, ('words', 'groups', 'word_groups'))
+            assert all(after[table] > before[table] for table in after)
+
+    def test_words_are_deduplicated_across_groups(self, app):
+        """A word listed in several groups is stored once and linked to each."""
+        with app.app_context():
+            result = import_words(app.db.get(), [
+                word('Baum', 'tree', group='Nature'),
+                word('Baum', 'tree', group='Garden'),
+                word('Baum', 'tree', group='Nature'),
+                word('gehen', 'to go', group='Nature'),  # Already in the fixture
+            ], batch_size=1)
+
+            assert result.words_added == 1
+            assert result.links_added == 3
+            cursor = app.db.cursor()
+            cursor.execute("SELECT COUNT(*) FROM words WHERE german IN ('Baum', 'gehen')")
+            assert cursor.fetchone()[0] == 2
+            cursor.execute("SELECT name, words_count FROM groups WHERE name IN ('Nature', 'Garden') ORDER BY name")
+            assert [tuple(row) for row in cursor.fetchall()] == [('Garden', 1), ('Nature', 2)]
+
+    def test_existing_group_keeps_its_words(self, app):
+        """Importing into an existing group adds to it and recounts it."""
+        with app.app_context():
+            import_words(app.db.get(), [word('laufen', 'to run')], group_name='Test Verbs')
+            cursor = app.db.cursor()
+            cursor.execute("SELECT words_count FROM groups WHERE name = 'Test Verbs'")
+            assert cursor.fetchone()[0] == 3
+
+    def test_missing_field_is_reported(self, app):
+        """A record without a required field aborts with its position."""
+        with app.app_context():
+            with pytest.raises(ValueError, match="Record 2: missing required field 'english'"):
+                import_words(app.db.get(), [word('Baum', 'tree'), {'german': 'Tisch', 'pronunciation': 'tisch'}],
+                             group_name='Furniture')
+
+    def test_record_without_group_is_rejected(self, app):
+        """Records need a group field or a default group."""
+        with app.app_context():
+            with pytest.raises(ValueError, match='no group given'):
+                import_words(app.db.get(), [word('Baum', 'tree')])
@@ -0,0 +1,117 @@
+"""Tests asserting that route queries are served from indexes."""
+import json
+import re
+import pytest
+
+from lib.pool import ConnectionPool
+
+
+# Tables that grow with study history, vocabulary size or the number of
+# users and must never be read with a full table scan on a request path
+INDEXED_TABLES = ('word_groups', 'word_review_items', 'study_sessions', 'word_reviews', 'learning_stats')
+
+READ_ENDPOINTS = [
+    '/api/words',
+    '/api/words/1',
+    '/api/groups/1/words',
+    '/api/groups/1/words/raw',
+    '/api/groups/1/due',
+    '/api/groups/1/study_sessions',
+    '/api/groups/1/study_sessions?sort_by=endTime',
+    '/api/groups/1/study_sessions?sort_by=reviewItemsCount&order=asc',
+    '/api/study-sessions',
+    '/api/study-sessions?sort_by=duration&min_accuracy=0.5',
+    '/api/study-sessions?sort_by=accuracy&max_duration=600',
+    '/api/study-activities/1/sessions?sort_by=accuracy',
+    '/api/groups/1/study_sessions?sort_by=duration&order=asc',
+    '/api/study-sessions/1',
+    '/api/study-activities/1/sessions',
+    '/api/dashboard/recent-session',
+    '/api/dashboard/stats',
+]
+
+
+def table_aliases(sql):
+    """Return the names the indexed tables are referred to by in a query."""
+    names = set()
+    for table in INDEXED_TABLES:
+        for match in re.finditer(rf'\b{table}\b(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+            names.add(table)
+            alias = match.group(1)
+            if alias and alias.upper() not in ('WHERE', 'JOIN', 'LEFT', 'ON', 'GROUP', 'ORDER', 'LIMIT', 'SET', 'VALUES'):
+                names.add(alias)
+    return names
+
+
+def full_scans(connection, sql):
+    """Return the query plan steps that scan an indexed table without an index."""
+    plan = [row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + sql)]
+    # Subqueries materialized from an index scan show up as "SCAN <alias>"
+    derived = {step.split()[1] for step in plan if step.startswith(('MATERIALIZE', 'CO-ROUTINE'))}
+    names = table_aliases(sql) - derived
+    return [
+        step for step in plan
+        if step.startswith('SCAN ') and step.split()[1] in names and 'INDEX' not in step
+    ]
+
+
+@pytest.fixture
+def traced_app(app):
+    """App whose connections record every statement they execute."""
+    statements = []
+    connect = app.db.connect
+
+    def traced_connect(readonly=False):
+        connection = connect(readonly=readonly)
+        connection.set_trace_callback(statements.append)
+        return connection
+
+    app.db.dispose()
+    app.db.pool = ConnectionPool(traced_connect, max_size=1)
+    app.db.read_pool = ConnectionPool(lambda: traced_connect(readonly=True))
+    app.statements = statements
+    return app
+
+
+class TestQueryPlans:
+    """Every query issued by the read endpoints uses an index."""
+
+    def test_route_queries_use_indexes(self, traced_app):
+        client = traced_app.test_client()
+        response = client.post('/api/study_sessions',
+                               data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                               content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        client.post(f'/api/study_sessions/{session_id}/review',
+                    data=json.dumps({'reviews': [{'word_id': 1, 'is_correct': True}]}),
+                    content_type='application/json')
+
+        for endpoint in READ_ENDPOINTS:
+            assert client.get(endpoint).status_code == 200, endpoint
+
+        connection = traced_app.db.connect()
+        try:
+            queries = {
+                sql for sql in traced_app.statements
+                if sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+            }
+            assert queries
+            for sql in queries:
+                assert full_scans(connection, sql) == [], sql
+        finally:
+            connection.close()
+
+    def test_word_groups_links_are_unique(self, app):
+        """The same word cannot be linked to a group twice."""
+        with app.app_context():
+            cursor = app.db.cursor()
+            with pytest.raises(Exception, match='UNIQUE constraint failed'):
+                cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (1, 1)')
+
+    def test_migrations_are_recorded(self, app):
+        """The schema version matches the newest migration after setup."""
+        with app.app_context():
+            cursor = app.db.cursor()
+            latest_version = app.db.migrations()[-1][0]
+            assert cursor.execute('PRAGMA user_version').fetchone()[0] == latest_version
+            assert app.db.migrate(cursor) == []
@@ -0,0 +1,85 @@
+"""Tests for the streaming JSON writer."""
+import json
+import sqlite3
+import pytest
+
+from lib.json_stream import iter_json_array, iter_json_document, row_encoder
+
+
+@pytest.fixture
+def cursor():
+    connection = sqlite3.connect(':memory:')
+    connection.row_factory = sqlite3.Row
+    connection.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, data TEXT)')
+    connection.executemany(
+        'INSERT INTO items (name, data) VALUES (?, ?)',
+        [(f'Ä{i}"', json.dumps({'n': i})) for i in range(7)]
+    )
+    yield connection.cursor()
+    connection.close()
+
+
+class TestJsonStream:
+    """Test cases for lib.json_stream."""
+
+    @pytest.mark.parametrize('batch_size', [1, 3, 7, 100])
+    def test_array_round_trips(self, cursor, batch_size):
+        cursor.execute('SELECT id, name FROM items ORDER BY id')
+        chunks = list(iter_json_array(cursor, batch_size=batch_size))
+        assert json.loads(b''.join(chunks)) == [{'id': i + 1, 'name': f'Ä{i}"'} for i in range(7)]
+        # Opening and closing bracket plus one chunk per batch
+        assert len(chunks) == 2 + -(-7 // batch_size)
+
+    def test_empty_array(self, cursor):
+        cursor.execute('SELECT id FROM items WHERE id < 0')
+        assert b''.join(iter_json_array(cursor)) == b'[]'
+
+    def test_document_with_raw_columns(self, cursor):
+        cursor.execute("SELECT id, CASE WHEN id > 1 THEN data END AS data FROM items ORDER BY id LIMIT 3")
+        body = b''.join(iter_json_document(
+            {'total': 3, 'label': 'ü'}, 'items', cursor, row_encoder(raw_columns=('data',))
+        ))
+        assert json.loads(body) == {
+            'total': 3, 'label': 'ü',
+            'items': [{'id': 1, 'data': None}, {'id': 2, 'data': {'n': 1}}, {'id': 3, 'data': {'n': 2}}]
+        }
+
+    def test_rows_are_fetched_lazily(self, cursor):
+        """Test that only one batch is pulled from the cursor per chunk."""
+        fetched = []
+
+        class CountingCursor:
+            def fetchmany(self, size):
+                rows = cursor.fetchmany(size)
+                fetched.append(len(rows))
+                return rows
+
+        cursor.execute('SELECT id FROM items')
+        chunks = iter_json_array(CountingCursor(), batch_size=2)
+        next(chunks)
+        assert fetched == []
+        next(chunks)
+        assert fetched == [2]
+        list(chunks)
+        assert fetched == [2, 2, 2, 1, 0]
+
+    def test_export_words_endpoint(self, client):
+        response = client.get('/api/words/export')
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.headers['ETag']
+
+        data = json.loads(response.data)
+        assert data['total_words'] == 5
+        assert [w['id'] for w in data['words']] == [1, 2, 3, 4, 5]
+        assert data['words'][0] == {
+            'id': 1, 'german': 'gehen', 'pronunciation': 'ˈɡeːən', 'english': 'to go',
+            'gender': None, 'plural': None, 'parts': ['geh', 'en'],
+            'correct_count': 5, 'wrong_count': 2
+        }
+
+    def test_group_words_raw_streams_without_cache(self, app, client):
+        app.payload_cache.enabled = False
+        response = client.get('/api/groups/2/words/raw')
+        assert response.is_streamed
+        assert [w['german'] for w in json.loads(response.data)['words']] == ['Haus', 'Katze']
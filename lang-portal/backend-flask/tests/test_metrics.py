@@ -0,0 +1,78 @@
+"""Tests for request and SQL instrumentation."""
+import logging
+import sqlite3
+
+from app import create_app
+from lib.metrics import MetricsRegistry, TracedCursor
+
+
+class TestTracedCursor:
+    """Test cases for lib.metrics.TracedCursor."""
+
+    def test_statements_are_timed_with_their_rows(self, app):
+        """Each statement is reported once with the rows fetched from it."""
+        metrics = MetricsRegistry(slow_query_ms=None)
+        connection = sqlite3.connect(':memory:')
+        try:
+            cursor = TracedCursor(connection.cursor(), metrics)
+            cursor.execute('CREATE TABLE t (x)')
+            cursor.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(10)])
+            cursor.execute('SELECT x FROM t')
+            assert cursor.fetchone() == (0,)
+            assert len(cursor.fetchmany(3)) == 3
+            assert len(list(cursor)) == 6
+            cursor.execute('SELECT COUNT(*) FROM t').fetchall()
+            cursor.finish()
+        finally:
+            connection.close()
+
+        assert metrics.query_duration.snapshot('none')[2] == 4
+        assert metrics.rows_returned.value('none') == 11
+
+
+class TestRequestMetrics:
+    """Test cases for the per-request instrumentation."""
+
+    def test_server_timing_header(self, client):
+        """Responses report their query count and database time."""
+        response = client.get('/api/words')
+        assert response.status_code == 200
+        timing = response.headers['Server-Timing']
+        assert timing.startswith('db;dur=')
+        assert 'total;dur=' in timing
+        assert ' queries, ' in timing
+
+    def test_metrics_endpoint_exposes_histograms(self, app, client):
+        """Histograms are labelled with the route template."""
+        client.get('/api/words/1')
+        client.get('/api/words/2')
+        response = client.get('/api/_metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain; version=0.0.4')
+
+        body = response.get_data(as_text=True)
+        assert '# TYPE http_request_duration_seconds histogram' in body
+        assert 'http_request_duration_seconds_count{method="GET",endpoint="/api/words/<int:word_id>",status="200"} 2' in body
+        assert 'db_query_duration_seconds_bucket{endpoint="/api/words/<int:word_id>",le="+Inf"}' in body
+        assert 'db_pool_checkouts_total{pool="read"}' in body
+        assert 'cache_hits_total{cache="response"}' in body
+
+    def test_slow_queries_are_logged_with_plan(self, app, client, caplog):
+        """Statements over the threshold are logged with EXPLAIN QUERY PLAN."""
+        app.metrics.slow_query_seconds = 0
+        with caplog.at_level(logging.WARNING, logger='lib.metrics.slow_queries'):
+            client.get('/api/groups/1/words')
+
+        messages = [record.getMessage() for record in caplog.records]
+        assert any('/api/groups/<int:id>/words' in message and 'plan: ' in message for message in messages)
+        assert app.metrics.slow_queries.value('/api/groups/<int:id>/words') > 0
+
+    def test_metrics_can_be_disabled(self, tmp_path):
+        """Without METRICS_ENABLED cursors are not wrapped and there is no endpoint."""
+        app = create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'test.db'), 'METRICS_ENABLED': False})
+        try:
+            with app.app_context():
+                assert isinstance(app.db.cursor(), sqlite3.Cursor)
+            assert app.test_client().get('/api/_metrics').status_code == 404
+        finally:
+            app.db.dispose()
@@ -0,0 +1,142 @@
+"""Tests for the versioned migration runner."""
+import sqlite3
+import pytest
+
+from lib.migrations import MigrationError, load_migrations, migrate, plan, split_statements
+
+
+@pytest.fixture
+def migrations_dir(tmp_path):
+    directory = tmp_path / 'migrations'
+    directory.mkdir()
+    (directory / '0001_create_notes.sql').write_text(
+        'CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT);\n'
+        "INSERT INTO notes (body) VALUES ('first');\n"
+    )
+    (directory / '0002_add_note_author.sql').write_text(
+        'ALTER TABLE notes ADD COLUMN author TEXT;\n'
+    )
+    return directory
+
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = sqlite3.connect(str(tmp_path / 'test.db'))
+    yield connection
+    connection.close()
+
+
+def applied_versions(connection):
+    return [row[0] for row in connection.execute('SELECT version FROM schema_migrations ORDER BY version')]
+
+
+class TestMigrate:
+    """Test cases for lib.migrations.migrate."""
+
+    def test_only_pending_migrations_are_applied(self, connection, migrations_dir):
+        """Applied migrations are recorded and not run again."""
+        results = migrate(connection, str(migrations_dir))
+        assert [migration.version for migration, _ in results] == [1, 2]
+        assert all(seconds >= 0 for _, seconds in results)
+        assert applied_versions(connection) == [1, 2]
+        assert connection.execute('PRAGMA user_version').fetchone()[0] == 2
+
+        (migrations_dir / '0003_add_note_index.sql').write_text('CREATE INDEX idx_notes_author ON notes(author);\n')
+        assert [m.version for m, _ in migrate(connection, str(migrations_dir))] == [3]
+        assert migrate(connection, str(migrations_dir)) == []
+        assert connection.execute('SELECT COUNT(*) FROM notes').fetchone()[0] == 1
+
+    def test_failed_migration_is_rolled_back(self, connection, migrations_dir):
+        """A failing migration leaves no trace and is reported."""
+        (migrations_dir / '0003_broken.sql').write_text(
+            'CREATE TABLE tags (name TEXT);\n'
+            'INSERT INTO missing_table VALUES (1);\n'
+        )
+        with pytest.raises(MigrationError, match='0003_broken.sql'):
+            migrate(connection, str(migrations_dir))
+
+        assert applied_versions(connection) == [1, 2]
+        assert connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'tags'"
+        ).fetchone()[0] == 0
+
+    def test_dry_run_does_not_write(self, connection, migrations_dir):
+        """A dry run lists the pending migrations and changes nothing."""
+        results = migrate(connection, str(migrations_dir), dry_run=True)
+        assert [(migration.filename, seconds) for migration, seconds in results] == [
+            ('0001_create_notes.sql', None), ('0002_add_note_author.sql', None)
+        ]
+        assert connection.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0] == 0
+
+    def test_user_version_is_adopted(self, connection, migrations_dir):
+        """Databases migrated by user_version only get the newer migrations."""
+        connection.executescript((migrations_dir / '0001_create_notes.sql').read_text())
+        connection.execute('PRAGMA user_version = 1')
+
+        assert plan(connection, load_migrations(str(migrations_dir))).current_version == 1
+        assert [m.version for m, _ in migrate(connection, str(migrations_dir))] == [2]
+        rows = connection.execute('SELECT version, duration_ms FROM schema_migrations ORDER BY version').fetchall()
+        assert rows[0] == (1, None)
+        assert rows[1][1] is not None
+
+    def test_modified_migrations_are_reported(self, connection, migrations_dir):
+        """Editing an applied migration shows up in the plan."""
+        migrate(connection, str(migrations_dir))
+        (migrations_dir / '0002_add_note_author.sql').write_text('ALTER TABLE notes ADD COLUMN editor TEXT;\n')
+        migration_plan = plan(connection, load_migrations(str(migrations_dir)))
+        assert migration_plan.pending == []
+        assert [m.version for m in migration_plan.modified] == [2]
+
+
+class TestOnlineMigrations:
+    """Test cases for migrations applied one statement per transaction."""
+
+    def test_online_migration_is_applied_and_resumable(self, connection, migrations_dir):
+        """Finished statements are kept when a later one fails."""
+        (migrations_dir / '0003_index_notes.sql').write_text(
+            '-- migrate: online\n'
+            'CREATE INDEX IF NOT EXISTS idx_notes_body ON notes(body);\n'
+            'CREATE INDEX IF NOT EXISTS idx_notes_missing ON notes(missing);\n'
+        )
+        migrations = load_migrations(str(migrations_dir))
+        assert [m.online for m in migrations] == [False, False, True]
+
+        with pytest.raises(MigrationError):
+            migrate(connection, str(migrations_dir))
+        assert applied_versions(connection) == [1, 2]
+        assert connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_notes_body'"
+        ).fetchone()[0] == 1
+
+        (migrations_dir / '0003_index_notes.sql').write_text(
+            '-- migrate: online\n'
+            'CREATE INDEX IF NOT EXISTS idx_notes_body ON notes(body);\n'
+            'CREATE INDEX IF NOT EXISTS idx_notes_author ON notes(author);\n'
+        )
+        assert [m.version for m, _ in migrate(connection, str(migrations_dir))] == [3]
+
+    def test_statements_keep_trigger_bodies(self):
+        """Trigger bodies are not split at their inner semicolons."""
+        statements = split_statements(
+            '-- comment\n'
+            'CREATE TABLE a (x);\n'
+            'CREATE TRIGGER t AFTER INSERT ON a BEGIN\n'
+            '  UPDATE a SET x = 1;\n'
+            '  UPDATE a SET x = 2;\n'
+            'END;\n'
+        )
+        assert len(statements) == 2
+        assert statements[1].endswith('END;')
+
+
+class TestAppMigrations:
+    """Test cases for the migrations run through lib.db.Db."""
+
+    def test_app_schema_is_fully_migrated(self, app):
+        """Every migration in sql/migrations is recorded after setup."""
+        with app.app_context():
+            cursor = app.db.cursor()
+            assert [row[0] for row in cursor.execute('SELECT version FROM schema_migrations ORDER BY version')] == [
+                version for version, _ in app.db.migrations()
+            ]
+            assert app.db.migration_plan().pending == []
@@ -0,0 +1,86 @@
+"""Tests for the database connection pool."""
+import sqlite3
+import time
+import pytest
+
+from lib.pool import ConnectionPool, PoolTimeout
+
+
+def make_pool(**kwargs):
+    return ConnectionPool(lambda: sqlite3.connect(':memory:', check_same_thread=False), **kwargs)
+
+
+class TestConnectionPool:
+    """Test cases for lib.pool.ConnectionPool."""
+
+    def test_connections_are_reused(self):
+        """A returned connection is handed out again instead of reconnecting."""
+        pool = make_pool(max_size=2)
+        first = pool.checkout()
+        pool.checkin(first)
+        second = pool.checkout()
+        assert second is first
+
+        stats = pool.stats()
+        assert stats['size'] == 1
+        assert stats['checkouts'] == 2
+        assert stats['in_use'] == 1
+
+    def test_exhausted_pool_times_out(self):
+        """Checkout waits for a free connection and gives up after the timeout."""
+        pool = make_pool(max_size=1, timeout=0.05)
+        connection = pool.checkout()
+
+        with pytest.raises(PoolTimeout):
+            pool.checkout()
+
+        stats = pool.stats()
+        assert stats['waits'] == 1
+        assert stats['timeouts'] == 1
+
+        pool.checkin(connection)
+        assert pool.checkout() is connection
+
+    def test_idle_connections_are_evicted(self):
+        """Connections idle for longer than max_idle are closed on next checkout."""
+        pool = make_pool(max_size=2, max_idle=0.01)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        time.sleep(0.02)
+
+        assert pool.checkout() is not connection
+        assert pool.stats()['evictions'] == 1
+
+    def test_broken_connections_are_replaced(self):
+        """A connection failing its health check is discarded."""
+        pool = make_pool(max_size=1)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        connection.close()
+
+        replacement = pool.checkout()
+        assert replacement is not connection
+        assert pool.stats()['failed_health_checks'] == 1
+
+    def test_checkin_rolls_back_open_transaction(self):
+        """Uncommitted work does not leak into the next checkout."""
+        pool = make_pool(max_size=1)
+        connection = pool.checkout()
+        connection.execute('CREATE TABLE t (id INTEGER)')
+        connection.execute('INSERT INTO t VALUES (1)')
+        assert connection.in_transaction
+        pool.checkin(connection)
+
+        connection = pool.checkout()
+        assert not connection.in_transaction
+        assert connection.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+
+    def test_app_context_returns_connection(self, app):
+        """An app context checks a connection out and gives it back on teardown."""
+        in_use = app.db.pool_stats()['read']['in_use']
+
+        with app.app_context():
+            app.db.cursor(readonly=True).execute('SELECT COUNT(*) FROM words')
+            assert app.db.pool_stats()['read']['in_use'] == in_use + 1
+
+        assert app.db.pool_stats()['read']['in_use'] == in_use
@@ -0,0 +1,135 @@
+"""Tests for SM-2 review scheduling."""
+import json
+import pytest
+
+from lib.scheduler import NEW_STATE, MIN_EASE, MAX_INTERVAL_DAYS, next_state, rebuild_schedule
+
+
+class TestScheduler:
+    """Test cases for lib.scheduler."""
+    
+    def test_correct_answers_grow_interval(self):
+        """Test the 1, 6, interval * ease progression."""
+        state = next_state(NEW_STATE, True, '2025-01-01 12:00:00')
+        assert (state.interval_days, state.repetitions) == (1.0, 1)
+        assert state.due_at == '2025-01-02 12:00:00'
+        
+        state = next_state(state, True, '2025-01-02 12:00:00')
+        assert (state.interval_days, state.repetitions) == (6.0, 2)
+        assert state.due_at == '2025-01-08 12:00:00'
+        
+        state = next_state(state, True, '2025-01-08 12:00:00')
+        assert state.interval_days == round(6 * state.ease)
+        assert state.repetitions == 3
+        # Quality 4 keeps the ease factor unchanged
+        assert state.ease == pytest.approx(2.5)
+    
+    def test_interval_is_capped(self):
+        """Test that long runs of correct answers stay within date range."""
+        state = NEW_STATE
+        for _ in range(40):
+            state = next_state(state, True, '2025-01-01 12:00:00')
+        assert state.interval_days == MAX_INTERVAL_DAYS
+        assert state.due_at.startswith('2124-')
+    
+    def test_wrong_answer_resets_repetitions(self):
+        """Test that a lapse restarts the sequence and lowers the ease."""
+        state = NEW_STATE
+        for day in range(1, 4):
+            state = next_state(state, True, f'2025-01-0{day} 12:00:00')
+        
+        state = next_state(state, False, '2025-01-20 12:00:00')
+        assert state.repetitions == 0
+        assert state.interval_days == 1.0
+        assert state.due_at == '2025-01-21 12:00:00'
+        assert state.ease == pytest.approx(2.5 - 0.54)
+        
+        for _ in range(10):
+            state = next_state(state, False, '2025-01-21 12:00:00')
+        assert state.ease == MIN_EASE
+    
+    def test_due_words_endpoint(self, app, client):
+        """Test GET /api/groups/:id/due ordering due words before new ones."""
+        response = client.get('/api/groups/1/due')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [w['id'] for w in data['words']] == [1, 4]  # Group order of the fixture words
+        assert all(w['is_new'] for w in data['words'])
+        
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        response = client.post(f'/api/study_sessions/{session_id}/review',
+                             data=json.dumps({'reviews': [{'word_id': 1, 'is_correct': True}]}),
+                             content_type='application/json')
+        assert response.status_code == 200
+        
+        # Word 1 is scheduled for tomorrow, so only the new word is offered
+        data = json.loads(client.get('/api/groups/1/due').data)
+        assert [w['id'] for w in data['words']] == [4]
+        
+        # Once its due date has passed it comes before new words
+        cursor = app.db.cursor()
+        cursor.execute("UPDATE word_reviews SET due_at = '2000-01-01 00:00:00' WHERE word_id = 1")
+        app.db.commit()
+        data = json.loads(client.get('/api/groups/1/due?limit=1').data)
+        assert [w['id'] for w in data['words']] == [1]
+        assert data['words'][0]['is_new'] is False
+        assert data['words'][0]['repetitions'] == 1
+        
+        data = json.loads(client.get('/api/groups/1/due?include_new=false').data)
+        assert [w['id'] for w in data['words']] == [1]
+    
+    def test_due_words_endpoint_validation(self, client):
+        """Test GET /api/groups/:id/due with bad parameters."""
+        assert client.get('/api/groups/999/due').status_code == 404
+        assert client.get('/api/groups/1/due?limit=0').status_code == 400
+        assert client.get('/api/groups/1/due?limit=101').status_code == 400
+    
+    def test_repeated_answers_in_a_batch_are_one_review(self, app, client):
+        """Test that a word answered several times in one batch takes one step."""
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        client.post(f'/api/study_sessions/{session_id}/review',
+                    data=json.dumps({'reviews': [
+                        {'word_id': 1, 'is_correct': True}, {'word_id': 1, 'is_correct': True},
+                        {'word_id': 1, 'is_correct': True},
+                        {'word_id': 4, 'is_correct': True}, {'word_id': 4, 'is_correct': False},
+                    ]}),
+                    content_type='application/json')
+        
+        cursor = app.db.cursor()
+        query = '''
+            SELECT word_id, interval_days, repetitions, ease FROM word_reviews
+            WHERE word_id IN (1, 4) ORDER BY word_id
+        '''
+        incremental = [tuple(row) for row in cursor.execute(query).fetchall()]
+        assert incremental[0][1:] == (1.0, 1, pytest.approx(2.5))
+        assert incremental[1][1:] == (1.0, 0, pytest.approx(2.5 - 0.54))
+        
+        rebuild_schedule(cursor)
+        app.db.commit()
+        assert [tuple(row) for row in cursor.execute(query).fetchall()] == incremental
+    
+    def test_rebuild_schedule_replays_history(self, app, client, monkeypatch):
+        """Test that replaying the history reproduces the incremental schedule."""
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        for second, correct in enumerate([True, False, True]):
+            monkeypatch.setattr('lib.reviews.utc_now', lambda: f'2025-01-01 12:00:0{second}')
+            client.post(f'/api/study_sessions/{session_id}/review',
+                        data=json.dumps({'reviews': [{'word_id': 1, 'is_correct': correct}]}),
+                        content_type='application/json')
+        
+        cursor = app.db.cursor()
+        query = 'SELECT ease, interval_days, repetitions, due_at FROM word_reviews WHERE word_id = 1'
+        incremental = tuple(cursor.execute(query).fetchone())
+        
+        rebuild_schedule(cursor)
+        app.db.commit()
+        assert tuple(cursor.execute(query).fetchone()) == incremental
@@ -0,0 +1,128 @@
+"""Tests for idempotent, incremental seeding."""
+import json
+import pytest
+
+from lib.data_version import get_versions
+from lib.seed import seed_words, seed_study_activities
+from tests.fixtures import word
+
+
+@pytest.fixture
+def seed_file(tmp_path):
+    path = tmp_path / 'data_furniture.json'
+
+    def write(records):
+        path.write_text(json.dumps(records, ensure_ascii=False), encoding='utf-8')
+        return str(path)
+    return write
+
+
+class TestSeedWords:
+    """Test cases for lib.seed.seed_words."""
+
+    def test_reseeding_unchanged_file_is_skipped(self, app, seed_file):
+        """A second run over the same file writes nothing."""
+        path = seed_file([word('Tisch', 'table'), word('Stuhl', 'chair')])
+        with app.app_context():
+            first = seed_words(app.db.get(), path, 'Furniture')
+            assert (first.skipped, first.added) == (False, 2)
+
+            versions = get_versions(app.db.cursor(), ('words', 'groups', 'word_groups'))
+            second = seed_words(app.db.get(), path, 'Furniture')
+            assert second.skipped
+
+            cursor = app.db.cursor()
+            assert get_versions(cursor, ('words', 'groups', 'word_groups')) == versions
+            cursor.execute("SELECT COUNT(*) FROM words WHERE german IN ('Tisch', 'Stuhl')")
+            assert cursor.fetchone()[0] == 2
+            cursor.execute("SELECT COUNT(*), MAX(words_count) FROM groups WHERE name = 'Furniture'")
+            assert tuple(cursor.fetchone()) == (1, 2)
+
+    def test_changed_records_are_updated_in_place(self, app, seed_file):
+        """Only new and changed records are written; word IDs are kept."""
+        with app.app_context():
+            seed_words(app.db.get(), seed_file([word('Tisch', 'table'), word('Stuhl', 'chair')]), 'Furniture')
+            cursor = app.db.cursor()
+            cursor.execute("SELECT id FROM words WHERE german = 'Tisch'")
+            table_id = cursor.fetchone()[0]
+
+            result = seed_words(app.db.get(), seed_file([
+                word('Tisch', 'table', gender='der', plural='Tische'),
+                word('Stuhl', 'chair'),
+                word('Lampe', 'lamp'),
+            ]), 'Furniture')
+            assert (result.added, result.updated, result.unchanged) == (1, 1, 1)
+
+            cursor.execute("SELECT id, gender, plural FROM words WHERE german = 'Tisch'")
+            assert tuple(cursor.fetchone()) == (table_id, 'der', 'Tische')
+            cursor.execute("SELECT words_count FROM groups WHERE name = 'Furniture'")
+            assert cursor.fetchone()[0] == 3
+
+    def test_corrected_german_text_renames_the_word(self, app, seed_file):
+        """A typo fix keeps the word's ID instead of adding a new word."""
+        with app.app_context():
+            seed_words(app.db.get(), seed_file([word('Tish', 'table'), word('Stuhl', 'chair')]), 'Furniture')
+            cursor = app.db.cursor()
+            cursor.execute("SELECT id FROM words WHERE german = 'Tish'")
+            table_id = cursor.fetchone()[0]
+
+            result = seed_words(app.db.get(), seed_file([word('Tisch', 'table'), word('Stuhl', 'chair')]), 'Furniture')
+            assert (result.added, result.updated, result.unchanged) == (0, 1, 1)
+
+            cursor.execute("SELECT id FROM words WHERE german IN ('Tish', 'Tisch')")
+            assert [row[0] for row in cursor.fetchall()] == [table_id]
+            cursor.execute("SELECT words_count FROM groups WHERE name = 'Furniture'")
+            assert cursor.fetchone()[0] == 2
+
+    def test_change_into_an_existing_word_links_it(self, app, seed_file):
+        """A change matching another word's text does not duplicate that word."""
+        with app.app_context():
+            seed_words(app.db.get(), seed_file([word('gehen', 'to walk')]), 'Movement')
+            result = seed_words(app.db.get(), seed_file([word('gehen', 'to go')]), 'Movement')
+            assert result.updated == 1
+
+            cursor = app.db.cursor()
+            cursor.execute("SELECT english FROM words WHERE german = 'gehen' ORDER BY id")
+            assert [row[0] for row in cursor.fetchall()] == ['to go', 'to walk']
+            cursor.execute('''
+                SELECT wg.word_id FROM word_groups wg JOIN groups g ON g.id = wg.group_id
+                WHERE g.name = 'Movement' ORDER BY wg.word_id
+            ''')
+            assert 1 in [row[0] for row in cursor.fetchall()]
+
+    def test_existing_words_are_linked_not_duplicated(self, app, seed_file):
+        """A seed record matching an existing word reuses that word."""
+        with app.app_context():
+            seed_words(app.db.get(), seed_file([
+                {'german': 'gehen', 'pronunciation': 'ˈɡeːən', 'english': 'to go', 'parts': ['geh', 'en']}
+            ]), 'Movement')
+            cursor = app.db.cursor()
+            cursor.execute("SELECT COUNT(*) FROM words WHERE german = 'gehen'")
+            assert cursor.fetchone()[0] == 1
+            cursor.execute('''
+                SELECT COUNT(*) FROM word_groups wg JOIN groups g ON g.id = wg.group_id
+                WHERE g.name = 'Movement' AND wg.word_id = 1
+            ''')
+            assert cursor.fetchone()[0] == 1
+
+
+class TestSeedStudyActivities:
+    """Test cases for lib.seed.seed_study_activities."""
+
+    def test_activities_are_upserted_by_name(self, app, tmp_path):
+        """Re-seeding updates activities instead of adding duplicates."""
+        path = tmp_path / 'study_activities.json'
+        path.write_text(json.dumps([
+            {'name': 'Test Activity 1', 'url': 'http://example.com/new', 'preview_url': None},
+            {'name': 'Flashcards', 'url': 'http://example.com/cards', 'preview_url': None},
+        ]))
+        with app.app_context():
+            result = seed_study_activities(app.db.get(), str(path))
+            assert (result.added, result.updated) == (1, 1)
+            assert seed_study_activities(app.db.get(), str(path)).skipped
+
+            cursor = app.db.cursor()
+            cursor.execute("SELECT COUNT(*) FROM study_activities")
+            assert cursor.fetchone()[0] == 3
+            cursor.execute("SELECT url FROM study_activities WHERE name = 'Test Activity 1'")
+            assert cursor.fetchone()[0] == 'http://example.com/new'
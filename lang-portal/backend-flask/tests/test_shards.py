@@ -0,0 +1,176 @@
+"""Tests for sharded per-user storage."""
+import json
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+from app import create_app
+from lib.shards import ShardSchemaError, connect_shard, prepare_shard
+from tests.fixtures import as_user, get, study
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Create an app keeping each user's history in its own shard."""
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': db_path,
+        'SHARDS_DIR': str(tmp_path / 'shards'),
+        'SHARD_CACHE_SIZE': 2,
+    })
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        app.db.setup_tables(cursor)
+        cursor.executescript("""
+            INSERT INTO groups (name, words_count) VALUES ('Test Verbs', 2), ('Test Nouns', 1);
+            INSERT INTO words (german, pronunciation, english, parts) VALUES
+                ('gehen', 'ˈɡeːən', 'to go', '["geh", "en"]'),
+                ('arbeiten', 'ˈaʁbaɪ̯tn̩', 'to work', '["arbeit", "en"]'),
+                ('Haus', 'haʊ̯s', 'house', '["Haus"]');
+            INSERT INTO word_groups (word_id, group_id) VALUES (1, 1), (2, 1), (3, 2);
+            INSERT INTO study_activities (name, url, preview_url) VALUES
+                ('Test Activity', 'http://example.com/activity', 'http://example.com/preview');
+            INSERT INTO users (name) VALUES ('anna'), ('ben'), ('cleo');
+        """)
+        app.db.commit()
+
+    yield app
+
+    app.db.dispose()
+    os.close(db_fd)
+    os.unlink(db_path)
+
+
+def count_rows(path, table):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        connection.close()
+
+
+class TestShardedStorage:
+    """Test cases for routing users to their own shard files."""
+
+    def test_history_is_written_to_the_users_shard(self, app, client):
+        """Test that sessions and reviews land in the shard, not the shared database."""
+        study(client, 2, 1, [{'word_id': 1, 'is_correct': True}, {'word_id': 2, 'is_correct': False}])
+        study(client, 3, 2, [{'word_id': 3, 'is_correct': True}])
+
+        assert app.db.shards.user_ids() == [2, 3]
+        assert count_rows(app.db.shards.path(2), 'word_review_items') == 2
+        assert count_rows(app.db.shards.path(3), 'word_review_items') == 1
+        assert count_rows(app.config['DATABASE'], 'study_sessions') == 0
+        assert count_rows(app.config['DATABASE'], 'word_review_items') == 0
+
+        stats = get(client, '/api/dashboard/stats', 2)
+        assert (stats['total_sessions'], stats['total_words_studied'], stats['success_rate']) == (1, 2, 0.5)
+        assert get(client, '/api/dashboard/stats', 3)['total_sessions'] == 1
+
+        # Reads join the shard's counters to the shared vocabulary
+        words = {word['id']: word for word in get(client, '/api/groups/1/words/raw', 2)['words']}
+        assert (words[1]['correct_count'], words[2]['wrong_count']) == (1, 1)
+        assert get(client, '/api/words/3', 3)['word']['correct_count'] == 1
+        assert get(client, '/api/words/3', 2)['word']['correct_count'] == 0
+        assert get(client, '/api/study-sessions', 1)['total'] == 0
+
+    def test_vocabulary_is_read_only_in_requests(self, app):
+        """Test that request connections cannot write the shared tables."""
+        with app.test_request_context():
+            cursor = app.db.cursor()
+            with pytest.raises(sqlite3.OperationalError):
+                cursor.execute("INSERT INTO groups (name) VALUES ('Nope')")
+
+            cursor = app.db.cursor(shared=True)
+            cursor.execute("INSERT INTO groups (name) VALUES ('Shared')")
+            app.db.commit(shared=True)
+            app.db.close()
+
+    def test_etag_follows_shared_and_shard_versions(self, app, client):
+        """Test that ETags change with the vocabulary and with the user's history."""
+        etag = client.get('/api/groups/1/words/raw', headers=as_user(2)).headers['ETag']
+        study(client, 2, 1, [{'word_id': 1, 'is_correct': True}])
+        changed = client.get('/api/groups/1/words/raw', headers=as_user(2)).headers['ETag']
+        assert changed != etag
+
+        cursor = app.db.cursor(shared=True)
+        cursor.execute("UPDATE data_versions SET version = version + 1 WHERE table_name = 'words'")
+        app.db.commit(shared=True)
+        assert client.get('/api/groups/1/words/raw', headers=as_user(2)).headers['ETag'] != changed
+
+    def test_open_shards_are_bounded(self, app, client):
+        """Test that the least recently used shard is closed and reopened on demand."""
+        for user_id in (1, 2, 3):
+            study(client, user_id, 1, [{'word_id': 1, 'is_correct': True}] * user_id)
+            app.db.close()
+
+        stats = app.db.shards.stats()
+        assert (stats['open'], stats['max_open'], stats['opens'], stats['evictions']) == (2, 2, 3, 1)
+        assert 'db_shard_evictions_total 1' in client.get('/api/_metrics').get_data(as_text=True)
+        assert get(client, '/api/words/1', 1)['word']['correct_count'] == 1
+        assert app.db.shards.stats()['opens'] == 4
+
+    def test_cross_shard_totals(self, app, client):
+        """Test that the admin endpoint sums statistics over every shard."""
+        study(client, 1, 1, [{'word_id': 1, 'is_correct': True}, {'word_id': 2, 'is_correct': True}])
+        study(client, 2, 1, [{'word_id': 1, 'is_correct': False}])
+        study(client, 2, 2, [{'word_id': 3, 'is_correct': True}])
+
+        data = json.loads(client.get('/api/_shards').data)
+        assert data['totals'] == {
+            'shards': 2,
+            'total_sessions': 3,
+            'total_attempts': 4,
+            'total_correct': 3,
+            'words_studied': 4,
+            'mastered_words': 0,
+        }
+        assert data['router']['open'] == 2
+
+    def test_shard_schema_follows_the_shared_database(self, app, tmp_path):
+        """Test that new indexes and changed tables reach existing shards with their rows."""
+        path = str(tmp_path / 'user-9.db')
+        database = app.config['DATABASE']
+        connection = connect_shard(path, database)
+        try:
+            prepare_shard(connection)
+        finally:
+            connection.close()
+
+        shared = sqlite3.connect(database)
+        shared.execute('CREATE INDEX idx_study_sessions_test ON study_sessions (ended_at)')
+        shared.commit()
+
+        connection = connect_shard(path, database)
+        try:
+            prepare_shard(connection)
+            assert connection.execute(
+                "SELECT 1 FROM main.sqlite_master WHERE name = 'idx_study_sessions_test'"
+            ).fetchone()
+
+            connection.execute('INSERT INTO main.word_stats (word_id, attempts, successes) VALUES (1, 3, 2)')
+            connection.commit()
+            shared.execute('ALTER TABLE word_stats ADD COLUMN streak INTEGER')
+            shared.commit()
+            prepare_shard(connection)
+            query = 'SELECT word_id, attempts, successes, streak FROM main.word_stats'
+            assert connection.execute(query).fetchall() == [(1, 3, 2, None)]
+
+            # Rows that do not fit the new definition leave the shard as it was
+            shared.executescript('''
+                DROP TABLE word_stats;
+                CREATE TABLE word_stats (word_id INTEGER PRIMARY KEY, attempts INTEGER, level INTEGER NOT NULL);
+            ''')
+            with pytest.raises(ShardSchemaError):
+                prepare_shard(connection)
+            assert connection.execute(query).fetchall() == [(1, 3, 2, None)]
+            assert connection.execute(
+                "SELECT 1 FROM main.sqlite_master WHERE name = 'idx_study_sessions_test'"
+            ).fetchone()
+        finally:
+            connection.close()
+            shared.close()
@@ -0,0 +1,203 @@
+"""Tests for the storage backends and their repositories.
+
+The PostgreSQL tests run against the server named by POSTGRES_TEST_DSN and
+are skipped without it. Each test works in a schema of its own that is
+dropped afterwards.
+"""
+import json
+import os
+import re
+import sqlite3
+import uuid
+
+import pytest
+
+from app import create_app
+from lib.search import POSTGRES_FOLD_FROM, POSTGRES_FOLD_TO, build_tsquery
+from lib.storage import (
+    POSTGRES, POSTGRES_SCHEMA, SQLITE, PostgresBackend, Query, copy_sqlite_to_postgres,
+    order_term, psycopg, to_pyformat
+)
+
+POSTGRES_TEST_DSN = os.environ.get('POSTGRES_TEST_DSN')
+
+# Timestamps taken from the clock differ between two runs of the same writes
+CLOCK_KEYS = {'created_at', 'start_time', 'end_time', 'due_at', 'last_reviewed'}
+
+
+def strip_clock(value):
+    if isinstance(value, dict):
+        return {key: strip_clock(item) for key, item in value.items() if key not in CLOCK_KEYS}
+    if isinstance(value, list):
+        return [strip_clock(item) for item in value]
+    return value
+
+
+class TestQueries:
+    """Test cases for the dialect handling of queries."""
+
+    def test_placeholders_are_translated_outside_literals(self):
+        """Test that ?, :name and % are rewritten for psycopg but literals are kept."""
+        assert to_pyformat("SELECT ? WHERE a LIKE '50%?' AND b = ?") == \
+            "SELECT %s WHERE a LIKE '50%%?' AND b = %s"
+        assert to_pyformat('SELECT :day, x::date FROM t WHERE y = :day', named=True) == \
+            'SELECT %(day)s, x::date FROM t WHERE y = %(day)s'
+
+    def test_variants_and_fragments(self):
+        """Test that queries pick their dialect's SQL and fill in fragments."""
+        query = Query('SELECT {column} FROM a', postgres='SELECT {column} FROM b')
+        assert query.render(SQLITE, column='x') == 'SELECT x FROM a'
+        assert query.render(POSTGRES, column='x') == 'SELECT x FROM b'
+        assert Query("SELECT '{}'").render(POSTGRES) == "SELECT '{}'"
+
+    def test_nulls_sort_first_in_ascending_order(self):
+        """Test that PostgreSQL orders NULLs the way SQLite does."""
+        assert order_term('w.gender', 'asc', SQLITE) == 'w.gender asc'
+        assert order_term('w.gender', 'asc', POSTGRES) == 'w.gender asc NULLS FIRST'
+        assert order_term('w.gender', 'desc', POSTGRES) == 'w.gender desc NULLS LAST'
+
+    def test_tsquery_folds_like_the_schema(self):
+        """Test that search input is folded with the table of sql/postgres/schema.sql."""
+        assert build_tsquery('Schön GRÜßE') == "'schon':* & 'grusse':*"
+        assert build_tsquery('"*') is None
+        with open(POSTGRES_SCHEMA, encoding='utf-8') as file:
+            schema = file.read()
+        assert re.search(rf"'{POSTGRES_FOLD_FROM}',\s*'{POSTGRES_FOLD_TO}'", schema)
+
+    def test_unknown_backend_is_rejected(self, tmp_path):
+        """Test that a misspelled STORAGE_BACKEND fails at startup."""
+        with pytest.raises(ValueError):
+            create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'x.db'), 'STORAGE_BACKEND': 'mysql'})
+
+
+@pytest.fixture
+def pg_dsn():
+    """DSN of a fresh schema on the test server, dropped after the test."""
+    if not POSTGRES_TEST_DSN:
+        pytest.skip('POSTGRES_TEST_DSN is not set')
+    if psycopg is None:
+        pytest.skip('psycopg is not installed')
+    schema = f'test_{uuid.uuid4().hex[:12]}'
+    with psycopg.connect(POSTGRES_TEST_DSN, autocommit=True) as connection:
+        connection.execute(f'CREATE SCHEMA {schema}')
+    yield psycopg.conninfo.make_conninfo(POSTGRES_TEST_DSN, options=f'-csearch_path={schema}')
+    with psycopg.connect(POSTGRES_TEST_DSN, autocommit=True) as connection:
+        connection.execute(f'DROP SCHEMA {schema} CASCADE')
+
+
+@pytest.fixture
+def pg_app(app, pg_dsn):
+    """An app on PostgreSQL holding a copy of the test database."""
+    source = sqlite3.connect(app.config['DATABASE'])
+    try:
+        copy_sqlite_to_postgres(source, PostgresBackend(pg_dsn))
+    finally:
+        source.close()
+    pg_app = create_app({
+        'TESTING': True,
+        'DATABASE': app.config['DATABASE'],
+        'STORAGE_BACKEND': 'postgres',
+        'POSTGRES_DSN': pg_dsn,
+    })
+    # The SQLite app's request context is active while the app is created, so
+    # the CORS origin lookup left its connection there
+    pg_app.storage.close()
+    yield pg_app
+    pg_app.storage.dispose()
+
+
+def exercise(client):
+    """Run the same writes on a backend; returns the created session IDs."""
+    def post(url, body):
+        response = client.post(url, data=json.dumps(body), content_type='application/json')
+        assert response.status_code in (200, 201), (url, response.data)
+        return json.loads(response.data)
+
+    session_ids = []
+    for group_id, reviews in ((1, [(1, True), (4, False), (1, True)]), (2, [(2, True), (5, True)])):
+        session_id = post('/api/study_sessions', {'group_id': group_id, 'study_activity_id': 1})['session_id']
+        post(f'/api/study_sessions/{session_id}/review',
+             {'reviews': [{'word_id': word_id, 'is_correct': correct} for word_id, correct in reviews]})
+        session_ids.append(session_id)
+    post(f'/api/study_sessions/{session_ids[0]}/close', {})
+    post('/api/users', {'name': 'anna'})
+    return session_ids
+
+
+CONTRACT_URLS = (
+    '/api/words',
+    '/api/words?sort_by=gender&order=desc',
+    '/api/words?sort_by=correct_count&order=desc&cursor=',
+    '/api/words/2',
+    '/api/words/export',
+    '/api/words/search?q=haus',
+    '/api/words/search?q=scho',
+    '/api/groups',
+    '/api/groups?sort_by=words_count&order=desc',
+    '/api/groups/1',
+    '/api/groups/1/words?sort_by=wrong_count&order=desc',
+    '/api/groups/2/words?cursor=',
+    '/api/groups/2/words/raw',
+    '/api/groups/1/due',
+    '/api/groups/1/study_sessions?sort_by=reviewItemsCount',
+    '/api/groups/1/study_sessions?sort_by=duration',
+    '/api/study-activities',
+    '/api/study-activities/1',
+    '/api/study-activities/1/sessions?sort_by=accuracy&min_accuracy=0.5',
+    '/api/study-activities/1/launch',
+    '/api/study-sessions',
+    '/api/study-sessions?sort_by=duration&order=asc',
+    '/api/study-sessions/1',
+    '/api/dashboard/recent-session',
+    '/api/dashboard/stats',
+    '/api/users',
+)
+
+
+class TestPostgresBackend:
+    """Test cases comparing the PostgreSQL backend with SQLite."""
+
+    def test_responses_match_sqlite(self, app, client, pg_app, monkeypatch):
+        """Test that both backends answer the same writes and reads alike."""
+        # Session durations would otherwise differ when a write crosses a
+        # second boundary on one backend only
+        for module in ('lib.repositories', 'lib.reviews'):
+            monkeypatch.setattr(f'{module}.utc_now', lambda: '2025-01-01 12:00:00')
+        pg_client = pg_app.test_client()
+        assert exercise(client) == exercise(pg_client)
+
+        for url in CONTRACT_URLS:
+            expected = client.get(url)
+            actual = pg_client.get(url)
+            assert actual.status_code == expected.status_code == 200, url
+            assert strip_clock(json.loads(actual.data)) == strip_clock(json.loads(expected.data)), url
+
+    def test_errors_match_sqlite(self, client, pg_app):
+        """Test that conflicts and missing rows are reported alike."""
+        pg_client = pg_app.test_client()
+        for each in (client, pg_client):
+            body = json.dumps({'name': 'ben'})
+            assert each.post('/api/users', data=body, content_type='application/json').status_code == 201
+            response = each.post('/api/users', data=body, content_type='application/json')
+            assert (response.status_code, json.loads(response.data)['error_code']) == (409, 'USER_EXISTS')
+            assert each.get('/api/groups/99/words').status_code == 404
+            assert each.get('/api/words', headers={'X-User-Id': '99'}).status_code == 404
+            response = each.post('/api/study_sessions/1/review',
+                                 data=json.dumps({'reviews': [{'word_id': 99, 'is_correct': True}]}),
+                                 content_type='application/json')
+            assert response.status_code == 404
+
+    def test_copy_can_be_resumed(self, app, pg_app, pg_dsn):
+        """Test that copying again skips existing rows and identities continue after them."""
+        source = sqlite3.connect(app.config['DATABASE'])
+        try:
+            copied = copy_sqlite_to_postgres(source, PostgresBackend(pg_dsn))
+        finally:
+            source.close()
+        assert (copied['words'], copied['word_groups'], copied['study_activities']) == (5, 5, 2)
+
+        response = pg_app.test_client().post('/api/users', data=json.dumps({'name': 'cleo'}),
+                                             content_type='application/json')
+        assert json.loads(response.data)['id'] == 2
+        with psycopg.connect(pg_dsn) as connection:
+            assert connection.execute('SELECT COUNT(*) FROM words').fetchone()[0] == 5
@@ -1,4 +1,5 @@
 """Tests for study sessions API endpoints."""
+import io
 import json
 import pytest
 
@@ -274,4 +275,223 @@ class TestStudySessionsAPI:
         data = json.loads(response.data)
         word_data = data['word']
         assert word_data['correct_count'] == 0  # Remains 0
-        assert word_data['wrong_count'] == 1    # Was 0, now 1
\ No newline at end of file
+        assert word_data['wrong_count'] == 1    # Was 0, now 1
+    
+    def test_submit_reviews_aggregates_repeated_words(self, client):
+        """Test that repeated words in one submission are counted correctly."""
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        
+        reviews = [{'word_id': 3, 'is_correct': i % 3 != 0} for i in range(30)]
+        reviews.append({'word_id': '5', 'is_correct': False})  # IDs may arrive as strings
+        response = client.post(f'/api/study_sessions/{session_id}/review',
+                             data=json.dumps({'reviews': reviews}),
+                             content_type='application/json')
+        assert response.status_code == 200
+        assert json.loads(response.data)['reviews_count'] == 31
+        
+        word = json.loads(client.get('/api/words/3').data)['word']
+        assert word['correct_count'] == 20
+        assert word['wrong_count'] == 10
+        word = json.loads(client.get('/api/words/5').data)['word']
+        assert word['wrong_count'] == 1
+        
+        session = json.loads(client.get(f'/api/study-sessions/{session_id}').data)['session']
+        assert session['review_items_count'] == 31
+    
+    def test_submit_reviews_unknown_word_writes_nothing(self, client):
+        """Test that a batch with an unknown word is rejected as a whole."""
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        
+        reviews = [{'word_id': 3, 'is_correct': True}, {'word_id': 998, 'is_correct': True},
+                   {'word_id': 999, 'is_correct': False}]
+        response = client.post(f'/api/study_sessions/{session_id}/review',
+                             data=json.dumps({'reviews': reviews}),
+                             content_type='application/json')
+        assert response.status_code == 404
+        assert '998' in json.loads(response.data)['error']
+        
+        word = json.loads(client.get('/api/words/3').data)['word']
+        assert word['correct_count'] == 0
+        session = json.loads(client.get(f'/api/study-sessions/{session_id}').data)['session']
+        assert session['review_items_count'] == 0
+    
+    def test_stream_word_reviews(self, app, client):
+        """Test POST /api/study_sessions/:id/review/stream commits in chunks."""
+        app.config['REVIEW_STREAM_CHUNK_SIZE'] = 100
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        
+        lines = [json.dumps({'word_id': 1 + i % 5, 'is_correct': i % 4 != 0}) for i in range(250)]
+        lines.insert(10, '')  # Blank lines are ignored
+        response = client.post(f'/api/study_sessions/{session_id}/review/stream',
+                             data='\n'.join(lines) + '\n',
+                             content_type='application/x-ndjson')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        
+        messages = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert [m['chunk_reviews'] for m in messages[:-1]] == [100, 100, 50]
+        summary = messages[-1]['summary']
+        assert summary['status'] == 'completed'
+        assert summary['chunks'] == 3
+        assert summary['reviews_count'] == 250
+        
+        session = json.loads(client.get(f'/api/study-sessions/{session_id}').data)['session']
+        assert session['review_items_count'] == 250
+    
+    def test_stream_word_reviews_releases_writer_between_chunks(self, app, client):
+        """Test that the writer is back in the pool while the next chunk is read."""
+        app.config['REVIEW_STREAM_CHUNK_SIZE'] = 1
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        
+        body = b'{"word_id": 1, "is_correct": true}\n' * 3
+        writers_in_use = []
+        
+        class Body(io.BytesIO):
+            def readinto(self, buffer):
+                writers_in_use.append(app.db.pool.stats()['in_use'])
+                return super().readinto(buffer)
+        
+        response = client.post(f'/api/study_sessions/{session_id}/review/stream',
+                             input_stream=Body(body), content_length=len(body),
+                             content_type='application/x-ndjson')
+        summary = json.loads(response.data.decode().splitlines()[-1])['summary']
+        assert summary['reviews_count'] == 3
+        assert writers_in_use and set(writers_in_use) == {0}
+    
+    def test_stream_word_reviews_stops_at_invalid_record(self, app, client):
+        """Test that chunks before an invalid record stay committed."""
+        app.config['REVIEW_STREAM_CHUNK_SIZE'] = 2
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        
+        body = '\n'.join([
+            '{"word_id": 1, "is_correct": true}',
+            '{"word_id": 2, "is_correct": false}',
+            '{"word_id": 3, "is_correct": true}',
+            '{"word_id": 3}',
+        ])
+        response = client.post(f'/api/study_sessions/{session_id}/review/stream',
+                             data=body, content_type='application/x-ndjson')
+        messages = [json.loads(line) for line in response.data.decode().splitlines()]
+        summary = messages[-1]['summary']
+        assert summary['status'] == 'failed'
+        assert summary['reviews_count'] == 2
+        assert summary['error'].startswith('Line 4:')
+        
+        session = json.loads(client.get(f'/api/study-sessions/{session_id}').data)['session']
+        assert session['review_items_count'] == 2
+    
+    def test_stream_word_reviews_rejects_bad_requests(self, client):
+        """Test streaming endpoint content type and session validation."""
+        response = client.post('/api/study_sessions/999/review/stream',
+                             data='', content_type='application/x-ndjson')
+        assert response.status_code == 404
+        
+        response = client.post('/api/study_sessions/1/review/stream',
+                             data='{}', content_type='application/json')
+        assert response.status_code == 415
+    
+    def _create_reviewed_session(self, client, results, group_id=1):
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': group_id, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        if results:
+            reviews = [{'word_id': 1, 'is_correct': correct} for correct in results]
+            response = client.post(f'/api/study_sessions/{session_id}/review',
+                                 data=json.dumps({'reviews': reviews}),
+                                 content_type='application/json')
+            assert response.status_code == 200
+        return session_id
+    
+    def test_session_lifecycle_counters(self, client):
+        """Test review and correct counts stored on the session."""
+        session_id = self._create_reviewed_session(client, [True, True, False, True])
+        
+        data = json.loads(client.get(f'/api/study-sessions/{session_id}').data)
+        session = data['session']
+        assert session['status'] == 'open'
+        assert session['ended_at'] is None
+        assert session['review_items_count'] == 4
+        assert session['correct_count'] == 3
+        assert session['accuracy'] == 0.75
+        assert session['end_time'] >= session['start_time']
+        assert session['duration_seconds'] >= 0
+    
+    def test_close_study_session(self, client):
+        """Test POST /api/study_sessions/:id/close."""
+        session_id = self._create_reviewed_session(client, [True])
+        
+        response = client.post(f'/api/study_sessions/{session_id}/close')
+        assert response.status_code == 200
+        closed = json.loads(response.data)
+        assert closed['status'] == 'closed'
+        assert closed['ended_at'] is not None
+        assert closed['end_time'] == closed['ended_at']
+        
+        # Closing again keeps the original end time
+        response = client.post(f'/api/study_sessions/{session_id}/close')
+        assert json.loads(response.data)['ended_at'] == closed['ended_at']
+        
+        # A closed session accepts no more reviews
+        response = client.post(f'/api/study_sessions/{session_id}/review',
+                             data=json.dumps({'reviews': [{'word_id': 1, 'is_correct': True}]}),
+                             content_type='application/json')
+        assert response.status_code == 409
+        assert json.loads(response.data)['error_code'] == 'SESSION_CLOSED'
+        
+        response = client.post(f'/api/study_sessions/{session_id}/review/stream',
+                             data='{"word_id": 1, "is_correct": true}\n',
+                             content_type='application/x-ndjson')
+        assert response.status_code == 409
+        
+        data = json.loads(client.get(f'/api/study-sessions/{session_id}').data)
+        assert data['session']['review_items_count'] == 1
+        
+        assert client.post('/api/study_sessions/999/close').status_code == 404
+    
+    def test_get_study_sessions_sort_and_filter(self, client):
+        """Test sorting and filtering session listings by accuracy."""
+        perfect = self._create_reviewed_session(client, [True, True])
+        half = self._create_reviewed_session(client, [True, False])
+        unreviewed = self._create_reviewed_session(client, [])
+        
+        response = client.get('/api/study-sessions?sort_by=accuracy&order=desc')
+        assert response.status_code == 200
+        items = json.loads(response.data)['items']
+        assert [s['id'] for s in items] == [perfect, half, unreviewed]
+        assert items[2]['accuracy'] is None
+        
+        response = client.get('/api/study-sessions?min_accuracy=0.6')
+        data = json.loads(response.data)
+        assert data['total'] == 1
+        assert data['items'][0]['id'] == perfect
+        
+        response = client.get('/api/study-activities/1/sessions?max_accuracy=0.5&sort_by=duration')
+        assert [s['id'] for s in json.loads(response.data)['items']] == [half]
+        
+        response = client.get('/api/groups/1/study_sessions?sort_by=accuracy&order=asc&min_duration=0')
+        assert [s['id'] for s in json.loads(response.data)['study_sessions']] == [unreviewed, half, perfect]
+        
+        # Unknown sort parameters fall back to newest first, as on /api/words
+        newest = client.get('/api/study-sessions').data
+        assert client.get('/api/study-sessions?sort_by=wrong').data == newest
+        assert client.get('/api/study-sessions?order=sideways').data == newest
+        response = client.get('/api/study-activities/1/sessions?sort_by=wrong')
+        assert response.status_code == 200
+        assert client.get('/api/study-sessions?min_accuracy=2').status_code == 400
+        assert client.get('/api/study-sessions?max_duration=soon').status_code == 400
@@ -0,0 +1,142 @@
+"""Tests for the synthetic study history generator."""
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from lib.synthetic import LOADED_TABLES, Learner, _drop_indexes, generate_history, simulate_learner
+
+END = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def history(app, **options):
+    with app.app_context():
+        result = generate_history(app.db.get(), end=END, **options)
+        rows = app.db.cursor().execute('''
+            SELECT s.id, s.group_id, s.study_activity_id, s.created_at, s.ended_at,
+                   i.word_id, i.correct, i.created_at
+            FROM word_review_items i JOIN study_sessions s ON s.id = i.study_session_id
+            ORDER BY i.id
+        ''').fetchall()
+        return result, [tuple(row) for row in rows]
+
+
+class TestGenerateHistory:
+    """Test cases for lib.synthetic.generate_history."""
+
+    def test_history_is_deterministic(self, app):
+        """The same seed and options produce the same rows."""
+        def clear():
+            with app.app_context():
+                app.db.cursor().executescript('DELETE FROM word_review_items; DELETE FROM study_sessions;')
+
+        result, first = history(app, learners=5, days=90, seed=7)
+        assert result.reviews == len(first) > 0
+        clear()
+        assert history(app, learners=5, days=90, seed=7)[1] == first
+        clear()
+        assert history(app, learners=5, days=90, seed=8)[1] != first
+
+    def test_derived_tables_are_consistent(self, app):
+        """Counters, statistics and schedules account for every generated review."""
+        with app.app_context():
+            cursor = app.db.cursor()
+            indexes = cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' ORDER BY name").fetchall()
+
+        result, rows = history(app, learners=8, days=120, reviews_per_session=6)
+
+        with app.app_context():
+            cursor = app.db.cursor()
+            assert cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' ORDER BY name").fetchall() == indexes
+
+            # Every learner is a new user with their own summary row
+            stats = cursor.execute('''
+                SELECT COUNT(*), SUM(total_sessions), SUM(total_attempts), SUM(total_correct)
+                FROM learning_stats WHERE user_id != 1
+            ''').fetchone()
+            assert tuple(stats) == (8, result.sessions, result.reviews, sum(row[6] for row in rows))
+
+            mismatched = cursor.execute('''
+                SELECT COUNT(*) FROM study_sessions s
+                WHERE review_count != (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = s.id)
+                   OR correct_count != (SELECT SUM(correct) FROM word_review_items WHERE study_session_id = s.id)
+                   OR last_review_at != (SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = s.id)
+            ''').fetchone()[0]
+            assert mismatched == 0
+
+            # The default user keeps the fixture counters (word 1: 5 correct,
+            # 2 wrong); the learners have their own
+            generated = [row for row in rows if row[5] == 1]
+            counts = cursor.execute('''
+                SELECT SUM(correct_count) AS correct_count, SUM(wrong_count) AS wrong_count,
+                       COUNT(due_at) AS scheduled, COUNT(*) AS learners
+                FROM word_reviews WHERE word_id = 1 AND user_id != 1
+            ''').fetchone()
+            assert counts['correct_count'] == sum(row[6] for row in generated)
+            assert counts['wrong_count'] == sum(1 - row[6] for row in generated)
+            assert counts['scheduled'] == counts['learners'] > 0
+            fixture = cursor.execute('SELECT correct_count, wrong_count FROM word_reviews WHERE user_id = 1 AND word_id = 1').fetchone()
+            assert tuple(fixture) == (5, 2)
+
+            assert all(row[3] < END.strftime('%Y-%m-%d') for row in rows)
+
+    def test_dropped_indexes_are_rebuilt(self, app):
+        """Indexes dropped for a load come back, also after a killed run."""
+        query = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'word_review_items' ORDER BY name"
+        with app.app_context():
+            indexes = app.db.cursor().execute(query).fetchall()
+        assert indexes
+
+        history(app, learners=2, days=30, drop_indexes=True)
+        with app.app_context():
+            cursor = app.db.cursor()
+            assert cursor.execute(query).fetchall() == indexes
+            assert cursor.execute('SELECT COUNT(*) FROM dropped_indexes').fetchone()[0] == 0
+
+            # A run killed during the load leaves its record behind
+            _drop_indexes(cursor, LOADED_TABLES)
+            app.db.commit()
+            assert cursor.execute(query).fetchall() == []
+
+        history(app, learners=1, days=30)
+        with app.app_context():
+            assert app.db.cursor().execute(query).fetchall() == indexes
+
+    def test_missing_groups_are_created(self, app):
+        """Asking for more groups than exist adds practice sets from the vocabulary."""
+        result, rows = history(app, learners=3, groups=5, days=60)
+        assert result.groups == 5
+        with app.app_context():
+            cursor = app.db.cursor()
+            groups = cursor.execute("SELECT id, words_count FROM groups WHERE name LIKE 'Practice Set %'").fetchall()
+            assert len(groups) == 2
+            assert all(group['words_count'] == 5 for group in groups)
+
+    def test_requires_study_activities(self, app):
+        """Generating into a database without activities is rejected."""
+        with app.app_context():
+            app.db.cursor().execute('DELETE FROM study_activities')
+            app.db.commit()
+            with pytest.raises(ValueError):
+                generate_history(app.db.get(), learners=1)
+
+
+class TestLearnerModel:
+    """Test cases for the simulated learning curve."""
+
+    def test_accuracy_improves_with_practice(self):
+        """A learner answers more reliably later in their history."""
+        rng = random.Random(3)
+        start = END.timestamp() - 365 * 86400
+        learner = Learner(rng, start, END.timestamp())
+        learner.joined, learner.left, learner.study_rate, learner.aptitude = start, END.timestamp(), 0.8, 1.0
+        groups = [(1, list(range(1, 31))), (2, list(range(31, 61)))]
+
+        sessions = list(simulate_learner(rng, learner, groups, [1], 20))
+        reviews = [review for session in sessions for review in session.reviews]
+        early, late = reviews[:200], reviews[-1000:]
+        assert sum(r[1] for r in early) / len(early) < sum(r[1] for r in late) / len(late)
+
+        # Sessions follow each other and move on to the second group
+        assert all(a.reviews[-1][2] < b.started_at for a, b in zip(sessions, sessions[1:]))
+        assert {session.group_id for session in sessions} == {1, 2}
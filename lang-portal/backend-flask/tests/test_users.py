@@ -0,0 +1,184 @@
+"""Tests for users and per-user study history."""
+import json
+import os
+import sqlite3
+
+from lib.migrations import load_migrations, migrate
+from lib.stats import rebuild_learning_stats
+from lib.vocabulary import VocabularyStore
+from tests.fixtures import as_user, get, study
+
+SETUP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'setup')
+TABLES = ('words', 'word_reviews', 'word_review_items', 'groups', 'word_groups',
+          'study_activities', 'study_sessions')
+
+
+def create_user(client, name):
+    response = client.post('/api/users', data=json.dumps({'name': name}), content_type='application/json')
+    assert response.status_code == 201
+    return json.loads(response.data)['id']
+
+
+class TestUsersAPI:
+    """Test cases for the users endpoints and the X-User-Id header."""
+
+    def test_create_and_list_users(self, client):
+        """Test creating, listing and fetching users."""
+        user_id = create_user(client, 'anna')
+
+        response = client.post('/api/users', data=json.dumps({'name': 'anna'}), content_type='application/json')
+        assert response.status_code == 409
+        assert json.loads(response.data)['error_code'] == 'USER_EXISTS'
+        assert client.post('/api/users', data=json.dumps({}), content_type='application/json').status_code == 400
+
+        data = json.loads(client.get('/api/users').data)
+        assert [user['name'] for user in data['items']] == ['default', 'anna']
+        assert data['total'] == 2
+
+        assert json.loads(client.get(f'/api/users/{user_id}').data)['name'] == 'anna'
+        assert client.get('/api/users/999').status_code == 404
+
+    def test_user_header_validation(self, client):
+        """Test that malformed and unknown users are rejected."""
+        assert client.get('/api/dashboard/stats', headers={'X-User-Id': 'abc'}).status_code == 400
+        assert client.get('/api/dashboard/stats', headers={'X-User-Id': '0'}).status_code == 400
+        assert client.get('/api/dashboard/stats', headers={'X-User-Id': '999'}).status_code == 404
+
+        response = client.get('/api/dashboard/stats')
+        assert response.status_code == 200
+        assert 'X-User-Id' in response.headers['Vary']
+        assert json.loads(response.data) == get(client, '/api/dashboard/stats', 1)
+
+
+class TestPerUserHistory:
+    """Test cases for study history, counters and statistics kept per user."""
+
+    def test_history_is_isolated(self, client):
+        """Test that one user's study does not show up for another."""
+        default_stats = get(client, '/api/dashboard/stats', 1)
+        user_id = create_user(client, 'ben')
+        session_id = study(client, user_id, 1, [{'word_id': 1, 'is_correct': True}] * 3)
+
+        stats = get(client, '/api/dashboard/stats', user_id)
+        assert (stats['total_sessions'], stats['total_words_studied'], stats['success_rate']) == (1, 1, 1.0)
+        assert stats['active_groups'] == 1
+        assert get(client, '/api/dashboard/stats', 1) == default_stats
+        assert get(client, '/api/dashboard/recent-session', user_id)['id'] == session_id
+        assert get(client, '/api/dashboard/recent-session', 1) is None
+
+        # Word counters: the fixture's belong to the default user
+        assert get(client, '/api/words/1', user_id)['word']['correct_count'] == 3
+        assert get(client, '/api/words/1', 1)['word']['correct_count'] == 5
+        raw = get(client, '/api/groups/1/words/raw', user_id)
+        assert {word['id']: word['correct_count'] for word in raw['words']} == {1: 3, 4: 0}
+        raw = get(client, '/api/groups/1/words/raw', 1)
+        assert {word['id']: word['correct_count'] for word in raw['words']} == {1: 5, 4: 0}
+
+        # Schedules: word 1 is due tomorrow for the user, still new for the default user
+        assert [word['id'] for word in get(client, '/api/groups/1/due', user_id)['words']] == [4]
+        assert [word['id'] for word in get(client, '/api/groups/1/due', 1)['words']] == [1, 4]
+
+        # Sessions are only visible to and writable by their user
+        assert [s['id'] for s in get(client, '/api/study-sessions', user_id)['items']] == [session_id]
+        assert get(client, '/api/study-sessions', 1)['total'] == 0
+        assert get(client, '/api/groups/1/study_sessions', 1)['study_sessions'] == []
+        assert get(client, '/api/study-activities/1/sessions', 1)['items'] == []
+        assert client.get(f'/api/study-sessions/{session_id}').status_code == 404
+        response = client.post(f'/api/study_sessions/{session_id}/review',
+                               data=json.dumps({'reviews': [{'word_id': 1, 'is_correct': False}]}),
+                               content_type='application/json')
+        assert response.status_code == 404
+        assert client.post(f'/api/study_sessions/{session_id}/close').status_code == 404
+
+    def test_reset_clears_only_the_requesting_user(self, client):
+        """Test that resetting the history keeps other users' sessions."""
+        user_id = create_user(client, 'cleo')
+        own = study(client, 1, 2, [{'word_id': 2, 'is_correct': True}])
+        study(client, user_id, 2, [{'word_id': 2, 'is_correct': False}])
+
+        assert client.post('/api/study-sessions/reset', headers=as_user(user_id)).status_code == 200
+        assert get(client, '/api/study-sessions', user_id)['total'] == 0
+        assert get(client, '/api/dashboard/stats', user_id)['total_sessions'] == 0
+        assert get(client, '/api/words/2', user_id)['word']['wrong_count'] == 0
+
+        assert [s['id'] for s in get(client, '/api/study-sessions', 1)['items']] == [own]
+        assert get(client, '/api/words/2', 1)['word']['correct_count'] == 4
+
+    def test_rebuild_matches_incremental_stats(self, app, client):
+        """Test that rebuilding recomputes every user's summary row."""
+        user_id = create_user(client, 'dora')
+        study(client, 1, 1, [{'word_id': 1, 'is_correct': True}, {'word_id': 4, 'is_correct': False}])
+        study(client, user_id, 2, [{'word_id': 5, 'is_correct': True}] * 5)
+        incremental = {user: get(client, '/api/dashboard/stats', user) for user in (1, user_id)}
+
+        cursor = app.db.cursor()
+        rebuild_learning_stats(cursor)
+        app.db.commit()
+        assert {user: get(client, '/api/dashboard/stats', user) for user in (1, user_id)} == incremental
+        assert incremental[user_id]['mastered_words'] == 1
+
+    def test_etags_and_caches_are_per_user(self, app, client):
+        """Test that cached listings are not shared between users."""
+        user_id = create_user(client, 'emil')
+        study(client, user_id, 3, [{'word_id': 3, 'is_correct': True}] * 2)
+
+        response = client.get('/api/words?sort_by=correct_count&order=desc')
+        etag = response.headers['ETag']
+        response = client.get('/api/words?sort_by=correct_count&order=desc',
+                              headers={'If-None-Match': etag, 'X-User-Id': str(user_id)})
+        assert response.status_code == 200
+        assert json.loads(response.data)['words'][0]['german'] == 'schön'
+
+        app.vocabulary = store = VocabularyStore()
+        assert get(client, '/api/words?sort_by=correct_count&order=desc', user_id)['words'][0]['german'] == 'schön'
+        assert get(client, '/api/words?sort_by=correct_count&order=desc', 1)['words'][0]['german'] == 'gehen'
+        assert store.loads == 1
+
+
+class TestUsersMigration:
+    """Test cases for migration 0011."""
+
+    def test_existing_history_moves_to_default_user(self, tmp_path):
+        """Test that history recorded before users belongs to user 1."""
+        migrations = load_migrations()
+        directory = tmp_path / 'migrations'
+        directory.mkdir()
+        for migration in migrations:
+            if migration.version < 11:
+                (directory / migration.filename).write_text(migration.sql, encoding='utf-8')
+
+        connection = sqlite3.connect(str(tmp_path / 'old.db'))
+        try:
+            for table in TABLES:
+                with open(os.path.join(SETUP_DIR, f'create_table_{table}.sql'), encoding='utf-8') as file:
+                    connection.execute(file.read())
+            migrate(connection, str(directory))
+            connection.executescript("""
+                INSERT INTO words (german, pronunciation, english, parts) VALUES ('gehen', 'ˈɡeːən', 'to go', '[]');
+                INSERT INTO groups (name) VALUES ('Verbs');
+                INSERT INTO word_groups (word_id, group_id) VALUES (1, 1);
+                INSERT INTO study_activities (name, url) VALUES ('Flashcards', 'about:blank');
+                INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1);
+                INSERT INTO word_review_items (word_id, study_session_id, correct) VALUES (1, 1, 1);
+                INSERT INTO word_reviews (word_id, correct_count, due_at) VALUES (1, 1, '2030-01-01 00:00:00');
+                INSERT INTO word_stats (word_id, attempts, successes) VALUES (1, 1, 1);
+                UPDATE learning_stats SET total_sessions = 1, total_attempts = 1, total_correct = 1;
+            """)
+            connection.commit()
+
+            for migration in migrations:
+                if migration.version >= 11:
+                    (directory / migration.filename).write_text(migration.sql, encoding='utf-8')
+            migrate(connection, str(directory))
+
+            assert connection.execute('SELECT user_id FROM study_sessions').fetchall() == [(1,)]
+            assert connection.execute('SELECT user_id FROM word_review_items').fetchall() == [(1,)]
+            assert connection.execute(
+                'SELECT user_id, word_id, correct_count, due_at FROM word_reviews'
+            ).fetchall() == [(1, 1, 1, '2030-01-01 00:00:00')]
+            assert connection.execute('SELECT user_id, attempts FROM word_stats').fetchall() == [(1, 1)]
+            assert connection.execute(
+                'SELECT user_id, total_sessions, total_attempts FROM learning_stats'
+            ).fetchall() == [(1, 1, 1)]
+        finally:
+            connection.close()
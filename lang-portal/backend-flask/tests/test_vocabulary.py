@@ -0,0 +1,94 @@
+"""Tests for the in-memory vocabulary store."""
+import json
+import pytest
+
+from lib.vocabulary import VocabularyStore, SORT_COLUMNS
+from lib.data_version import bump_versions
+
+# Columns whose /api/words query walks a plain index, so SQLite breaks ties
+# by word ID like the store; elsewhere only the sort values must agree
+ID_ORDERED_COLUMNS = ('german', 'pronunciation', 'english')
+
+
+def listing(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+
+class TestVocabularyStore:
+    """Test cases for serving word listings from lib.vocabulary."""
+    
+    @pytest.fixture
+    def words(self, app):
+        """Add enough words for several pages, with duplicate values."""
+        cursor = app.db.cursor()
+        for i in range(120):
+            cursor.execute(
+                "INSERT INTO words (german, pronunciation, english, parts, gender, plural) VALUES (?, ?, ?, '[]', ?, ?)",
+                (f'Wort{i % 40}', f'vɔʁt{i % 13}', f'word {i}', [None, 'der', 'die', 'das'][i % 4], None if i % 3 else f'Wörter{i}')
+            )
+            cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)', (cursor.lastrowid, 1 + i % 3))
+            cursor.execute(
+                'INSERT INTO word_reviews (word_id, correct_count, wrong_count) VALUES (?, ?, ?)',
+                (cursor.lastrowid, i % 7, i % 5)
+            )
+        app.db.commit()
+    
+    @pytest.mark.parametrize('sort_by', SORT_COLUMNS)
+    @pytest.mark.parametrize('order', ['asc', 'desc'])
+    def test_pages_match_sql(self, app, client, words, sort_by, order):
+        """Test that store pages equal the SQL pages for every sort column."""
+        urls = [f'/api/words?sort_by={sort_by}&order={order}&page={page}' for page in (1, 2, 3, 4)]
+        urls += [f'/api/groups/{group}/words?sort_by={sort_by}&order={order}&page={page}'
+                 for group in (1, 2) for page in (1, 3, 5)]
+        
+        from_sql = [listing(client, url) for url in urls]
+        app.vocabulary = VocabularyStore()
+        from_store = [listing(client, url) for url in urls]
+        
+        for url, sql_page, store_page in zip(urls, from_sql, from_store):
+            assert {k: v for k, v in sql_page.items() if k != 'words'} == \
+                   {k: v for k, v in store_page.items() if k != 'words'}
+            if sort_by in ID_ORDERED_COLUMNS and url.startswith('/api/words'):
+                assert store_page['words'] == sql_page['words']
+            else:
+                assert [w[sort_by] for w in store_page['words']] == [w[sort_by] for w in sql_page['words']]
+    
+    def test_refresh_on_data_version_change(self, app, client):
+        """Test that review counters reload without rebuilding the words."""
+        app.vocabulary = store = VocabularyStore()
+        listing(client, '/api/words')
+        assert (store.loads, store.counter_reloads) == (1, 0)
+        
+        # Unchanged versions reuse the snapshot
+        listing(client, '/api/words?sort_by=english')
+        assert (store.loads, store.counter_reloads) == (1, 0)
+        
+        response = client.post('/api/study_sessions',
+                             data=json.dumps({'group_id': 1, 'study_activity_id': 1}),
+                             content_type='application/json')
+        session_id = json.loads(response.data)['session_id']
+        client.post(f'/api/study_sessions/{session_id}/review',
+                    data=json.dumps({'reviews': [{'word_id': 3, 'is_correct': True}] * 9}),
+                    content_type='application/json')
+        
+        data = listing(client, '/api/words?sort_by=correct_count&order=desc')
+        assert data['words'][0]['german'] == 'schön'
+        assert data['words'][0]['correct_count'] == 9
+        assert (store.loads, store.counter_reloads) == (1, 1)
+        
+        # New words rebuild the snapshot
+        cursor = app.db.cursor()
+        cursor.execute("INSERT INTO words (german, pronunciation, english, parts) VALUES ('Apfel', 'ˈapfl̩', 'apple', '[]')")
+        bump_versions(cursor, 'words')
+        app.db.commit()
+        
+        data = listing(client, '/api/words')
+        assert data['words'][0]['german'] == 'Apfel'
+        assert data['total_words'] == 6
+        assert store.loads == 2
+    
+    def test_store_disabled_by_default(self, app):
+        """Test that the store is opt-in."""
+        assert app.vocabulary is None
@@ -136,4 +136,98 @@ class TestWordsAPI:
         # Find word with ID 3 (no review stats)
         word_without_stats = next(w for w in words if w['id'] == 3)
         assert word_without_stats['correct_count'] == 0
-        assert word_without_stats['wrong_count'] == 0
\ No newline at end of file
+        assert word_without_stats['wrong_count'] == 0
+    
+    def test_get_words_cursor_pagination(self, app, client):
+        """Test GET /api/words walking every page with next_cursor."""
+        with app.app_context():
+            cursor = app.db.cursor()
+            cursor.executemany(
+                "INSERT INTO words (german, pronunciation, english, parts, gender) VALUES (?, ?, ?, '[]', ?)",
+                [(f'Wort{i % 40:02d}', 'vɔʁt', f'word {i}', 'das' if i % 3 else None) for i in range(120)]
+            )
+            app.db.commit()
+        
+        for sort_by in ['german', 'english', 'gender', 'correct_count']:
+            for order in ['asc', 'desc']:
+                seen = []
+                url = f'/api/words?sort_by={sort_by}&order={order}&cursor='
+                while True:
+                    response = client.get(url)
+                    assert response.status_code == 200
+                    data = json.loads(response.data)
+                    assert len(data['words']) <= 50
+                    seen.extend(data['words'])
+                    if not data['next_cursor']:
+                        break
+                    url = f'/api/words?sort_by={sort_by}&order={order}&cursor={data["next_cursor"]}'
+                
+                # Every word exactly once, in sort order
+                assert sorted(w['id'] for w in seen) == list(range(1, 126))
+                keys = [(w[sort_by] if w[sort_by] is not None else '', w['id']) for w in seen]
+                assert keys == sorted(keys, reverse=(order == 'desc'))
+    
+    def test_get_words_invalid_cursor(self, client):
+        """Test GET /api/words with a malformed or mismatched cursor."""
+        response = client.get('/api/words?cursor=not-a-cursor')
+        assert response.status_code == 400
+        
+        response = client.get('/api/words?cursor=&sort_by=german')
+        data = json.loads(response.data)
+        assert 'next_cursor' in data
+        assert 'current_page' not in data
+    
+    def test_search_words(self, client):
+        """Test GET /api/words/search with prefix matching and ranking."""
+        response = client.get('/api/words/search?q=geh')
+        assert response.status_code == 200
+        
+        data = json.loads(response.data)
+        assert data['total_words'] == 1
+        assert data['words'][0]['german'] == 'gehen'
+        assert data['words'][0]['correct_count'] == 5
+        
+        # English translations are searched too
+        data = json.loads(client.get('/api/words/search?q=to').data)
+        assert {w['german'] for w in data['words']} == {'gehen', 'arbeiten'}
+    
+    def test_search_words_folds_umlauts_and_eszett(self, app, client):
+        """Test that schon finds schön and strasse finds Straße."""
+        data = json.loads(client.get('/api/words/search?q=schon').data)
+        assert [w['german'] for w in data['words']] == ['schön']
+        
+        with app.app_context():
+            cursor = app.db.cursor()
+            cursor.execute('''
+                INSERT INTO words (german, pronunciation, english, parts, gender, plural)
+                VALUES ('Straße', 'ˈʃtʁaːsə', 'street', '[{"german": "Straße", "pronunciation": ["Stra", "ße"]}]', 'die', 'Straßen')
+            ''')
+            app.db.commit()
+        
+        for query in ['strasse', 'Straße', 'STRA']:
+            data = json.loads(client.get(f'/api/words/search?q={query}').data)
+            assert [w['german'] for w in data['words']] == ['Straße'], query
+    
+    def test_search_words_pagination(self, app, client):
+        """Test paging through search results."""
+        with app.app_context():
+            cursor = app.db.cursor()
+            cursor.executemany(
+                "INSERT INTO words (german, pronunciation, english, parts) VALUES (?, '', ?, '[]')",
+                [(f'Tisch{i}', f'table {i}') for i in range(25)]
+            )
+            app.db.commit()
+        
+        data = json.loads(client.get('/api/words/search?q=tisch&per_page=10&page=3').data)
+        assert data['total_words'] == 25
+        assert data['total_pages'] == 3
+        assert len(data['words']) == 5
+    
+    def test_search_words_invalid_query(self, client):
+        """Test GET /api/words/search without searchable input."""
+        assert client.get('/api/words/search').status_code == 400
+        assert client.get('/api/words/search?q=%22*%20-').status_code == 400
+        
+        # FTS5 operators in user input are treated as plain words
+        response = client.get('/api/words/search?q=haus%20OR%20NEAR(')
+        assert response.status_code == 200